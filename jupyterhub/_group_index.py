@@ -0,0 +1,140 @@
+"""In-memory index of group membership
+
+Maps user names to the names of their groups,
+so scope checks with `!group=` filters don't need database queries.
+
+The index is built with a single query on first use in a db session,
+and kept up to date by SQLAlchemy events when membership changes,
+e.g. via the group API or `User.sync_groups`.
+
+.. versionadded:: 4.0
+"""
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+import itertools
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from . import orm
+
+# unique versions of group membership, across all indexes
+_versions = itertools.count()
+
+
+class GroupIndex:
+    """Group names for each user name in one db session"""
+
+    def __init__(self, db):
+        self.version = next(_versions)
+        self._groups = {}
+        query = select(orm.User.name, orm.Group.name).join(orm.User.groups)
+        for user_name, group_name in db.execute(query):
+            self._groups.setdefault(user_name, set()).add(group_name)
+
+    def groups_for_user(self, user_name):
+        """The names of a user's groups (frozenset)"""
+        return frozenset(self._groups.get(user_name, ()))
+
+    def _add(self, user_name, group_name):
+        self._groups.setdefault(user_name, set()).add(group_name)
+        self.version = next(_versions)
+
+    def _remove(self, user_name, group_name):
+        groups = self._groups.get(user_name)
+        if groups is not None:
+            groups.discard(group_name)
+        self.version = next(_versions)
+
+
+def get_group_index(db):
+    """Get the group index for a db session, building it if needed"""
+    index = db.info.get("group_index")
+    if index is None:
+        index = db.info["group_index"] = GroupIndex(db)
+    return index
+
+
+def groups_for_user(db, user_name):
+    """The names of a user's groups (frozenset)"""
+    return get_group_index(db).groups_for_user(user_name)
+
+
+def index_version(db):
+    """The current version of group membership in a db session
+
+    Changes whenever membership changes,
+    for use in cache keys of results that depend on group membership.
+    """
+    if db is None:
+        return None
+    return get_group_index(db).version
+
+
+def _reset(session):
+    """Discard a session's index, to be rebuilt on next use"""
+    if session is not None:
+        session.info.pop("group_index", None)
+
+
+def _session_of(*objects):
+    for obj in objects:
+        session = inspect(obj).session
+        if session is not None:
+            return session
+
+
+@event.listens_for(orm.Group.users, "append")
+def _member_added(group, user, initiator):
+    session = _session_of(group, user)
+    if session is None:
+        return
+    index = session.info.get("group_index")
+    if index is None:
+        return
+    if user.name is None or group.name is None:
+        _reset(session)
+    else:
+        index._add(user.name, group.name)
+
+
+@event.listens_for(orm.Group.users, "remove")
+def _member_removed(group, user, initiator):
+    session = _session_of(group, user)
+    if session is None:
+        return
+    index = session.info.get("group_index")
+    if index is None:
+        return
+    if user.name is None or group.name is None:
+        _reset(session)
+    else:
+        index._remove(user.name, group.name)
+
+
+@event.listens_for(orm.User.name, "set")
+@event.listens_for(orm.Group.name, "set")
+def _renamed(target, value, oldvalue, initiator):
+    if value != oldvalue:
+        _reset(inspect(target).session)
+
+
+@event.listens_for(Session, "transient_to_pending")
+def _added(session, obj):
+    # membership set before the objects were in a session
+    # wasn't recorded in the index
+    if isinstance(obj, orm.User) and obj.__dict__.get("groups"):
+        _reset(session)
+    elif isinstance(obj, orm.Group) and obj.__dict__.get("users"):
+        _reset(session)
+
+
+@event.listens_for(Session, "persistent_to_deleted")
+def _deleted(session, obj):
+    if isinstance(obj, (orm.User, orm.Group)):
+        _reset(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _rolled_back(session):
+    _reset(session)
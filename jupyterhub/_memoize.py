@@ -3,6 +3,7 @@
 Note: a memoized function should always return an _immutable_
 result to avoid later modifications polluting cached results.
 """
+import time
 from collections import OrderedDict
 from functools import wraps
 
@@ -52,6 +53,63 @@ class LRUCache:
         if len(self._cache) > self.maxsize:
             self._cache.popitem(last=False)
 
+    def pop(self, key, default=None):
+        """Remove an entry from the cache, if present"""
+        return self._cache.pop(key, default)
+
+    def clear(self):
+        """Remove all entries from the cache"""
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+    __getitem__ = get
+    __setitem__ = set
+
+
+# sentinel for missing cache entries
+_missing = object()
+
+
+class TTLCache(LRUCache):
+    """An LRU cache whose entries also expire after `ttl` seconds
+
+    Expired entries are dropped when they are next accessed
+    (or pushed out by newer entries), not actively.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, clock=time.monotonic):
+        super().__init__(maxsize=maxsize)
+        self.ttl = ttl
+        self.clock = clock
+
+    def __contains__(self, key):
+        return self.get(key, _missing) is not _missing
+
+    def get(self, key, default=None):
+        """Get an item from the cache, if it hasn't expired"""
+        entry = super().get(key)
+        if entry is None:
+            return default
+        deadline, value = entry
+        if self.clock() > deadline:
+            # expired, remove it
+            self._cache.pop(key, None)
+            return default
+        return value
+
+    def set(self, key, value):
+        """Store an entry in the cache, expiring `ttl` seconds from now"""
+        super().set(key, (self.clock() + self.ttl, value))
+
+    def pop(self, key, default=None):
+        """Remove an entry from the cache, if present"""
+        entry = self._cache.pop(key, None)
+        if entry is None:
+            return default
+        return entry[1]
+
     __getitem__ = get
     __setitem__ = set
 
@@ -0,0 +1,103 @@
+"""Write-behind buffer for last_activity updates
+
+Activity is reported often (every authenticated request, every activity
+report from a single-user server), but only needs to be persisted
+with a resolution of seconds to minutes.
+The ActivityBuffer collects the latest timestamp per object in memory
+and writes them all to the database periodically,
+with one bulk UPDATE per table.
+"""
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+import time
+
+from sqlalchemy import bindparam, or_
+from sqlalchemy.orm.attributes import set_committed_value
+from tornado.log import app_log
+
+from .metrics import ACTIVITY_FLUSH_BATCH_SIZE, ACTIVITY_FLUSH_DURATION_SECONDS
+
+
+class ActivityBuffer:
+    """Coalesce last_activity updates in memory and flush them in bulk
+
+    Timestamps are recorded per ORM object (User, Spawner, APIToken),
+    keeping only the most recent.
+    The in-memory objects are updated immediately
+    without marking them as modified in the session,
+    so the Hub sees current activity while the database is only written on flush.
+
+    .. versionadded:: 4.0
+    """
+
+    def __init__(self, db_factory, log=app_log):
+        self.db_factory = db_factory
+        self.log = log
+        # (table, id): timestamp
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def record(self, obj, timestamp):
+        """Record activity on an ORM object
+
+        Args:
+            obj: an ORM object with `id` and `last_activity` columns
+                (or a User wrapper)
+            timestamp (datetime): the timestamp of the activity
+        """
+        obj = getattr(obj, 'orm_user', obj)
+        key = (obj.__table__, obj.id)
+        if key not in self._pending or timestamp > self._pending[key]:
+            self._pending[key] = timestamp
+        if obj.last_activity is None or timestamp > obj.last_activity:
+            set_committed_value(obj, 'last_activity', timestamp)
+
+    def flush(self):
+        """Write all recorded activity to the database
+
+        Returns the number of objects updated.
+        On error, the recorded activity is kept to retry on the next flush.
+        """
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        by_table = {}
+        for (table, id), timestamp in pending.items():
+            by_table.setdefault(table, []).append(
+                {'_id': id, '_last_activity': timestamp}
+            )
+
+        start = time.perf_counter()
+        db = self.db_factory()
+        try:
+            for table, params in by_table.items():
+                # only move last_activity forward
+                stmt = (
+                    table.update()
+                    .where(table.c.id == bindparam('_id'))
+                    .where(
+                        or_(
+                            table.c.last_activity == None,
+                            table.c.last_activity < bindparam('_last_activity'),
+                        )
+                    )
+                    .values(last_activity=bindparam('_last_activity'))
+                )
+                db.execute(stmt, params)
+            db.commit()
+        except Exception:
+            self.log.exception("Failed to write activity for %i objects", len(pending))
+            db.rollback()
+            # keep activity for the next flush,
+            # unless newer activity has been recorded since
+            for key, timestamp in pending.items():
+                if key not in self._pending or timestamp > self._pending[key]:
+                    self._pending[key] = timestamp
+            return 0
+
+        ACTIVITY_FLUSH_DURATION_SECONDS.observe(time.perf_counter() - start)
+        ACTIVITY_FLUSH_BATCH_SIZE.observe(len(pending))
+        self.log.debug("Wrote activity for %i objects", len(pending))
+        return len(pending)
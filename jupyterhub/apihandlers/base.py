@@ -3,6 +3,7 @@
 # Distributed under the terms of the Modified BSD License.
 import json
 import warnings
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from functools import lru_cache
 from http.client import responses
 from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
@@ -12,7 +13,7 @@ from tornado import web
 
 from .. import orm
 from ..handlers import BaseHandler
-from ..scopes import get_scopes_for
+from ..scopes import Scope, get_scopes_for, scope_filter_clause
 from ..utils import isoformat, url_escape_path, url_path_join
 
 PAGINATION_MEDIA_TYPE = "application/jupyterhub-pagination+json"
@@ -316,12 +317,23 @@ class APIHandler(BaseHandler):
                 ):
                     servers[name] = self.server_model(spawner)
 
-            if include_stopped_servers:
+            sub_scope = self.parsed_scopes.get('read:servers')
+            if include_stopped_servers and sub_scope is not None:
                 # add any stopped servers in the db
                 seen = set(servers.keys())
-                for name, orm_spawner in user.orm_spawners.items():
-                    if name not in seen and scope_filter(orm_spawner, kind='server'):
-                        servers[name] = self.server_model(orm_spawner, user=user)
+                if sub_scope == Scope.ALL:
+                    orm_spawners = user.orm_spawners.values()
+                else:
+                    # filter in the db, rather than loading all servers
+                    orm_spawners = self.db.query(orm.Spawner).filter(
+                        orm.Spawner.user_id == user.id,
+                        scope_filter_clause(sub_scope, 'server'),
+                    )
+                for orm_spawner in orm_spawners:
+                    if orm_spawner.name not in seen:
+                        servers[orm_spawner.name] = self.server_model(
+                            orm_spawner, user=user
+                        )
 
             if "servers" in allowed_keys or servers:
                 # omit servers if no access
@@ -451,18 +463,119 @@ class APIHandler(BaseHandler):
             )
         return offset, limit
 
-    def paginated_model(self, items, offset, limit, total_count):
+    def get_api_cursor(self):
+        """Decode the `cursor` argument for keyset pagination
+
+        Cursors are opaque to clients, and given in `_pagination.next.cursor`.
+        Returns None if there is no cursor,
+        otherwise a dict with the key of the last result of the previous page
+        (`after`) and the offset of the next page (`offset`).
+        """
+        cursor = self.get_argument("cursor", None)
+        if not cursor:
+            return None
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            decoded = json.loads(urlsafe_b64decode(padded.encode("ascii")))
+            return {"after": int(decoded["after"]), "offset": int(decoded["offset"])}
+        except Exception:
+            raise web.HTTPError(400, "Invalid pagination cursor")
+
+    @staticmethod
+    def _encode_cursor(after, offset):
+        cursor = json.dumps({"after": after, "offset": offset}, separators=(",", ":"))
+        return urlsafe_b64encode(cursor.encode("utf8")).decode("ascii").rstrip("=")
+
+    def paginate_query(self, query, key, offset, limit):
+        """Get one page of results from a query
+
+        Results are ordered by `key`, which should be a unique, indexed column
+        such as `orm.User.id`.
+        If the request has a `cursor`, only results after the cursor are selected,
+        so each page costs the same regardless of how far in the list it is,
+        unlike `offset`, which must skip over all previous results.
+
+        Returns (rows, offset, next_cursor).
+        `next_cursor` is None if there are no more results.
+        """
+        cursor = self.get_api_cursor()
+        query = query.order_by(key.asc())
+        if cursor is None:
+            query = query.offset(offset)
+        else:
+            offset = cursor["offset"]
+            query = query.filter(key > cursor["after"])
+        # fetch one extra row to find out if there's a next page
+        rows = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(
+                getattr(rows[-1], key.key), offset + limit
+            )
+        return rows, offset, next_cursor
+
+    def get_total_count(self, query):
+        """Get the total number of results of a query for pagination
+
+        Depending on the `total` argument of the request
+        or `JupyterHub.api_page_total_count`,
+        this is an exact count, an estimate, or None.
+        """
+        mode = self.get_argument("total", None)
+        if mode is None:
+            mode = self.settings.get("api_page_total_count", "exact")
+        mode = mode.lower()
+        if mode == "none":
+            return None
+        elif mode == "estimate":
+            return self._estimate_count(query)
+        elif mode == "exact":
+            return query.count()
+        else:
+            raise web.HTTPError(
+                400, f"Invalid total: {mode!r}, must be exact, estimate, or none"
+            )
+
+    def _estimate_count(self, query):
+        """Estimate the number of results of a query
+
+        Uses the query planner's estimate on PostgreSQL,
+        an exact count on other databases.
+        """
+        dialect = self.db.get_bind().dialect
+        if dialect.name != "postgresql":
+            return query.count()
+        compiled = query.statement.compile(dialect=dialect)
+        plan = (
+            self.db.connection()
+            .exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)
+            .scalar()
+        )
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def paginated_model(
+        self, items, offset, limit, total_count, next_cursor=None, has_next=None
+    ):
         """Return the paginated form of a collection (list or dict)
 
         A dict with { items: [], _pagination: {}}
         instead of a single list (or dict).
 
         pagination info includes the current offset and limit,
-        the total number of results for the query,
+        the total number of results for the query (null if not counted),
         and information about how to build the next page request
         if there is one.
+
+        If there is a `next_cursor` (from `paginate_query`),
+        the next page url uses the cursor instead of the offset.
+        `has_next` is computed from `total_count` if unspecified.
         """
         next_offset = offset + limit
+        if has_next is None:
+            has_next = total_count is not None and next_offset < total_count
         data = {
             "items": items,
             "_pagination": {
@@ -472,11 +585,15 @@ class APIHandler(BaseHandler):
                 "next": None,
             },
         }
-        if next_offset < total_count:
+        if has_next:
             # if there's a next page
             next_url_parsed = urlparse(self.request.full_url())
             query = parse_qs(next_url_parsed.query)
-            query['offset'] = [next_offset]
+            if next_cursor is None:
+                query['offset'] = [next_offset]
+            else:
+                query.pop('offset', None)
+                query['cursor'] = [next_cursor]
             query['limit'] = [limit]
             next_url_parsed = next_url_parsed._replace(
                 query=urlencode(query, doseq=True)
@@ -487,6 +604,8 @@ class APIHandler(BaseHandler):
                 "limit": limit,
                 "url": next_url,
             }
+            if next_cursor is not None:
+                data["_pagination"]["next"]["cursor"] = next_cursor
         return data
 
     def options(self, *args, **kwargs):
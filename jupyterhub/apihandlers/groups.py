@@ -6,7 +6,7 @@ import json
 from tornado import web
 
 from .. import orm
-from ..scopes import Scope, needs_scope
+from ..scopes import Scope, needs_scope, scope_filter_clause
 from .base import APIHandler
 
 
@@ -42,7 +42,7 @@ class GroupListAPIHandler(_GroupAPIHandler):
     @needs_scope('list:groups')
     def get(self):
         """List groups"""
-        query = full_query = self.db.query(orm.Group)
+        query = self.db.query(orm.Group)
         sub_scope = self.parsed_scopes['list:groups']
         if sub_scope != Scope.ALL:
             if not set(sub_scope).issubset({'group'}):
@@ -52,19 +52,26 @@ class GroupListAPIHandler(_GroupAPIHandler):
                     f"Invalid filter on list:group for {self.current_user}: {sub_scope}"
                 )
                 raise web.HTTPError(403)
-            query = query.filter(orm.Group.name.in_(sub_scope['group']))
+            query = query.filter(scope_filter_clause(sub_scope, 'group'))
 
         offset, limit = self.get_api_pagination()
-        query = query.order_by(orm.Group.id.asc()).offset(offset).limit(limit)
-        group_list = [self.group_model(g) for g in query]
-        total_count = full_query.count()
+        rows, offset, next_cursor = self.paginate_query(
+            query, orm.Group.id, offset, limit
+        )
+        group_list = [self.group_model(g) for g in rows]
         if self.accepts_pagination:
-            data = self.paginated_model(group_list, offset, limit, total_count)
+            data = self.paginated_model(
+                group_list,
+                offset,
+                limit,
+                self.get_total_count(query),
+                next_cursor=next_cursor,
+                has_next=next_cursor is not None,
+            )
         else:
-            query_count = query.count()
-            if offset == 0 and total_count > query_count:
+            if offset == 0 and next_cursor is not None:
                 self.log.warning(
-                    f"Truncated group list in request that does not expect pagination. Replying with {query_count} of {total_count} total groups."
+                    f"Truncated group list in request that does not expect pagination. Replying with {len(rows)} groups, more are available."
                 )
             data = group_list
         self.write(json.dumps(data))
@@ -47,7 +47,7 @@ class ProxyAPIHandler(APIHandler):
         Can be used to jumpstart a newly launched proxy
         without waiting for the check_routes interval.
         """
-        await self.proxy.check_routes(self.users, self.services)
+        await self.proxy.check_routes(self.users, self.services, full=True)
 
     @needs_scope('proxy')
     async def patch(self):
@@ -70,7 +70,7 @@ class ProxyAPIHandler(APIHandler):
         if 'auth_token' in model:
             self.proxy.auth_token = model['auth_token']
         self.log.info("Updated proxy at %s", self.proxy)
-        await self.proxy.check_routes(self.users, self.services)
+        await self.proxy.check_routes(self.users, self.services, full=True)
 
 
 default_handlers = [(r"/api/proxy", ProxyAPIHandler)]
@@ -6,7 +6,8 @@ Currently GET-only, no actions can be taken to modify services.
 # Distributed under the terms of the Modified BSD License.
 import json
 
-from ..scopes import Scope, needs_scope
+from .. import orm
+from ..scopes import Scope, needs_scope, scope_filter_clause
 from .base import APIHandler
 
 
@@ -14,11 +15,30 @@ class ServiceListAPIHandler(APIHandler):
     @needs_scope('list:services')
     def get(self):
         data = {}
+        query = self.db.query(orm.Service.id, orm.Service.name)
         service_scope = self.parsed_scopes['list:services']
-        for name, service in self.services.items():
-            if service_scope == Scope.ALL or name in service_scope.get("service", {}):
-                model = self.service_model(service)
-                data[name] = model
+        if service_scope != Scope.ALL:
+            query = query.filter(scope_filter_clause(service_scope, 'service'))
+        if self.accepts_pagination:
+            offset, limit = self.get_api_pagination()
+            rows, offset, next_cursor = self.paginate_query(
+                query, orm.Service.id, offset, limit
+            )
+        else:
+            rows = query.order_by(orm.Service.name)
+        for _, name in rows:
+            service = self.services.get(name)
+            if service is not None:
+                data[name] = self.service_model(service)
+        if self.accepts_pagination:
+            data = self.paginated_model(
+                data,
+                offset,
+                limit,
+                self.get_total_count(query),
+                next_cursor=next_cursor,
+                has_next=next_cursor is not None,
+            )
         self.write(json.dumps(data))
 
 
@@ -8,6 +8,7 @@ from datetime import datetime, timedelta, timezone
 from async_generator import aclosing
 from dateutil.parser import parse as parse_date
 from sqlalchemy import func, or_
+from sqlalchemy.orm import selectinload
 from tornado import web
 from tornado.iostream import StreamClosedError
 
@@ -133,42 +134,36 @@ class UserListAPIHandler(APIHandler):
                     f"Invalid filter on list:user for {self.current_user}: {sub_scope}"
                 )
                 raise web.HTTPError(403)
-            filters = []
-            if 'user' in sub_scope:
-                filters.append(orm.User.name.in_(sub_scope['user']))
-            if 'group' in sub_scope:
-                filters.append(
-                    orm.User.groups.any(
-                        orm.Group.name.in_(sub_scope['group']),
-                    )
-                )
-
-            if len(filters) == 1:
-                query = query.filter(filters[0])
-            else:
-                query = query.filter(or_(*filters))
+            query = query.filter(scopes.scope_filter_clause(sub_scope, 'user'))
 
         if name_filter:
             query = query.filter(orm.User.name.ilike(f'%{name_filter}%'))
 
         full_query = query
-        query = query.order_by(orm.User.id.asc()).offset(offset).limit(limit)
+        rows, offset, next_cursor = self.paginate_query(
+            query, orm.User.id, offset, limit
+        )
 
         user_list = []
-        for u in query:
+        for u in rows:
             if post_filter is None or post_filter(u):
                 user_model = self.user_model(u)
                 if user_model:
                     user_list.append(user_model)
 
-        total_count = full_query.count()
         if self.accepts_pagination:
-            data = self.paginated_model(user_list, offset, limit, total_count)
+            data = self.paginated_model(
+                user_list,
+                offset,
+                limit,
+                self.get_total_count(full_query),
+                next_cursor=next_cursor,
+                has_next=next_cursor is not None,
+            )
         else:
-            query_count = query.count()
-            if offset == 0 and total_count > query_count:
+            if offset == 0 and next_cursor is not None:
                 self.log.warning(
-                    f"Truncated user list in request that does not expect pagination. Processing {query_count} of {total_count} total users."
+                    f"Truncated user list in request that does not expect pagination. Processing {len(rows)} users, more are available."
                 )
             data = user_list
 
@@ -354,6 +349,27 @@ class UserTokenListAPIHandler(APIHandler):
             raise web.HTTPError(404, "No such user: %s" % user_name)
 
         now = datetime.utcnow()
+        if self.accepts_pagination:
+            # exclude expired tokens, which are purged periodically
+            query = self.db.query(orm.APIToken).filter(
+                orm.APIToken.user_id == user.id,
+                or_(orm.APIToken.expires_at == None, orm.APIToken.expires_at >= now),
+            )
+            offset, limit = self.get_api_pagination()
+            tokens, offset, next_cursor = self.paginate_query(
+                query, orm.APIToken.id, offset, limit
+            )
+            data = self.paginated_model(
+                [self.token_model(token) for token in tokens],
+                offset,
+                limit,
+                self.get_total_count(query),
+                next_cursor=next_cursor,
+                has_next=next_cursor is not None,
+            )
+            self.write(json.dumps(data))
+            return
+
         api_tokens = []
 
         def sort_key(token):
@@ -744,6 +760,21 @@ class SpawnProgressAPIHandler(APIHandler):
             else:
                 raise web.HTTPError(400, "%s is not starting...", spawner._log_name)
 
+        spawn_queue = self.settings.get('spawn_queue')
+        if spawn_queue is not None and spawn_queue.position(spawner) is not None:
+            # report position in the queue until the spawn starts
+            async with aclosing(
+                iterate_until(spawn_future, spawn_queue.watch(spawner))
+            ) as positions:
+                async for position, length in positions:
+                    await self.send_event(
+                        {
+                            'progress': 0,
+                            'queue_position': position,
+                            'message': f"Waiting to start, position {position} of {length} in the queue",
+                        }
+                    )
+
         # retrieve progress events from the Spawner
         async with aclosing(
             iterate_until(spawn_future, spawner._generate_progress())
@@ -810,7 +841,47 @@ def _parse_timestamp(timestamp):
     return dt
 
 
+class ServerReadyAPIHandler(APIHandler):
+    """Notification from a starting single-user server that it's ready
+
+    Sent by jupyterhub-singleuser as soon as it is listening,
+    so the Hub doesn't have to poll the server's URL.
+    The body may contain the server's `jupyterhub_version`.
+
+    .. versionadded:: 4.0
+    """
+
+    @needs_scope('users:activity')
+    def post(self, user_name, server_name=''):
+        user = self.find_user(user_name)
+        if user is None:
+            # no such user
+            raise web.HTTPError(404, "No such user: %r", user_name)
+        if server_name not in user.orm_spawners:
+            raise web.HTTPError(
+                404, f"No such server '{server_name}' for user {user.name}"
+            )
+        body = self.get_json_body() or {}
+        if not isinstance(body, dict):
+            raise web.HTTPError(400, "body must be a json dict")
+        spawner = user.spawners[server_name]
+        self.log.debug("%s is ready", spawner._log_name)
+        spawner._notify_ready(body.get('jupyterhub_version'))
+        self.set_status(204)
+
+
 class ActivityAPIHandler(APIHandler):
+    def _update_activity(self, obj, last_activity):
+        """Set last_activity on an orm object
+
+        Uses the Hub's activity buffer, if enabled.
+        """
+        activity_buffer = self.settings.get('activity_buffer')
+        if activity_buffer is None:
+            obj.last_activity = last_activity
+        else:
+            activity_buffer.record(obj, last_activity)
+
     def _validate_servers(self, user, servers):
         """Validate servers dict argument
 
@@ -842,14 +913,13 @@ class ActivityAPIHandler(APIHandler):
             )
         return servers
 
-    @needs_scope('users:activity')
-    def post(self, user_name):
-        user = self.find_user(user_name)
-        if user is None:
-            # no such user
-            raise web.HTTPError(404, "No such user: %r", user_name)
+    def _validate_activity(self, user, body):
+        """Validate the activity body for one user
 
-        body = self.get_json_body()
+        Returns (last_activity, servers),
+        with timestamps parsed into datetime objects.
+        Raises HTTPError(400) if the body is invalid.
+        """
         if not isinstance(body, dict):
             raise web.HTTPError(400, "body must be a json dict")
 
@@ -867,45 +937,131 @@ class ActivityAPIHandler(APIHandler):
             # is valid and contains only servers that exist
             # and last_activity is defined and a valid datetime object
 
-        # update user.last_activity if specified
+        last_activity = None
         if last_activity_timestamp:
             last_activity = _parse_timestamp(last_activity_timestamp)
-            if (not user.last_activity) or last_activity > user.last_activity:
+        return last_activity, servers
+
+    def _apply_activity(self, orm_user, last_activity, servers):
+        """Apply validated activity for one user (without committing)"""
+        # update user.last_activity if specified
+        if last_activity:
+            if (not orm_user.last_activity) or last_activity > orm_user.last_activity:
                 self.log.debug(
-                    "Activity for user %s: %s", user.name, isoformat(last_activity)
+                    "Activity for user %s: %s", orm_user.name, isoformat(last_activity)
                 )
-                user.last_activity = last_activity
+                self._update_activity(orm_user, last_activity)
             else:
                 self.log.debug(
                     "Not updating activity for %s: %s < %s",
-                    user,
+                    orm_user,
                     isoformat(last_activity),
-                    isoformat(user.last_activity),
+                    isoformat(orm_user.last_activity),
                 )
 
         if servers:
             for server_name, server_info in servers.items():
                 last_activity = server_info['last_activity']
-                spawner = user.orm_spawners[server_name]
+                spawner = orm_user.orm_spawners[server_name]
 
                 if (not spawner.last_activity) or last_activity > spawner.last_activity:
                     self.log.debug(
                         "Activity on server %s/%s: %s",
-                        user.name,
+                        orm_user.name,
                         server_name,
                         isoformat(last_activity),
                     )
-                    spawner.last_activity = last_activity
+                    self._update_activity(spawner, last_activity)
                 else:
                     self.log.debug(
                         "Not updating server activity on %s/%s: %s < %s",
-                        user.name,
+                        orm_user.name,
                         server_name,
                         isoformat(last_activity),
-                        isoformat(user.last_activity),
+                        isoformat(orm_user.last_activity),
                     )
 
-        self.db.commit()
+    def _commit_activity(self):
+        """Commit applied activity, unless it is buffered"""
+        if self.settings.get('activity_buffer') is None:
+            self.db.commit()
+
+    @needs_scope('users:activity')
+    def post(self, user_name):
+        user = self.find_user(user_name)
+        if user is None:
+            # no such user
+            raise web.HTTPError(404, "No such user: %r", user_name)
+
+        body = self.get_json_body()
+        last_activity, servers = self._validate_activity(user, body)
+        self._apply_activity(user.orm_user, last_activity, servers)
+        self._commit_activity()
+
+
+class BulkActivityAPIHandler(ActivityAPIHandler):
+    """Record activity for many users and servers in one request
+
+    The body is a dict of the form::
+
+        {
+          "user-name": {
+            "last_activity": "timestamp",
+            "servers": {"server-name": {"last_activity": "timestamp"}}
+          },
+        }
+
+    where each user's entry has the same format as the body
+    of POST /api/users/:name/activity.
+
+    Each entry is authorized and validated separately.
+    All valid entries are applied in one transaction.
+    The response has a result for each user, of the form::
+
+        {"user-name": {"status": 200}}
+        {"user-name": {"status": 404, "message": "..."}}
+
+    .. versionadded:: 4.0
+    """
+
+    @needs_scope('users:activity')
+    def post(self):
+        body = self.get_json_body()
+        if not isinstance(body, dict):
+            raise web.HTTPError(
+                400, "body must be a json dict of {user_name: activity}"
+            )
+
+        orm_users = {
+            orm_user.name: orm_user
+            for orm_user in self.db.query(orm.User)
+            .filter(orm.User.name.in_(list(body)))
+            .options(selectinload(orm.User._orm_spawners))
+        }
+        user_filter = self.get_scope_filter('users:activity')
+
+        results = {}
+        updates = []
+        for user_name, user_body in body.items():
+            orm_user = orm_users.get(user_name)
+            try:
+                if orm_user is None or not user_filter(orm_user, kind='user'):
+                    # same error for missing users and users we can't access
+                    raise web.HTTPError(404, "No such user: %r" % user_name)
+                last_activity, servers = self._validate_activity(orm_user, user_body)
+            except web.HTTPError as e:
+                results[user_name] = {
+                    "status": e.status_code,
+                    "message": e.log_message % e.args if e.args else e.log_message,
+                }
+                continue
+            updates.append((orm_user, last_activity, servers))
+            results[user_name] = {"status": 200}
+
+        for orm_user, last_activity, servers in updates:
+            self._apply_activity(orm_user, last_activity, servers)
+        self._commit_activity()
+        self.write(json.dumps(results))
 
 
 default_handlers = [
@@ -914,10 +1070,13 @@ default_handlers = [
     (r"/api/users/([^/]+)", UserAPIHandler),
     (r"/api/users/([^/]+)/server", UserServerAPIHandler),
     (r"/api/users/([^/]+)/server/progress", SpawnProgressAPIHandler),
+    (r"/api/users/([^/]+)/server/ready", ServerReadyAPIHandler),
     (r"/api/users/([^/]+)/tokens", UserTokenListAPIHandler),
     (r"/api/users/([^/]+)/tokens/([^/]*)", UserTokenAPIHandler),
     (r"/api/users/([^/]+)/servers/([^/]*)", UserServerAPIHandler),
     (r"/api/users/([^/]+)/servers/([^/]*)/progress", SpawnProgressAPIHandler),
+    (r"/api/users/([^/]+)/servers/([^/]*)/ready", ServerReadyAPIHandler),
     (r"/api/users/([^/]+)/activity", ActivityAPIHandler),
+    (r"/api/activity", BulkActivityAPIHandler),
     (r"/api/users/([^/]+)/admin-access", UserAdminAccessAPIHandler),
 ]
@@ -14,8 +14,9 @@ import socket
 import ssl
 import sys
 import time
+from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 from functools import partial
 from getpass import getuser
 from operator import itemgetter
@@ -27,10 +28,10 @@ if sys.version_info[:2] < (3, 3):
 
 import tornado.httpserver
 import tornado.options
-from dateutil.parser import parse as parse_date
 from jinja2 import ChoiceLoader, Environment, FileSystemLoader, PrefixLoader
 from jupyter_telemetry.eventlog import EventLog
-from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import selectinload
 from tornado import gen, web
 from tornado.httpclient import AsyncHTTPClient
 from tornado.ioloop import IOLoop, PeriodicCallback
@@ -39,6 +40,7 @@ from traitlets import (
     Any,
     Bool,
     Bytes,
+    CaselessStrEnum,
     Dict,
     Float,
     Instance,
@@ -60,6 +62,7 @@ import jupyterhub
 
 from . import apihandlers, crypto, dbutil, handlers, orm, roles, scopes
 from ._data import DATA_FILES_PATH
+from .activity import ActivityBuffer
 
 # classes for config
 from .auth import Authenticator, PAMAuthenticator
@@ -71,15 +74,21 @@ from .handlers.static import CacheControlStaticFilesHandler, LogoHandler
 from .log import CoroutineLogFormatter, log_request
 from .metrics import (
     HUB_STARTUP_DURATION_SECONDS,
+    INIT_SPAWNERS_CHECKED,
     INIT_SPAWNERS_DURATION_SECONDS,
+    INIT_SPAWNERS_PENDING,
     RUNNING_SERVERS,
     TOTAL_USERS,
+    UPDATE_LAST_ACTIVITY_DURATION_SECONDS,
+    InitSpawnerStatus,
     PeriodicMetricsCollector,
 )
 from .oauth.provider import make_provider
 from .objects import Hub, Server
-from .proxy import ConfigurableHTTPProxy, Proxy
+from .polling import PollScheduler, _polls_many
+from .proxy import ConfigurableHTTPProxy, Proxy, _route_last_activity
 from .services.service import Service
+from .spawn_queue import SpawnQueue
 from .spawner import LocalProcessSpawner, Spawner
 from .traitlets import Callable, Command, EntryPointType, URLPrefix
 from .user import UserDict
@@ -277,7 +286,7 @@ class JupyterHub(Application):
 
     @default('classes')
     def _load_classes(self):
-        classes = [Spawner, Authenticator, CryptKeeper]
+        classes = [Spawner, Authenticator, CryptKeeper, PollScheduler]
         for name, trait in self.traits(config=True).items():
             # load entry point groups into configurable class list
             # so that they show up in config files, etc.
@@ -460,6 +469,54 @@ class JupyterHub(Application):
     last_activity_interval = Integer(
         300, help="Interval (in seconds) at which to update last-activity timestamps."
     ).tag(config=True)
+    last_activity_full_interval = Integer(
+        0,
+        help="""Interval (in seconds) at which to fetch and check the full routing table.
+
+        If greater than last_activity_interval,
+        last-activity updates in between only fetch routes from the proxy
+        with activity since the previous update,
+        and the full routing table is checked against the Hub's state
+        (Proxy.check_routes) only at this interval.
+
+        Set to 0 (default) to fetch and check all routes
+        on every last-activity update.
+
+        .. versionadded:: 4.0
+        """,
+    ).tag(config=True)
+    # utcnow() of the previous last-activity update
+    _last_activity_poll = None
+    # monotonic time of the previous full route check
+    _last_activity_full_check = None
+    activity_flush_interval = Integer(
+        0,
+        help="""Interval (in seconds) at which to write buffered activity to the database.
+
+        If greater than 0, last_activity updates from requests
+        and from single-user servers' activity reports
+        are collected in memory and written in bulk at this interval,
+        instead of committed individually as they arrive.
+        Buffered activity is written when the Hub shuts down.
+
+        Set to 0 (default) to write activity immediately.
+
+        .. versionadded:: 4.0
+        """,
+    ).tag(config=True)
+
+    activity_buffer = Any()
+
+    # user id: callable to start checking the user's servers,
+    # for servers not yet checked by init_spawners
+    _queued_spawner_checks = Dict()
+
+    @default("activity_buffer")
+    def _default_activity_buffer(self):
+        if self.activity_flush_interval <= 0:
+            return None
+        return ActivityBuffer(lambda: self.db, log=self.log)
+
     proxy_check_interval = Integer(
         5,
         help="DEPRECATED since version 0.8: Use ConfigurableHTTPProxy.check_running_interval",
@@ -468,6 +525,20 @@ class JupyterHub(Application):
         60,
         help="Interval (in seconds) at which to check connectivity of services with web endpoints.",
     ).tag(config=True)
+    recount_servers_interval = Integer(
+        600,
+        help="""Interval (in seconds) at which to recount active servers.
+
+        Counts of pending and active servers, used e.g. for concurrent_spawn_limit
+        and active_server_limit, are updated as servers change state.
+        They are periodically checked against a full count of all servers,
+        correcting any drift.
+
+        Set to 0 to disable the periodic check.
+
+        .. versionadded:: 4.0
+        """,
+    ).tag(config=True)
     active_user_window = Integer(
         30 * 60, help="Duration (in seconds) to determine the number of active users."
     ).tag(config=True)
@@ -1008,6 +1079,72 @@ class JupyterHub(Application):
         to reduce the cost of checking authentication tokens.
         """,
     ).tag(config=True)
+
+    token_cache_max_age = Integer(
+        300,
+        help="""Time (in seconds) to remember that an API token has been verified.
+
+        Requests presenting a recently verified token are authenticated
+        without repeating the prefix query and hash comparison.
+        Cached entries are invalidated immediately when a token is deleted
+        or expires, so this only bounds how long an entry may stay in memory.
+
+        Set to 0 to disable the verified-token cache.
+
+        .. versionadded:: 4.0
+        """,
+    ).tag(config=True)
+
+    token_cache_max_size = Integer(
+        10000,
+        help="""Maximum number of verified API tokens to remember.
+
+        Least-recently used entries are evicted first.
+        Set to 0 to disable the verified-token cache.
+
+        .. versionadded:: 4.0
+        """,
+    ).tag(config=True)
+
+    token_verify_threads = Integer(
+        0,
+        help="""Number of threads to use for checking API token hashes.
+
+        If greater than 0, hashes of API tokens are checked
+        in a pool of this many threads instead of on the event loop,
+        so that bursts of requests with unknown tokens
+        don't stall other requests.
+
+        Set to 0 (default) to check token hashes on the event loop.
+
+        .. versionadded:: 4.0
+        """,
+    ).tag(config=True)
+
+    token_verify_max_pending = Integer(
+        0,
+        help="""Maximum number of token hash checks to queue for token_verify_threads.
+
+        Requests arriving when this many checks are already queued or running
+        receive a 429 error instead of waiting.
+
+        Set to 0 (default) for no limit.
+        Has no effect if token_verify_threads is 0.
+
+        .. versionadded:: 4.0
+        """,
+    ).tag(config=True)
+
+    token_verifier = Any()
+
+    @default("token_verifier")
+    def _default_token_verifier(self):
+        if self.token_verify_threads <= 0:
+            return None
+        return crypto.TokenVerifier(
+            self.token_verify_threads, max_pending=self.token_verify_max_pending
+        )
+
     cookie_secret = Union(
         [Bytes(), Unicode()],
         help="""The cookie secret to use to encrypt cookies.
@@ -1068,6 +1205,24 @@ class JupyterHub(Application):
         200, help="The maximum amount of records that can be returned at once"
     ).tag(config=True)
 
+    api_page_total_count = CaselessStrEnum(
+        ["exact", "estimate", "none"],
+        default_value="exact",
+        help="""How to compute the total number of results in paginated responses
+
+        - exact: count all results (the default).
+          This requires a full count query for every page,
+          which can be slow with many records.
+        - estimate: use the database's estimate of the number of results,
+          if available (PostgreSQL), otherwise an exact count.
+        - none: don't compute the total, `_pagination.total` will be null.
+
+        Can be overridden per request with the `total` query argument.
+
+        .. versionadded:: 4.0
+        """,
+    ).tag(config=True)
+
     authenticate_prometheus = Bool(
         True, help="Authentication for prometheus metrics"
     ).tag(config=True)
@@ -1272,6 +1427,59 @@ class JupyterHub(Application):
         """,
     )
 
+    concurrent_spawn_queue = Bool(
+        False,
+        help="""
+        Queue spawns beyond `concurrent_spawn_limit`, instead of rejecting them.
+
+        When enabled, spawn requests that would exceed `concurrent_spawn_limit`
+        wait in a queue and start as other spawns finish,
+        rather than failing with a 429 error.
+        Queued spawns are pending, and the spawn progress page
+        shows their position in the queue.
+
+        Has no effect if `concurrent_spawn_limit` is 0.
+
+        .. versionadded:: 4.0
+        """,
+    ).tag(config=True)
+
+    spawn_queue_priority = Callable(
+        None,
+        allow_none=True,
+        help="""
+        Callable to prioritize queued spawns when `concurrent_spawn_queue` is enabled.
+
+        Receives the Spawner of a queued spawn,
+        and returns an integer priority (may be a coroutine).
+        Spawns with higher priority start first,
+        and spawns with the same priority start in the order they were requested.
+        By default, all spawns start in the order they were requested.
+
+        For example, to start spawns of users in the 'instructors' group first::
+
+            def spawn_queue_priority(spawner):
+                groups = {group.name for group in spawner.user.groups}
+                return 1 if 'instructors' in groups else 0
+
+            c.JupyterHub.spawn_queue_priority = spawn_queue_priority
+
+        .. versionadded:: 4.0
+        """,
+    ).tag(config=True)
+
+    spawn_queue = Any()
+
+    @default("spawn_queue")
+    def _default_spawn_queue(self):
+        if not self.concurrent_spawn_queue or self.concurrent_spawn_limit <= 0:
+            return None
+        return SpawnQueue(
+            self.concurrent_spawn_limit,
+            priority=self.spawn_queue_priority,
+            log=self.log,
+        )
+
     active_server_limit = Integer(
         0,
         help="""
@@ -1291,6 +1499,28 @@ class JupyterHub(Application):
         """,
     ).tag(config=True)
 
+    init_spawners_concurrency = Integer(
+        0,
+        help="""
+        Maximum number of spawners to check concurrently at Hub startup.
+
+        Checking a spawner polls it and, if it's running,
+        waits for its server to respond.
+        With many running servers,
+        checking them all at once can overload the spawner backend.
+
+        Servers are checked most recently active first.
+        A user's servers that haven't been checked yet
+        are checked immediately when the user makes a request to the Hub.
+        Use with `init_spawners_timeout` to let the Hub start
+        while checks continue in the background.
+
+        0 (default) means no limit.
+
+        .. versionadded:: 4.0
+        """,
+    ).tag(config=True)
+
     init_spawners_timeout = Integer(
         10,
         help="""
@@ -1350,7 +1580,30 @@ class JupyterHub(Application):
     @default('users')
     def _users_default(self):
         assert self.tornado_settings
-        return UserDict(db_factory=lambda: self.db, settings=self.tornado_settings)
+        return UserDict(
+            db_factory=lambda: self.db,
+            settings=self.tornado_settings,
+            max_resident=self.max_resident_users,
+        )
+
+    max_resident_users = Integer(
+        0,
+        help="""Maximum number of users to keep in memory.
+
+        The Hub keeps an in-memory object for every user it has loaded,
+        e.g. by login or API requests.
+        If set, when more than this many users are loaded,
+        the least-recently used users with no active or pending servers
+        are removed from memory (they remain in the database, and are reloaded when needed).
+
+        Users with running servers are always kept,
+        so this is a soft limit.
+
+        Set to 0 (default) for no limit.
+
+        .. versionadded:: 4.0
+        """,
+    ).tag(config=True)
 
     admin_access = Bool(
         False,
@@ -2345,6 +2598,9 @@ class JupyterHub(Application):
     async def init_api_tokens(self):
         """Load predefined API tokens (for services) into database"""
 
+        orm.APIToken.verified_cache.configure(
+            maxsize=self.token_cache_max_size, ttl=self.token_cache_max_age
+        )
         await self._add_tokens(self.service_tokens, kind='service')
         await self._add_tokens(self.api_tokens, kind='user')
 
@@ -2500,6 +2756,9 @@ class JupyterHub(Application):
     async def init_spawners(self):
         self.log.debug("Initializing spawners")
         db = self.db
+        # create the poll scheduler with our config,
+        # before any spawners start polling
+        PollScheduler.instance(parent=self)
 
         def _user_summary(user):
             """user is an orm.User, not a full user"""
@@ -2520,17 +2779,25 @@ class JupyterHub(Application):
             await self.proxy.delete_user(user, server_name)
             await user.stop(server_name)
 
+        # statuses of spawners polled together with poll_many
+        statuses = {}
+
         async def check_spawner(user, name, spawner):
             status = 0
-            if spawner.server:
+            if spawner in statuses:
+                status = statuses[spawner]
+            elif spawner.server:
                 try:
                     status = await spawner.poll()
-                except Exception:
-                    self.log.exception(
-                        "Failed to poll spawner for %s, assuming the spawner is not running.",
-                        spawner._log_name,
-                    )
-                    status = -1
+                except Exception as e:
+                    status = e
+            if isinstance(status, Exception):
+                self.log.error(
+                    "Failed to poll spawner for %s, assuming the spawner is not running.",
+                    spawner._log_name,
+                    exc_info=status,
+                )
+                status = -1
 
             if status is None:
                 # poll claims it's running.
@@ -2572,6 +2839,7 @@ class JupyterHub(Application):
                 self.log.info("%s still running", user.name)
                 spawner.add_poll_callback(user_stopped, user, name)
                 spawner.start_polling()
+                INIT_SPAWNERS_CHECKED.labels(status=InitSpawnerStatus.running).inc()
             else:
                 # user not running. This is expected if server is None,
                 # but indicates the user's server died while the Hub wasn't running
@@ -2586,15 +2854,17 @@ class JupyterHub(Application):
                     spawner.server = None
                 else:
                     self.log.debug("%s not running", spawner._log_name)
+                INIT_SPAWNERS_CHECKED.labels(status=InitSpawnerStatus.stopped).inc()
 
             spawner._check_pending = False
+            INIT_SPAWNERS_PENDING.dec()
 
         # parallelize checks for running Spawners
         # run query on extant Server objects
         # so this is O(running servers) not O(total users)
         # Server objects can be associated with either a Spawner or a Service,
         # we are only interested in the ones associated with a Spawner
-        check_futures = []
+        to_check = []
         for orm_server in db.query(orm.Server):
             orm_spawner = orm_server.spawner
             if not orm_spawner:
@@ -2612,18 +2882,84 @@ class JupyterHub(Application):
             self.log.debug("Loading state for %s from db", spawner._log_name)
             # signal that check is pending to avoid race conditions
             spawner._check_pending = True
-            f = asyncio.ensure_future(check_spawner(user, spawner.name, spawner))
-            check_futures.append(f)
+            to_check.append((user, spawner))
+
+        # check the most recently active servers first
+        to_check.sort(
+            key=lambda item: item[1].orm_spawner.last_activity or datetime.min,
+            reverse=True,
+        )
+        INIT_SPAWNERS_PENDING.set(len(to_check))
+
+        checks = {}
+
+        def start_check(user, spawner):
+            """Start checking a spawner, unless it's already started"""
+            if spawner not in checks:
+                checks[spawner] = asyncio.ensure_future(
+                    check_spawner(user, spawner.name, spawner)
+                )
+            return checks[spawner]
+
+        def start_user_checks(user, spawners):
+            """Check a user's servers now, e.g. when the user makes a request"""
+            self.log.debug("Checking servers for %s on demand", user.name)
+            for spawner in spawners:
+                start_check(user, spawner)
+
+        # users whose servers haven't been checked yet
+        spawners_by_user = defaultdict(list)
+        for user, spawner in to_check:
+            spawners_by_user[user.id].append(spawner)
+        self._queued_spawner_checks.clear()
+        for user_id, spawners in spawners_by_user.items():
+            self._queued_spawner_checks[user_id] = partial(
+                start_user_checks, self.users[user_id], spawners
+            )
 
         # it's important that we get here before the first await
         # so that we know all spawners are instantiated and in the check-pending state
 
-        # await checks after submitting them all
-        if check_futures:
+        # poll spawners together, with one poll_many call per Spawner class
+        # (other spawners are polled individually, as they are checked)
+        by_class = defaultdict(list)
+        for user, spawner in to_check:
+            if spawner.server and _polls_many(type(spawner)):
+                by_class[type(spawner)].append(spawner)
+
+        async def poll_many(spawner_class, spawners):
+            try:
+                results = await spawner_class.poll_many(spawners)
+            except Exception as e:
+                results = [e] * len(spawners)
+            statuses.update(zip(spawners, results))
+
+        await asyncio.gather(
+            *(poll_many(cls, spawners) for cls, spawners in by_class.items())
+        )
+
+        async def check_worker(queue):
+            for user, spawner in queue:
+                if spawner in checks:
+                    # already checked on demand
+                    continue
+                await start_check(user, spawner)
+
+        # check spawners with at most init_spawners_concurrency checks at a time
+        if to_check:
+            concurrency = self.init_spawners_concurrency or len(to_check)
             self.log.debug(
-                "Awaiting checks for %i possibly-running spawners", len(check_futures)
+                "Checking %i possibly-running spawners, %i at a time",
+                len(to_check),
+                min(concurrency, len(to_check)),
+            )
+            queue = iter(to_check)
+            await asyncio.gather(
+                *(check_worker(queue) for i in range(min(concurrency, len(to_check))))
             )
-            await asyncio.gather(*check_futures)
+            # wait for any checks started on demand
+            await asyncio.gather(*checks.values())
+        self._queued_spawner_checks.clear()
         db.commit()
 
         # only perform this query if we are going to log it
@@ -2631,9 +2967,17 @@ class JupyterHub(Application):
             user_summaries = map(_user_summary, self.users.values())
             self.log.debug("Loaded users:\n%s", '\n'.join(user_summaries))
 
-        active_counts = self.users.count_active_users()
+        active_counts = self.users.recount_active_users()
+        RUNNING_SERVERS.set(active_counts['active'])
+        return len(to_check)
+
+    def recount_servers(self):
+        """Check the incremental counts of active servers against a full recount
+
+        run periodically
+        """
+        active_counts = self.users.recount_active_users()
         RUNNING_SERVERS.set(active_counts['active'])
-        return len(check_futures)
 
     def init_oauth(self):
         base_url = self.hub.base_url
@@ -2750,6 +3094,7 @@ class JupyterHub(Application):
             admin_access=self.admin_access,
             api_page_default_limit=self.api_page_default_limit,
             api_page_max_limit=self.api_page_max_limit,
+            api_page_total_count=self.api_page_total_count,
             authenticator=self.authenticator,
             spawner_class=self.spawner_class,
             base_url=self.base_url,
@@ -2790,6 +3135,10 @@ class JupyterHub(Application):
             trusted_alt_names=self.trusted_alt_names,
             shutdown_on_logout=self.shutdown_on_logout,
             eventlog=self.eventlog,
+            token_verifier=self.token_verifier,
+            activity_buffer=self.activity_buffer,
+            queued_spawner_checks=self._queued_spawner_checks,
+            spawn_queue=self.spawn_queue,
             app=self,
             xsrf_cookies=True,
         )
@@ -2955,7 +3304,7 @@ class JupyterHub(Application):
                 # To avoid races with partially-complete start,
                 # ensure that start is complete before running this check.
                 await self._start_future
-                await self.proxy.check_routes(self.users, self._service_map)
+                await self.proxy.check_routes(self.users, self._service_map, full=True)
 
             asyncio.ensure_future(finish_init_spawners())
         metrics_updater = PeriodicMetricsCollector(parent=self, db=self.db)
@@ -2999,8 +3348,14 @@ class JupyterHub(Application):
             except Exception as e:
                 self.log.error("Failed to stop user: %s", e)
 
+        if self.activity_buffer is not None:
+            self.activity_buffer.flush()
+
         self.db.commit()
 
+        if self.token_verifier is not None:
+            self.token_verifier.shutdown()
+
         if self.pid_file and os.path.exists(self.pid_file):
             self.log.info("Cleaning up PID file %s", self.pid_file)
             os.remove(self.pid_file)
@@ -3043,11 +3398,31 @@ class JupyterHub(Application):
 
     @catch_db_error
     async def update_last_activity(self):
-        """Update User.last_activity timestamps from the proxy"""
-        routes = await self.proxy.get_all_routes()
+        """Update User.last_activity timestamps from the proxy
+
+        Between full checks (see last_activity_full_interval),
+        only routes with activity since the previous update are fetched.
+        """
+        now = datetime.utcnow()
+        full = (
+            self._last_activity_poll is None
+            or self.last_activity_full_interval <= 0
+            or self._last_activity_full_check is None
+            or time.monotonic() - self._last_activity_full_check
+            >= self.last_activity_full_interval
+        )
+        if full:
+            routes = await self.proxy.get_all_routes()
+            self._last_activity_full_check = time.monotonic()
+        else:
+            routes = await self.proxy.get_routes_active_since(self._last_activity_poll)
+        self._last_activity_poll = now
+        update_start = time.perf_counter()
         users_count = 0
         active_users_count = 0
-        now = datetime.utcnow()
+
+        # collect activity by (user, server) name, before touching the database
+        route_activity = {}
         for prefix, route in routes.items():
             route_data = route['data']
             if 'user' not in route_data:
@@ -3056,43 +3431,54 @@ class JupyterHub(Application):
             if 'server_name' not in route_data:
                 continue
             users_count += 1
-            if 'last_activity' not in route_data:
+            dt = _route_last_activity(route)
+            if dt is None:
                 # no last activity data (possibly proxy other than CHP)
                 continue
-            user = orm.User.find(self.db, route_data['user'])
+            key = (route_data['user'], route_data['server_name'])
+            route_activity[key] = (route, dt)
+
+        # load all users with routes and their spawners in two queries
+        user_names = {user_name for user_name, server_name in route_activity}
+        if user_names:
+            orm_users = {
+                orm_user.name: orm_user
+                for orm_user in self.db.query(orm.User)
+                .filter(orm.User.name.in_(user_names))
+                .options(selectinload(orm.User._orm_spawners))
+            }
+        else:
+            orm_users = {}
+
+        # use the activity buffer if enabled,
+        # otherwise write everything at once below
+        activity = self.activity_buffer or ActivityBuffer(lambda: self.db, log=self.log)
+        for (user_name, server_name), (route, dt) in route_activity.items():
+            user = orm_users.get(user_name)
             if user is None:
                 self.log.warning("Found no user for route: %s", route)
                 continue
-            spawner = user.orm_spawners.get(route_data['server_name'])
+            spawner = user.orm_spawners.get(server_name)
             if spawner is None:
                 self.log.warning("Found no spawner for route: %s", route)
                 continue
-            dt = parse_date(route_data['last_activity'])
-            if dt.tzinfo:
-                # strip timezone info to naive UTC datetime
-                dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
-
-            if user.last_activity:
-                user.last_activity = max(user.last_activity, dt)
-            else:
-                user.last_activity = dt
-            if spawner.last_activity:
-                spawner.last_activity = max(spawner.last_activity, dt)
-            else:
-                spawner.last_activity = dt
+            activity.record(user, dt)
+            activity.record(spawner, dt)
             if (now - user.last_activity).total_seconds() < self.active_user_window:
                 active_users_count += 1
-        self.statsd.gauge('users.running', users_count)
-        self.statsd.gauge('users.active', active_users_count)
-
-        try:
-            self.db.commit()
-        except SQLAlchemyError:
-            self.log.exception("Rolling back session due to database error")
-            self.db.rollback()
-            return
+        if full:
+            # counts are only complete with the full routing table
+            self.statsd.gauge('users.running', users_count)
+            self.statsd.gauge('users.active', active_users_count)
+
+        if activity is not self.activity_buffer:
+            activity.flush()
+        UPDATE_LAST_ACTIVITY_DURATION_SECONDS.observe(
+            time.perf_counter() - update_start
+        )
 
-        await self.proxy.check_routes(self.users, self._service_map, routes)
+        if full:
+            await self.proxy.check_routes(self.users, self._service_map, routes)
 
     async def start(self):
         """Start the whole thing"""
@@ -3236,6 +3622,18 @@ class JupyterHub(Application):
             self.last_activity_callback = pc
             pc.start()
 
+        if self.activity_buffer is not None:
+            pc = PeriodicCallback(
+                self.activity_buffer.flush, 1e3 * self.activity_flush_interval
+            )
+            pc.start()
+
+        if self.recount_servers_interval:
+            pc = PeriodicCallback(
+                self.recount_servers, 1e3 * self.recount_servers_interval
+            )
+            pc.start()
+
         if self.proxy.should_start:
             self.log.info("JupyterHub is now running at %s", self.proxy.public_url)
         else:
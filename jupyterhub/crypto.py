@@ -1,6 +1,8 @@
+import asyncio
 import base64
 import json
 import os
+import time
 from binascii import a2b_hex
 from concurrent.futures import ThreadPoolExecutor
 
@@ -17,7 +19,8 @@ except ImportError:
         pass
 
 
-from .utils import maybe_future
+from .metrics import TOKEN_VERIFY_DURATION_SECONDS, TOKEN_VERIFY_PENDING
+from .utils import compare_token, maybe_future
 
 KEY_ENV = 'JUPYTERHUB_CRYPT_KEY'
 
@@ -170,3 +173,53 @@ def decrypt(data):
     Returns a Future whose result will be the decrypted, deserialized data.
     """
     return CryptKeeper.instance().decrypt(data)
+
+
+class TokenVerifierBusy(Exception):
+    """Raised when too many token checks are already pending"""
+
+    def __str__(self):
+        return "Too many pending token verifications"
+
+
+class TokenVerifier:
+    """Check token hashes in a bounded pool of threads
+
+    Keeps repeated hashing of tokens from blocking the event loop.
+    Only the hash comparison runs in the pool,
+    database access stays on the calling thread.
+
+    Use `compare` as the `compare` argument of :meth:`.orm.APIToken.find_async`.
+
+    .. versionadded:: 4.0
+    """
+
+    def __init__(self, n_threads, max_pending=0):
+        self.executor = ThreadPoolExecutor(
+            n_threads, thread_name_prefix="jupyterhub-token-verify"
+        )
+        self.max_pending = max_pending
+        self.pending = 0
+
+    async def compare(self, hashed, token):
+        """Check `token` against `hashed` in the pool
+
+        Raises TokenVerifierBusy if `max_pending` checks are already queued or running.
+        """
+        if self.max_pending and self.pending >= self.max_pending:
+            raise TokenVerifierBusy()
+        self.pending += 1
+        TOKEN_VERIFY_PENDING.set(self.pending)
+        start = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(
+                self.executor.submit(compare_token, hashed, token)
+            )
+        finally:
+            self.pending -= 1
+            TOKEN_VERIFY_PENDING.set(self.pending)
+            TOKEN_VERIFY_DURATION_SECONDS.observe(time.perf_counter() - start)
+
+    def shutdown(self):
+        """Shutdown the thread pool"""
+        self.executor.shutdown(wait=False)
@@ -23,6 +23,7 @@ from tornado.log import app_log
 from tornado.web import RequestHandler, addslash
 
 from .. import __version__, orm, roles, scopes
+from ..crypto import TokenVerifierBusy
 from ..metrics import (
     PROXY_ADD_DURATION_SECONDS,
     PROXY_DELETE_DURATION_SECONDS,
@@ -89,6 +90,10 @@ class BaseHandler(RequestHandler):
         self.expanded_scopes = set()
         try:
             await self.get_current_user()
+        except TokenVerifierBusy as e:
+            # shed load instead of queuing more token checks
+            self._jupyterhub_user = None
+            raise web.HTTPError(429, str(e))
         except Exception as e:
             # ensure get_current_user is never called again for this handler,
             # since it failed
@@ -284,14 +289,21 @@ class BaseHandler(RequestHandler):
         If last_activity was more recent than self.activity_resolution seconds ago,
         do nothing to avoid unnecessarily frequent database commits.
 
+        If the Hub buffers activity (JupyterHub.activity_flush_interval),
+        activity is recorded in the buffer and there is nothing to commit.
+
         Args:
             obj: an ORM object with a last_activity attribute
             timestamp (datetime, optional): the timestamp of activity to register.
         Returns:
-            recorded (bool): True if activity was recorded, False if not.
+            recorded (bool): True if activity was recorded and should be committed, False if not.
         """
         if timestamp is None:
             timestamp = datetime.utcnow()
+        activity_buffer = self.settings.get("activity_buffer")
+        if activity_buffer is not None:
+            activity_buffer.record(obj, timestamp)
+            return False
         resolution = self.settings.get("activity_resolution", 0)
         if not obj.last_activity or resolution == 0:
             self.log.debug("Recording first activity for %s", obj)
@@ -364,14 +376,33 @@ class BaseHandler(RequestHandler):
             auth_info['auth_state'] = await user.get_auth_state()
         return await self.auth_to_user(auth_info, user)
 
-    @functools.lru_cache()
     def get_token(self):
         """get token from authorization header"""
+        if not hasattr(self, '_orm_token'):
+            token = self.get_auth_token()
+            if token is None:
+                self._orm_token = None
+            else:
+                self._orm_token = orm.APIToken.find(self.db, token)
+        return self._orm_token
+
+    async def _verify_token(self):
+        """Find the token from the authorization header in the token verifier pool
+
+        Populates the result of `get_token`.
+        Without a token verifier, token hashes are checked on the event loop.
+        Raises TokenVerifierBusy if the verifier's queue is full.
+        """
+        if hasattr(self, '_orm_token'):
+            return self._orm_token
+        verifier = self.settings.get('token_verifier')
         token = self.get_auth_token()
-        if token is None:
-            return None
-        orm_token = orm.APIToken.find(self.db, token)
-        return orm_token
+        if verifier is None or token is None:
+            return self.get_token()
+        self._orm_token = await orm.APIToken.find_async(
+            self.db, token, compare=verifier.compare
+        )
+        return self._orm_token
 
     def get_current_user_token(self):
         """get_current_user from Authorization header token"""
@@ -414,8 +445,7 @@ class BaseHandler(RequestHandler):
                 clear()
             return
         cookie_id = cookie_id.decode('utf8', 'replace')
-        u = self.db.query(orm.User).filter(orm.User.cookie_id == cookie_id).first()
-        user = self._user_from_orm(u)
+        user = self.users.get_by_cookie_id(cookie_id)
         if user is None:
             self.log.warning("Invalid cookie token")
             # have cookie, but it's not valid. Clear it and start over.
@@ -436,17 +466,28 @@ class BaseHandler(RequestHandler):
         """get_current_user from a cookie token"""
         return self._user_for_cookie(self.hub.cookie_name)
 
+    def _check_spawners_now(self, user):
+        """Check a user's servers now, if they are still waiting to be checked after Hub startup"""
+        queued_checks = self.settings.get("queued_spawner_checks")
+        if queued_checks:
+            start_checks = queued_checks.pop(user.id, None)
+            if start_checks is not None:
+                start_checks()
+
     async def get_current_user(self):
         """get current username"""
         if not hasattr(self, '_jupyterhub_user'):
             user = None
             try:
                 if self._accept_token_auth:
+                    await self._verify_token()
                     user = self.get_current_user_token()
                 if user is None and self._accept_cookie_auth:
                     user = self.get_current_user_cookie()
                 if user and isinstance(user, User):
                     user = await self.refresh_auth(user)
+                if user and isinstance(user, User):
+                    self._check_spawners_now(user)
                 self._jupyterhub_user = user
             except Exception:
                 # don't let errors here raise more than once
@@ -897,9 +938,8 @@ class BaseHandler(RequestHandler):
             raise RuntimeError(f"{user_server_name} pending {pending}")
 
         # count active servers and pending spawns
-        # we could do careful bookkeeping to avoid
-        # but for 10k users this takes ~5ms
-        # and saves us from bookkeeping errors
+        # counts are updated as spawners change state,
+        # and periodically checked by JupyterHub.recount_servers_interval
         active_counts = self.users.count_active_users()
         spawn_pending_count = (
             active_counts['spawn_pending'] + active_counts['proxy_pending']
@@ -910,7 +950,14 @@ class BaseHandler(RequestHandler):
         concurrent_spawn_limit = self.concurrent_spawn_limit
         active_server_limit = self.active_server_limit
 
-        if concurrent_spawn_limit and spawn_pending_count >= concurrent_spawn_limit:
+        # with the spawn queue enabled, spawns over the limit wait instead
+        spawn_queue = self.settings.get('spawn_queue')
+
+        if (
+            concurrent_spawn_limit
+            and spawn_queue is None
+            and spawn_pending_count >= concurrent_spawn_limit
+        ):
             SERVER_SPAWN_DURATION_SECONDS.labels(
                 status=ServerSpawnStatus.throttled
             ).observe(time.perf_counter() - spawn_start_time)
@@ -1022,7 +1069,12 @@ class BaseHandler(RequestHandler):
 
         # hook up spawner._spawn_future so that other requests can await
         # this result
-        finish_spawn_future = spawner._spawn_future = maybe_future(finish_user_spawn())
+        if spawn_queue is not None:
+            # start the spawn when there's a free slot
+            finish_spawn = spawn_queue.run(spawner, finish_user_spawn())
+        else:
+            finish_spawn = finish_user_spawn()
+        finish_spawn_future = spawner._spawn_future = maybe_future(finish_spawn)
 
         def _clear_spawn_future(f):
             # clear spawner._spawn_future when it's done
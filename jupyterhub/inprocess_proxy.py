@@ -0,0 +1,397 @@
+"""An in-process proxy for JupyterHub
+
+Runs a tornado reverse proxy (HTTP and websockets) in the Hub process,
+instead of a separate configurable-http-proxy.
+The routing table is kept in memory,
+so adding and removing routes doesn't involve any network requests.
+
+Enable with::
+
+    c.JupyterHub.proxy_class = "inprocess"
+
+Suitable for small and medium deployments,
+where the Hub process has capacity to spare for proxying traffic.
+
+.. versionadded:: 4.0
+"""
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+import re
+import ssl
+from datetime import datetime
+from urllib.parse import quote
+
+from tornado import httputil, web
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError, HTTPRequest
+from tornado.httpserver import HTTPServer
+from tornado.websocket import WebSocketClosedError, WebSocketHandler, websocket_connect
+from traitlets import Any, Integer
+
+from .objects import Server
+from .proxy import Proxy, RouteTrie
+from .utils import isoformat, make_ssl_context, url_path_join
+
+# headers that apply to a single connection, and are not forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
+# headers set by the websocket client for the upstream connection
+WEBSOCKET_HEADERS = {
+    "sec-websocket-extensions",
+    "sec-websocket-key",
+    "sec-websocket-protocol",
+    "sec-websocket-version",
+}
+
+
+class ProxyHandler(WebSocketHandler):
+    """Forward a request, or a websocket, to the target of its route"""
+
+    SUPPORTED_METHODS = ("GET", "HEAD", "POST", "DELETE", "PATCH", "PUT", "OPTIONS")
+
+    def initialize(self, proxy):
+        self.proxy = proxy
+        self.upstream = None
+        self.routespec = None
+
+    def compute_etag(self):
+        # responses are passed through as-is
+        return None
+
+    def check_origin(self, origin):
+        # leave origin checks to the upstream server
+        return True
+
+    def select_subprotocol(self, subprotocols):
+        # accept the first requested subprotocol,
+        # the same one requested from the upstream server
+        return subprotocols[0] if subprotocols else None
+
+    def _route(self):
+        """Find the route for this request"""
+        host = self.request.host_name if self.proxy.host_routing else None
+        return self.proxy.route_table.match(self.request.path, host=host)
+
+    def _upstream_headers(self, exclude=()):
+        """Headers for the upstream request"""
+        headers = httputil.HTTPHeaders()
+        for name, value in self.request.headers.get_all():
+            if name.lower() in HOP_BY_HOP_HEADERS or name.lower() in exclude:
+                continue
+            headers.add(name, value)
+        forwarded_for = self.request.headers.get("X-Forwarded-For")
+        remote_ip = self.request.remote_ip or ""
+        if forwarded_for:
+            remote_ip = f"{forwarded_for}, {remote_ip}"
+        headers["X-Forwarded-For"] = remote_ip
+        headers["X-Forwarded-Proto"] = self.request.protocol
+        if ":" in self.request.host:
+            headers["X-Forwarded-Port"] = self.request.host.rsplit(":", 1)[1]
+        else:
+            headers["X-Forwarded-Port"] = (
+                "443" if self.request.protocol == "https" else "80"
+            )
+        return headers
+
+    def _target_url(self, route):
+        """The URL to forward this request to"""
+        uri = self.request.uri
+        path, sep, query = uri.partition("?")
+        # collapse repeated slashes, like configurable-http-proxy
+        uri = re.sub("/{2,}", "/", path) + sep + query
+        return route["target"].rstrip("/") + uri
+
+    async def get(self, *args, **kwargs):
+        if self.request.headers.get("Upgrade", "").lower() == "websocket":
+            if self._route() is None:
+                raise web.HTTPError(404)
+            await super().get(*args, **kwargs)
+        else:
+            await self.proxy_request()
+
+    async def head(self):
+        await self.proxy_request()
+
+    async def post(self):
+        await self.proxy_request()
+
+    async def delete(self):
+        await self.proxy_request()
+
+    async def patch(self):
+        await self.proxy_request()
+
+    async def put(self):
+        await self.proxy_request()
+
+    async def options(self):
+        await self.proxy_request()
+
+    async def proxy_request(self):
+        """Forward an HTTP request, streaming the response"""
+        match = self._route()
+        if match is None:
+            raise web.HTTPError(404)
+        self.routespec, route = match
+        self.proxy._touch(self.routespec)
+        url = self._target_url(route)
+
+        body = self.request.body
+        if not body and self.request.method not in {"POST", "PUT", "PATCH"}:
+            body = None
+
+        # set status and headers as they are received,
+        # so the body can be streamed
+        response_headers = httputil.HTTPHeaders()
+        status = {}
+
+        def header_callback(line):
+            if line.startswith("HTTP/"):
+                start_line = httputil.parse_response_start_line(line.strip())
+                status["code"] = start_line.code
+                status["reason"] = start_line.reason
+                response_headers.clear()
+            elif line.strip():
+                response_headers.parse_line(line)
+            elif status.get("code", 100) >= 200:
+                self.set_status(status["code"], status["reason"])
+                for name in ("Content-Type", "Date", "Server"):
+                    self.clear_header(name)
+                for name, value in response_headers.get_all():
+                    if name.lower() not in HOP_BY_HOP_HEADERS:
+                        self.add_header(name, value)
+
+        def streaming_callback(chunk):
+            self.write(chunk)
+            self.flush()
+
+        request = HTTPRequest(
+            url,
+            method=self.request.method,
+            headers=self._upstream_headers(),
+            body=body,
+            follow_redirects=False,
+            decompress_response=False,
+            allow_nonstandard_methods=True,
+            connect_timeout=self.proxy.connect_timeout,
+            request_timeout=self.proxy.request_timeout,
+            header_callback=header_callback,
+            streaming_callback=streaming_callback,
+            ssl_options=self.proxy.client_ssl_context,
+        )
+        try:
+            await self.proxy.client.fetch(request, raise_error=False)
+        except (HTTPClientError, OSError) as e:
+            self.proxy.log.warning("Proxy error for %s: %s", url, e)
+            if self._headers_written:
+                # already streaming the response, nothing more to say
+                return
+            await self.send_proxy_error(503)
+            return
+        self.finish()
+
+    async def send_proxy_error(self, status_code):
+        """Send the Hub's error page for a failed request"""
+        self.clear()
+        error_url = url_path_join(self.proxy.hub.url, "error", str(status_code))
+        error_url += "?url=" + quote(self.request.uri, safe="")
+        try:
+            response = await self.proxy.client.fetch(
+                error_url, ssl_options=self.proxy.client_ssl_context
+            )
+        except Exception as e:
+            self.proxy.log.error("Failed to get error page %s: %s", error_url, e)
+            self.send_error(status_code)
+            return
+        self.set_status(status_code)
+        self.set_header(
+            "Content-Type", response.headers.get("Content-Type", "text/html")
+        )
+        self.finish(response.body)
+
+    async def open(self, *args, **kwargs):
+        """Connect the upstream websocket"""
+        match = self._route()
+        if match is None:
+            # route removed since the request started
+            self.close(1011, "No route")
+            return
+        self.routespec, route = match
+        self.proxy._touch(self.routespec)
+        url = self._target_url(route)
+        url = "ws" + url[len("http") :]
+        subprotocols = self.request.headers.get("Sec-WebSocket-Protocol")
+        if subprotocols:
+            subprotocols = [p.strip() for p in subprotocols.split(",")]
+        request = HTTPRequest(
+            url,
+            headers=self._upstream_headers(exclude=WEBSOCKET_HEADERS),
+            connect_timeout=self.proxy.connect_timeout,
+            ssl_options=self.proxy.client_ssl_context,
+        )
+        try:
+            self.upstream = await websocket_connect(
+                request,
+                on_message_callback=self.on_upstream_message,
+                subprotocols=subprotocols or None,
+            )
+        except (HTTPClientError, OSError) as e:
+            self.proxy.log.warning("Proxy error for websocket %s: %s", url, e)
+            self.close(1011, "Failed to connect to upstream server")
+
+    def on_upstream_message(self, message):
+        if message is None:
+            # upstream closed
+            if self.ws_connection is not None:
+                self.close(self.upstream.close_code, self.upstream.close_reason)
+            return
+        self.proxy._touch(self.routespec)
+        try:
+            self.write_message(message, binary=isinstance(message, bytes))
+        except WebSocketClosedError:
+            self.upstream.close()
+
+    async def on_message(self, message):
+        self.proxy._touch(self.routespec)
+        if self.upstream is None:
+            return
+        try:
+            await self.upstream.write_message(
+                message, binary=isinstance(message, bytes)
+            )
+        except WebSocketClosedError:
+            self.close()
+
+    def on_close(self):
+        if self.upstream is not None:
+            self.upstream.close(self.close_code, self.close_reason)
+            self.upstream = None
+
+
+class InProcessProxy(Proxy):
+    """Proxy running in the Hub process
+
+    A tornado reverse proxy for HTTP and websockets,
+    listening on the Hub's public URL,
+    with the routing table kept in memory.
+
+    Routes are lost when the Hub stops,
+    so all servers are unreachable while the Hub is down,
+    unlike with an external configurable-http-proxy.
+
+    .. versionadded:: 4.0
+    """
+
+    connect_timeout = Integer(
+        20,
+        config=True,
+        help="Timeout (in seconds) for connecting to the target of a route.",
+    )
+
+    request_timeout = Integer(
+        0,
+        config=True,
+        help="""Timeout (in seconds) for a proxied request to complete.
+
+        0 (default) means no timeout,
+        which allows long-lived responses such as event streams.
+        """,
+    )
+
+    max_clients = Integer(
+        1000,
+        config=True,
+        help="Maximum number of concurrent requests to targets of routes.",
+    )
+
+    client = Any()
+
+    http_server = Any()
+
+    client_ssl_context = Any()
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.route_table = RouteTrie()
+
+    def _touch(self, routespec):
+        """Record activity on a route"""
+        route = self.route_table.get(routespec)
+        if route is not None:
+            route["data"]["last_activity"] = isoformat(datetime.utcnow())
+
+    async def start(self):
+        """Start listening on the public URL"""
+        public_server = Server.from_url(self.public_url)
+        ssl_context = None
+        if self.ssl_key and self.ssl_cert:
+            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            ssl_context.load_cert_chain(self.ssl_cert, self.ssl_key)
+        else:
+            self.log.warning(
+                "Running JupyterHub without SSL."
+                "  I hope there is SSL termination happening somewhere else..."
+            )
+        if self.app.internal_ssl:
+            certs = self.app.internal_proxy_certs['proxy-client']
+            self.client_ssl_context = make_ssl_context(
+                certs['keyfile'],
+                certs['certfile'],
+                cafile=self.app.internal_trust_bundles['proxy-client-ca'],
+            )
+
+        self.client = AsyncHTTPClient(force_instance=True, max_clients=self.max_clients)
+        application = web.Application(
+            [(r".*", ProxyHandler, {"proxy": self})],
+            log_function=self._log_request,
+        )
+        self.http_server = HTTPServer(
+            application, ssl_options=ssl_context, xheaders=False
+        )
+        self.log.info("Starting in-process proxy @ %s", public_server.bind_url)
+        self.http_server.listen(public_server.port, address=public_server.ip)
+
+    def _log_request(self, handler):
+        status = handler.get_status()
+        log_method = self.log.debug if status < 500 else self.log.warning
+        log_method(
+            "Proxy %i %s %s %.2fms",
+            status,
+            handler.request.method,
+            handler.request.uri,
+            1e3 * handler.request.request_time(),
+        )
+
+    def stop(self):
+        """Stop listening"""
+        if self.http_server is not None:
+            self.http_server.stop()
+            self.http_server = None
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+    async def add_route(self, routespec, target, data):
+        routespec = self.validate_routespec(routespec)
+        data = dict(data or {})
+        data["last_activity"] = isoformat(datetime.utcnow())
+        self.route_table.add(
+            routespec, {"routespec": routespec, "target": target, "data": data}
+        )
+
+    async def delete_route(self, routespec):
+        routespec = self.validate_routespec(routespec)
+        self.route_table.remove(routespec)
+
+    async def get_all_routes(self):
+        # last_activity is updated in place,
+        # so the snapshot only needs rebuilding when routes change
+        return self.route_table.snapshot()
@@ -22,7 +22,7 @@ them manually here.
 from datetime import timedelta
 from enum import Enum
 
-from prometheus_client import Gauge, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 from tornado.ioloop import PeriodicCallback
 from traitlets import Any, Bool, Integer
 from traitlets.config import LoggingConfigurable
@@ -51,6 +51,15 @@ RUNNING_SERVERS = Gauge(
 
 TOTAL_USERS = Gauge('jupyterhub_total_users', 'total number of users')
 
+RESIDENT_USERS = Gauge(
+    'jupyterhub_resident_users', 'number of users cached in memory by the Hub'
+)
+
+RESIDENT_SPAWNERS = Gauge(
+    'jupyterhub_resident_spawners',
+    'number of Spawner objects held in memory by cached users',
+)
+
 ACTIVE_USERS = Gauge(
     'jupyterhub_active_users',
     'number of users who were active in the given time period',
@@ -62,6 +71,11 @@ CHECK_ROUTES_DURATION_SECONDS = Histogram(
     'Time taken to validate all routes in proxy',
 )
 
+UPDATE_LAST_ACTIVITY_DURATION_SECONDS = Histogram(
+    'jupyterhub_update_last_activity_duration_seconds',
+    'Time taken to update last_activity from proxy routes',
+)
+
 HUB_STARTUP_DURATION_SECONDS = Histogram(
     'jupyterhub_hub_startup_duration_seconds', 'Time taken for Hub to start'
 )
@@ -70,11 +84,49 @@ INIT_SPAWNERS_DURATION_SECONDS = Histogram(
     'jupyterhub_init_spawners_duration_seconds', 'Time taken for spawners to initialize'
 )
 
+INIT_SPAWNERS_PENDING = Gauge(
+    'jupyterhub_init_spawners_pending',
+    'number of spawners waiting to be checked after Hub startup',
+)
+
+INIT_SPAWNERS_CHECKED = Counter(
+    'jupyterhub_init_spawners_checked',
+    'number of spawners checked after Hub startup',
+    ['status'],
+)
+
+
+class InitSpawnerStatus(Enum):
+    """
+    Possible values for 'status' label of INIT_SPAWNERS_CHECKED
+    """
+
+    running = 'running'
+    stopped = 'stopped'
+
+    def __str__(self):
+        return self.value
+
+
+for s in InitSpawnerStatus:
+    INIT_SPAWNERS_CHECKED.labels(status=s)
+
 PROXY_POLL_DURATION_SECONDS = Histogram(
     'jupyterhub_proxy_poll_duration_seconds',
     'duration for polling all routes from proxy',
 )
 
+ACTIVITY_FLUSH_DURATION_SECONDS = Histogram(
+    'jupyterhub_activity_flush_duration_seconds',
+    'time taken to write buffered last_activity updates to the database',
+)
+
+ACTIVITY_FLUSH_BATCH_SIZE = Histogram(
+    'jupyterhub_activity_flush_batch_size',
+    'number of objects with last_activity written per flush of the activity buffer',
+    buckets=[1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, float("inf")],
+)
+
 
 class ServerSpawnStatus(Enum):
     """
@@ -146,6 +198,34 @@ for s in ServerPollStatus:
     SERVER_POLL_DURATION_SECONDS.labels(status=s)
 
 
+SERVER_POLL_LAG_SECONDS = Histogram(
+    'jupyterhub_server_poll_lag_seconds',
+    'time from when a periodic server poll is due until it starts',
+    buckets=[0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf")],
+)
+
+SERVER_POLL_FAILURES = Counter(
+    'jupyterhub_server_poll_failures',
+    'number of periodic server polls that raised an error',
+)
+
+SERVER_POLLS_SCHEDULED = Gauge(
+    'jupyterhub_server_polls_scheduled',
+    'number of servers being polled periodically',
+)
+
+SPAWN_QUEUE_LENGTH = Gauge(
+    'jupyterhub_spawn_queue_length',
+    'number of spawns waiting in the queue for concurrent_spawn_limit',
+)
+
+SPAWN_QUEUE_WAIT_SECONDS = Histogram(
+    'jupyterhub_spawn_queue_wait_seconds',
+    'time spawns waited in the queue for concurrent_spawn_limit before starting',
+    buckets=[0.1, 1, 5, 10, 30, 60, 120, 300, 600, 1800, float("inf")],
+)
+
+
 SERVER_STOP_DURATION_SECONDS = Histogram(
     'jupyterhub_server_stop_seconds',
     'time taken for server stopping operation',
@@ -192,6 +272,107 @@ for s in ProxyDeleteStatus:
     PROXY_DELETE_DURATION_SECONDS.labels(status=s)
 
 
+PROXY_BULK_ROUTES = Counter(
+    'jupyterhub_proxy_bulk_routes',
+    'number of routes added to the proxy in bulk, e.g. when restoring routes',
+    ['status'],
+)
+
+
+class ProxyBulkRouteStatus(Enum):
+    """
+    Possible values for 'status' label of PROXY_BULK_ROUTES
+    """
+
+    success = 'success'
+    failure = 'failure'
+
+    def __str__(self):
+        return self.value
+
+
+for s in ProxyBulkRouteStatus:
+    PROXY_BULK_ROUTES.labels(status=s)
+
+
+PROXY_BULK_ROUTES_PER_SECOND = Gauge(
+    'jupyterhub_proxy_bulk_routes_per_second',
+    'rate at which routes were added to the proxy in the most recent bulk update',
+)
+
+
+TOKEN_CACHE_LOOKUPS = Counter(
+    'jupyterhub_token_cache_lookups',
+    'API token lookups answered by the verified-token cache',
+    ['result'],
+)
+
+
+class TokenCacheResult(Enum):
+    """
+    Possible values for 'result' label of TOKEN_CACHE_LOOKUPS
+    """
+
+    hit = 'hit'
+    miss = 'miss'
+
+    def __str__(self):
+        return self.value
+
+
+for s in TokenCacheResult:
+    TOKEN_CACHE_LOOKUPS.labels(result=s)
+
+
+SCOPES_CACHE_LOOKUPS = Counter(
+    'jupyterhub_scopes_cache_lookups',
+    'resolved scopes lookups for users, services and tokens answered by the scopes cache',
+    ['result'],
+)
+
+
+class ScopesCacheResult(Enum):
+    """
+    Possible values for 'result' label of SCOPES_CACHE_LOOKUPS
+    """
+
+    hit = 'hit'
+    miss = 'miss'
+
+    def __str__(self):
+        return self.value
+
+
+for s in ScopesCacheResult:
+    SCOPES_CACHE_LOOKUPS.labels(result=s)
+
+
+TOKEN_VERIFY_PENDING = Gauge(
+    'jupyterhub_token_verify_pending',
+    'number of token hash checks queued or running in the token verification pool',
+)
+
+TOKEN_VERIFY_DURATION_SECONDS = Histogram(
+    'jupyterhub_token_verify_duration_seconds',
+    'time taken to check a token hash in the token verification pool, including time queued',
+    buckets=[
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1,
+        2.5,
+        float("inf"),
+    ],
+)
+
+
 class ActiveUserPeriods(Enum):
     """
     Possible values for 'period' label of ACTIVE_USERS
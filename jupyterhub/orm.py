@@ -2,7 +2,10 @@
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
 import enum
+import hashlib
+import hmac
 import json
+import os
 from base64 import decodebytes, encodebytes
 from datetime import datetime, timedelta
 
@@ -40,6 +43,7 @@ from sqlalchemy.pool import StaticPool
 from sqlalchemy.types import LargeBinary, Text, TypeDecorator
 from tornado.log import app_log
 
+from ._memoize import TTLCache
 from .utils import compare_token, hash_token, new_token, random_port
 
 # top-level variable for easier mocking in tests
@@ -464,11 +468,23 @@ class Expiring:
 
 
 class Hashed(Expiring):
-    """Mixin for tables with hashed tokens"""
+    """Mixin for tables with hashed tokens
+
+    The hashing scheme is recorded as the first field of the stored hash,
+    so tokens hashed with an older scheme keep working.
+    Tokens stored with an older scheme are rehashed
+    with the current scheme the next time they are found.
+
+    .. versionchanged:: 4.0
+        New tokens are hashed with PBKDF2-HMAC-SHA256
+        instead of repeated SHA512 updates.
+    """
 
     prefix_length = 4
-    algorithm = "sha512"
-    rounds = 16384
+    algorithm = "pbkdf2-sha256"
+    # for the same brute-force cost as 16384 rounds of the legacy sha512 scheme,
+    # which hashed a ~512KB string once per check
+    rounds = 4096
     salt_bytes = 8
     min_length = 8
 
@@ -503,6 +519,30 @@ class Hashed(Expiring):
         """Is this my token?"""
         return compare_token(self.hashed, token)
 
+    @property
+    def needs_rehash(self):
+        """Whether the stored hash uses an outdated scheme"""
+        return self.hashed.split(':', 1)[0] != self.algorithm
+
+    def rehash(self, token):
+        """Store a hash of `token` with the current scheme
+
+        Only call this after `token` has matched.
+        Tokens hashed with a single legacy round were generated,
+        all others get the full number of rounds.
+        """
+        legacy_rounds = int(self.hashed.split(':', 2)[1])
+        self.generated = legacy_rounds <= self.generated_rounds
+        self.token = token
+
+    @classmethod
+    def _rehash_if_needed(cls, db, orm_token, token):
+        """Upgrade the stored hash of a matched token, if needed"""
+        if orm_token.needs_rehash:
+            app_log.info("Upgrading hash scheme for %s", orm_token)
+            orm_token.rehash(token)
+            db.commit()
+
     @classmethod
     def check_token(cls, db, token):
         """Check if a token is acceptable"""
@@ -546,6 +586,7 @@ class Hashed(Expiring):
         prefix_match = cls.find_prefix(db, token)
         for orm_token in prefix_match:
             if orm_token.match(token):
+                cls._rehash_if_needed(db, orm_token, token)
                 return orm_token
 
 
@@ -563,6 +604,82 @@ class GrantType(enum.Enum):
     refresh_token = 'refresh_token'
 
 
+class VerifiedTokenCache:
+    """Cache of already-verified tokens
+
+    Maps a keyed digest of a raw token to the id and hash of
+    the database row it was verified against,
+    so repeated lookups of the same token can skip
+    the prefix query and hash comparison.
+
+    The raw token is never stored.
+    The digest key is random per process,
+    so cache keys are useless outside this process.
+
+    Entries expire after `ttl` seconds, are evicted LRU beyond `maxsize`,
+    and are invalidated when their token is deleted.
+    A hit is only trusted if the row is still present with the same hash,
+    so stale entries can never resolve to a different token.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self._key = os.urandom(32)
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # token id -> cache key, for invalidation
+        self._keys_by_id = {}
+
+    @property
+    def enabled(self):
+        return self._cache.maxsize > 0 and self._cache.ttl > 0
+
+    def configure(self, maxsize, ttl):
+        """Update cache limits, dropping any cached entries"""
+        self._cache.maxsize = maxsize
+        self._cache.ttl = ttl
+        self.clear()
+
+    def cache_key(self, token):
+        """Keyed digest of a raw token, used as the cache key"""
+        return hmac.new(
+            self._key, token.encode('utf8', 'replace'), hashlib.sha256
+        ).digest()
+
+    def get(self, key):
+        """Return (token_id, hashed) for a cache key, or None"""
+        return self._cache.get(key)
+
+    def set(self, key, orm_token):
+        """Record that the token with cache `key` verified as `orm_token`"""
+        self._cache.set(key, (orm_token.id, orm_token.hashed))
+        self._keys_by_id[orm_token.id] = key
+        if len(self._keys_by_id) > 2 * self._cache.maxsize:
+            # drop reverse-index entries for keys that have left the cache
+            self._keys_by_id = {
+                token_id: key
+                for token_id, key in self._keys_by_id.items()
+                if key in self._cache
+            }
+
+    def discard(self, key):
+        """Remove a single cache key"""
+        entry = self._cache.pop(key)
+        if entry is not None:
+            self._keys_by_id.pop(entry[0], None)
+
+    def invalidate(self, token_id):
+        """Invalidate any cached entry for a token id"""
+        key = self._keys_by_id.pop(token_id, None)
+        if key is not None:
+            self._cache.pop(key)
+
+    def clear(self):
+        self._cache.clear()
+        self._keys_by_id.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+
 class APIToken(Hashed, Base):
     """An API token"""
 
@@ -612,6 +729,10 @@ class APIToken(Hashed, Base):
     # if issued during oauth to be stored in a cookie
     session_id = Column(Unicode(255), nullable=True)
 
+    # shared cache of verified tokens,
+    # configured by JupyterHub.token_cache_max_size/max_age
+    verified_cache = VerifiedTokenCache()
+
     # token metadata for bookkeeping
     now = datetime.utcnow  # for expiry
     created = Column(DateTime, default=datetime.utcnow)
@@ -647,25 +768,116 @@ class APIToken(Hashed, Base):
 
         `kind='user'` only returns API tokens for users
         `kind='service'` only returns API tokens for services
+
+        .. versionchanged:: 4.0
+            Tokens that have been verified recently are looked up
+            by id in :attr:`verified_cache`, skipping hash comparison.
         """
+        found, orm_token, candidates = cls._find_start(db, token, kind)
+        if found:
+            return orm_token
+        for orm_token in candidates:
+            if orm_token.match(token):
+                return cls._find_finish(db, orm_token, token)
+
+    @classmethod
+    async def find_async(cls, db, token, *, kind=None, compare):
+        """Find a token object by value, checking hashes with `compare`
+
+        Like :meth:`find`, but candidate hashes are checked by awaiting
+        `compare(hashed, token)`, so that the work of hashing
+        can be moved off of the event loop.
+        All database access still happens in the calling thread.
+
+        .. versionadded:: 4.0
+        """
+        found, orm_token, candidates = cls._find_start(db, token, kind)
+        if found:
+            return orm_token
+        for orm_token in candidates:
+            if await compare(orm_token.hashed, token):
+                return cls._find_finish(db, orm_token, token)
+
+    @classmethod
+    def _find_start(cls, db, token, kind):
+        """Lookup steps of find before hashes are compared
+
+        Returns (found, orm_token, candidates).
+        If `found` is True, `orm_token` is the result (which may be None).
+        Otherwise, `candidates` is the list of tokens whose hash should be checked.
+        """
+        if kind not in {'user', 'service', None}:
+            raise ValueError("kind must be 'user', 'service', or None, not %r" % kind)
+
+        cache = cls.verified_cache
+        if cache.enabled:
+            orm_token = cls._find_cached(db, cache.cache_key(token))
+            if orm_token is not None:
+                if cls._is_kind(orm_token, kind):
+                    return True, orm_token, []
+                return True, None, []
+
         prefix_match = cls.find_prefix(db, token)
         if kind == 'user':
             prefix_match = prefix_match.filter(cls.user_id != None)
         elif kind == 'service':
             prefix_match = prefix_match.filter(cls.service_id != None)
-        elif kind is not None:
-            raise ValueError("kind must be 'user', 'service', or None, not %r" % kind)
-        for orm_token in prefix_match:
-            if orm_token.match(token):
-                if not orm_token.client_id:
-                    app_log.warning(
-                        "Deleting stale oauth token for %s with no client",
-                        orm_token.user and orm_token.user.name,
-                    )
-                    db.delete(orm_token)
-                    db.commit()
-                    return
-                return orm_token
+        return False, None, prefix_match.all()
+
+    @classmethod
+    def _find_finish(cls, db, orm_token, token):
+        """Steps of find after `token` has matched `orm_token`"""
+        if not orm_token.client_id:
+            app_log.warning(
+                "Deleting stale oauth token for %s with no client",
+                orm_token.user and orm_token.user.name,
+            )
+            db.delete(orm_token)
+            db.commit()
+            return
+        cls._rehash_if_needed(db, orm_token, token)
+        cache = cls.verified_cache
+        if cache.enabled:
+            cache.set(cache.cache_key(token), orm_token)
+        return orm_token
+
+    @staticmethod
+    def _is_kind(orm_token, kind):
+        """Does a token belong to the given `kind` of owner?"""
+        if kind == 'user':
+            return orm_token.user_id is not None
+        elif kind == 'service':
+            return orm_token.service_id is not None
+        return True
+
+    @classmethod
+    def _find_cached(cls, db, cache_key):
+        """Find a token in the verified-token cache
+
+        Returns None on a cache miss, or if the cached token
+        has since been deleted, rehashed, or has expired.
+        """
+        # avoid circular import
+        from .metrics import TOKEN_CACHE_LOOKUPS, TokenCacheResult
+
+        cache = cls.verified_cache
+        cached = cache.get(cache_key)
+        orm_token = None
+        if cached is not None:
+            token_id, hashed = cached
+            orm_token = db.get(cls, token_id)
+            if (
+                orm_token is None
+                or orm_token.hashed != hashed
+                or (orm_token.expires_at and orm_token.expires_at < cls.now())
+            ):
+                cache.discard(cache_key)
+                orm_token = None
+        if orm_token is None:
+            TOKEN_CACHE_LOOKUPS.labels(result=TokenCacheResult.miss).inc()
+        else:
+            TOKEN_CACHE_LOOKUPS.labels(result=TokenCacheResult.hit).inc()
+        return orm_token
 
     @classmethod
     def new(
@@ -893,6 +1105,13 @@ def _notify_deleted_relationships(session, obj):
             _expire_relationship(obj, prop)
 
 
+@event.listens_for(Session, "persistent_to_deleted")
+def _invalidate_deleted_token(session, obj):
+    """Remove deleted API tokens from the verified-token cache"""
+    if isinstance(obj, APIToken):
+        APIToken.verified_cache.invalidate(obj.id)
+
+
 def register_ping_connection(engine):
     """Check connections before using them.
 
@@ -0,0 +1,290 @@
+"""Hub-wide scheduler for polling spawners
+
+Instead of one timer per running server,
+a single task keeps a heap of spawners ordered by their next poll time,
+spreading polls across each spawner's poll_interval
+and limiting how many `poll()` calls run at once.
+Spawner classes that implement `poll_many`
+have all their due polls checked together.
+
+.. versionadded:: 4.0
+"""
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+import asyncio
+import heapq
+import itertools
+import random
+import time
+
+from traitlets import Float, Integer
+from traitlets.config import SingletonConfigurable
+
+from .metrics import (
+    SERVER_POLL_DURATION_SECONDS,
+    SERVER_POLL_FAILURES,
+    SERVER_POLL_LAG_SECONDS,
+    SERVER_POLLS_SCHEDULED,
+    ServerPollStatus,
+)
+
+
+class _PollEntry:
+    """A spawner's place in the poll schedule"""
+
+    __slots__ = ("spawner", "active", "due")
+
+    def __init__(self, spawner):
+        self.spawner = spawner
+        self.active = True
+        self.due = None
+
+
+def _polls_many(spawner_class):
+    """Whether a class checks many spawners with a custom `poll_many`"""
+    # avoid circular import
+    from .spawner import Spawner
+
+    poll_many = getattr(spawner_class, "poll_many", None)
+    if poll_many is None:
+        return False
+    return getattr(poll_many, "__func__", None) is not Spawner.poll_many.__func__
+
+
+class PollScheduler(SingletonConfigurable):
+    """Schedule `Spawner.poll_and_notify` for all polling spawners
+
+    Used by :meth:`.Spawner.start_polling`.
+    Each spawner is polled every `poll_interval` seconds (with jitter),
+    starting at a random point in its first interval,
+    so polls are spread out rather than aligned.
+
+    When several spawners of a class that implements
+    :meth:`.Spawner.poll_many` are due,
+    they are checked with a single `poll_many` call.
+
+    .. versionadded:: 4.0
+    """
+
+    concurrency = Integer(
+        20,
+        config=True,
+        help="""Maximum number of spawner polls to run at the same time.
+
+        When more polls are due, they wait,
+        which is visible in the jupyterhub_server_poll_lag_seconds metric.
+        A batch of spawners checked with `poll_many` counts as one poll.
+
+        Set to 0 for no limit.
+        """,
+    )
+
+    jitter = Float(
+        0.1,
+        config=True,
+        help="""Random variation of each poll interval, as a fraction of the interval.
+
+        E.g. with 0.1 and poll_interval=30,
+        consecutive polls of a server are 27-33 seconds apart.
+        """,
+    )
+
+    batch_window = Float(
+        1,
+        config=True,
+        help="""Time window (in seconds) for checking polls together.
+
+        When a spawner whose class implements `poll_many` is polled,
+        other spawners of the same class due within this many seconds
+        are checked in the same `poll_many` call, slightly early.
+        """,
+    )
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # heap of (due time, sequence, entry)
+        self._heap = []
+        self._counter = itertools.count()
+        # spawner id: entry
+        self._entries = {}
+        self._loop = None
+        self._task = None
+        self._wakeup = None
+        self._semaphore = None
+        # hold references to running polls
+        self._polls = set()
+        # spawner class: whether it implements poll_many
+        self._batch_classes = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _interval(self, spawner):
+        """The time until a spawner's next poll, with jitter"""
+        interval = spawner.poll_interval
+        if self.jitter:
+            interval *= 1 + random.uniform(-self.jitter, self.jitter)
+        return interval
+
+    def _push(self, due, entry):
+        entry.due = due
+        heapq.heappush(self._heap, (due, next(self._counter), entry))
+        if self._heap[0][2] is entry and self._wakeup is not None:
+            # new earliest entry, wake up the scheduler
+            self._wakeup.set()
+
+    def add(self, spawner):
+        """Start polling a spawner every `spawner.poll_interval` seconds"""
+        self.remove(spawner)
+        entry = self._entries[id(spawner)] = _PollEntry(spawner)
+        SERVER_POLLS_SCHEDULED.set(len(self._entries))
+        self._ensure_running()
+        # first poll at a random point in the first interval
+        delay = random.uniform(0, spawner.poll_interval)
+        self._push(time.monotonic() + delay, entry)
+
+    def remove(self, spawner):
+        """Stop polling a spawner"""
+        entry = self._entries.pop(id(spawner), None)
+        if entry is not None:
+            # removed from the heap lazily
+            entry.active = False
+            SERVER_POLLS_SCHEDULED.set(len(self._entries))
+
+    def _ensure_running(self):
+        """Start the scheduler task in the current event loop"""
+        loop = asyncio.get_event_loop()
+        if loop is not self._loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            if self.concurrency > 0:
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+            else:
+                self._semaphore = None
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        """Run polls as they become due"""
+        while self._entries:
+            if not self._heap:
+                # all polls are running, wait for one to be rescheduled
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            due, _, entry = self._heap[0]
+            if not entry.active:
+                heapq.heappop(self._heap)
+                continue
+            now = time.monotonic()
+            if due > now:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), due - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            spawner_class = type(entry.spawner)
+            batch = None
+            if self._is_batch_class(spawner_class):
+                batch = [entry] + self._pop_due(spawner_class, now + self.batch_window)
+            semaphore = self._semaphore
+            if semaphore is not None:
+                await semaphore.acquire()
+            if batch is None:
+                if not entry.active:
+                    if semaphore is not None:
+                        semaphore.release()
+                    continue
+                SERVER_POLL_LAG_SECONDS.observe(time.monotonic() - due)
+                poll = self._poll(entry, semaphore)
+            else:
+                batch = [entry for entry in batch if entry.active]
+                if not batch:
+                    if semaphore is not None:
+                        semaphore.release()
+                    continue
+                now = time.monotonic()
+                for entry in batch:
+                    SERVER_POLL_LAG_SECONDS.observe(now - entry.due)
+                poll = self._poll_batch(spawner_class, batch, semaphore)
+            poll = asyncio.ensure_future(poll)
+            self._polls.add(poll)
+            poll.add_done_callback(self._polls.discard)
+        self._task = None
+
+    def _is_batch_class(self, spawner_class):
+        if spawner_class not in self._batch_classes:
+            self._batch_classes[spawner_class] = _polls_many(spawner_class)
+        return self._batch_classes[spawner_class]
+
+    def _pop_due(self, spawner_class, until):
+        """Remove entries for a spawner class due before `until` from the heap"""
+        due_entries = []
+        others = []
+        while self._heap and self._heap[0][0] <= until:
+            item = heapq.heappop(self._heap)
+            entry = item[2]
+            if not entry.active:
+                continue
+            if type(entry.spawner) is spawner_class:
+                due_entries.append(entry)
+            else:
+                others.append(item)
+        for item in others:
+            heapq.heappush(self._heap, item)
+        return due_entries
+
+    def _reschedule(self, entry):
+        """Schedule the next poll of a spawner"""
+        if entry.active:
+            # keep to the schedule, unless we've fallen behind it
+            due = entry.due + self._interval(entry.spawner)
+            self._push(max(due, time.monotonic()), entry)
+            self._ensure_running()
+
+    async def _poll(self, entry, semaphore=None):
+        """Poll one spawner and schedule its next poll"""
+        spawner = entry.spawner
+        start = time.perf_counter()
+        try:
+            status = await spawner.poll_and_notify()
+        except Exception:
+            SERVER_POLL_FAILURES.inc()
+            spawner.log.exception("Error polling %s", spawner._log_name)
+        else:
+            SERVER_POLL_DURATION_SECONDS.labels(
+                status=ServerPollStatus.from_status(status)
+            ).observe(time.perf_counter() - start)
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+        self._reschedule(entry)
+
+    async def _poll_batch(self, spawner_class, entries, semaphore=None):
+        """Poll spawners with one `poll_many` call and schedule their next polls"""
+        start = time.perf_counter()
+        try:
+            statuses = await spawner_class.poll_many(
+                [entry.spawner for entry in entries]
+            )
+        except Exception as e:
+            statuses = [e] * len(entries)
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+        duration = time.perf_counter() - start
+
+        for entry, status in zip(entries, statuses):
+            spawner = entry.spawner
+            if isinstance(status, Exception):
+                SERVER_POLL_FAILURES.inc()
+                spawner.log.error(
+                    "Error polling %s", spawner._log_name, exc_info=status
+                )
+            else:
+                SERVER_POLL_DURATION_SECONDS.labels(
+                    status=ServerPollStatus.from_status(status)
+                ).observe(duration)
+                await spawner._notify_poll(status)
+            self._reschedule(entry)
@@ -21,11 +21,13 @@ import json
 import os
 import signal
 import time
+from datetime import timezone
 from functools import wraps
 from subprocess import Popen
-from urllib.parse import quote, urlparse
+from urllib.parse import quote, unquote, urlparse
 from weakref import WeakKeyDictionary
 
+from dateutil.parser import parse as parse_date
 from tornado.httpclient import AsyncHTTPClient, HTTPError, HTTPRequest
 from tornado.ioloop import PeriodicCallback
 from traitlets import (
@@ -46,7 +48,13 @@ from traitlets.config import LoggingConfigurable
 from jupyterhub.traitlets import Command
 
 from . import utils
-from .metrics import CHECK_ROUTES_DURATION_SECONDS, PROXY_POLL_DURATION_SECONDS
+from .metrics import (
+    CHECK_ROUTES_DURATION_SECONDS,
+    PROXY_BULK_ROUTES,
+    PROXY_BULK_ROUTES_PER_SECOND,
+    PROXY_POLL_DURATION_SECONDS,
+    ProxyBulkRouteStatus,
+)
 from .objects import Server
 from .utils import AnyTimeoutError, exponential_backoff, url_escape_path, url_path_join
 
@@ -74,6 +82,166 @@ def _one_at_a_time(method):
     return locked_method
 
 
+def _route_last_activity(route):
+    """Return a route's last_activity as a naive UTC datetime
+
+    Returns None if the route has no activity data
+    (e.g. proxies other than CHP).
+    """
+    last_activity = route['data'].get('last_activity')
+    if not last_activity:
+        return None
+    dt = parse_date(last_activity)
+    if dt.tzinfo:
+        # strip timezone info to naive UTC datetime
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class _RouteNode:
+    """A node in a RouteTrie"""
+
+    __slots__ = ("children", "routespec")
+
+    def __init__(self):
+        self.children = {}
+        self.routespec = None
+
+
+class RouteTrie:
+    """In-memory routing table, as a trie of routespec path segments
+
+    For proxy implementations that keep their routing table in memory.
+    Adding, removing, and matching a route
+    take time proportional to the length of the path,
+    regardless of the number of routes.
+
+    Routes are stored by routespec, as returned by :meth:`Proxy.get_all_routes`.
+    A host-based routespec (`host.tld/path/`) uses the host as its first segment,
+    as produced by :meth:`Proxy.validate_routespec` with host routing.
+
+    The table has a version, incremented on every change,
+    so a proxy implementation that caches its routes locally
+    can tell whether anything changed since it last looked.
+
+    .. versionadded:: 4.0
+    """
+
+    def __init__(self, routes=None):
+        self._root = _RouteNode()
+        self._routes = {}
+        self.version = 0
+        self._snapshot = None
+        self._snapshot_version = None
+        if routes:
+            self.replace(routes)
+
+    @staticmethod
+    def _segments(path):
+        """Split a routespec or request path into unescaped segments"""
+        return [unquote(segment) for segment in path.split('/') if segment]
+
+    def __len__(self):
+        return len(self._routes)
+
+    def __contains__(self, routespec):
+        return routespec in self._routes
+
+    def __iter__(self):
+        return iter(self._routes)
+
+    def items(self):
+        return self._routes.items()
+
+    def get(self, routespec, default=None):
+        """Get a route by its exact routespec"""
+        return self._routes.get(routespec, default)
+
+    def snapshot(self):
+        """Return all routes, as a dict of routespec: route
+
+        The dict is only rebuilt when the table has changed,
+        so it must not be modified.
+        """
+        if self._snapshot_version != self.version:
+            self._snapshot = dict(self._routes)
+            self._snapshot_version = self.version
+        return self._snapshot
+
+    def replace(self, routes):
+        """Replace the whole table with a dict of routespec: route
+
+        Only routes that changed are updated,
+        so the version is unchanged if the routes are the same.
+        """
+        for routespec in [
+            routespec for routespec in self._routes if routespec not in routes
+        ]:
+            self.remove(routespec)
+        for routespec, route in routes.items():
+            if self._routes.get(routespec) != route:
+                self.add(routespec, route)
+
+    def add(self, routespec, route):
+        """Add or replace the route for a routespec"""
+        self.version += 1
+        node = self._root
+        for segment in self._segments(routespec):
+            node = node.children.setdefault(segment, _RouteNode())
+        if node.routespec is not None and node.routespec != routespec:
+            # the same path, spelled differently (e.g. escaped)
+            self._routes.pop(node.routespec, None)
+        node.routespec = routespec
+        self._routes[routespec] = route
+
+    def remove(self, routespec):
+        """Remove the route for a routespec
+
+        Returns the removed route, or None if there was no such route.
+        """
+        route = self._routes.pop(routespec, None)
+        if route is None:
+            return None
+        self.version += 1
+        segments = self._segments(routespec)
+        node = self._root
+        parents = []
+        for segment in segments:
+            parents.append(node)
+            node = node.children[segment]
+        node.routespec = None
+        # prune empty branches
+        for parent, segment in zip(reversed(parents), reversed(segments)):
+            child = parent.children[segment]
+            if child.children or child.routespec is not None:
+                break
+            del parent.children[segment]
+        return route
+
+    def match(self, path, host=None):
+        """Find the route with the longest prefix of a request path
+
+        For host-based routing, pass the request's host (without port),
+        which is matched as the first segment of the path.
+        The default route `/` matches any host.
+
+        Returns (routespec, route), or None if no route matches.
+        """
+        if host:
+            path = host + path
+        node = self._root
+        routespec = node.routespec
+        for segment in self._segments(path):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.routespec is not None:
+                routespec = node.routespec
+        if routespec is None:
+            return None
+        return routespec, self._routes[routespec]
+
+
 class Proxy(LoggingConfigurable):
     """Base class for configurable proxies that JupyterHub can use.
 
@@ -93,9 +261,12 @@ class Proxy(LoggingConfigurable):
     And the following method(s) are optional, but can be provided:
 
     - :meth:`.get_route` gets a single route.
-      There is a default implementation that extracts data from :meth:`.get_all_routes`,
+      There is a default implementation that looks up the route in :attr:`.route_table`
+      if there is one, or extracts data from :meth:`.get_all_routes`,
       but implementations may choose to provide a more efficient implementation
       of fetching a single route.
+    - :meth:`.get_routes_active_since` gets only routes with recent activity.
+      There is a default implementation that filters :meth:`.get_all_routes`.
     """
 
     db_factory = Any()
@@ -122,6 +293,44 @@ class Proxy(LoggingConfigurable):
         """,
     )
 
+    route_table = Any(
+        None,
+        help="""A :class:`RouteTrie` of this proxy's routes, if kept in memory
+
+        Proxy implementations that keep their routing table in memory,
+        or a local copy of it, can set this,
+        so :meth:`.get_route` doesn't need to fetch all routes.
+
+        .. versionadded:: 4.0
+        """,
+    )
+
+    check_routes_full_interval = Integer(
+        0,
+        config=True,
+        help="""Interval (in seconds) between full checks of the routing table.
+
+        The Proxy keeps track of the routes it should have,
+        updated as servers start and stop and routes are added or deleted.
+        Between full checks, :meth:`.check_routes` only retries routes
+        whose last update failed or has not been confirmed,
+        instead of comparing every running server with every route in the proxy.
+        A full check is still made at this interval,
+        catching any changes made outside the Hub.
+
+        Set to 0 (default) to make a full check every time.
+
+        .. versionadded:: 4.0
+        """,
+    )
+
+    # routespec: {'target': target, 'data': data} for routes that should exist
+    _desired_routes = Dict()
+    # routespec: generation for routes that may not match the desired state
+    _dirty_routes = Dict()
+    _route_generation = 0
+    _last_full_check = None
+
     extra_routes = Dict(
         key_trait=Unicode(),
         value_trait=Unicode(),
@@ -293,13 +502,160 @@ class Proxy(LoggingConfigurable):
 
             None: if there are no routes matching the given routespec
         """
-        # default implementation relies on get_all_routes
         routespec = self.validate_routespec(routespec)
+        if self.route_table is not None:
+            return self.route_table.get(routespec)
+        # otherwise rely on get_all_routes
         routes = await self.get_all_routes()
         return routes.get(routespec)
 
+    async def get_routes_active_since(self, since):
+        """Return the routes with activity since a given time
+
+        Used to update last_activity between full checks of the routing table,
+        so only routes with new activity need to be handled.
+
+        Args:
+            since (datetime): naive UTC datetime
+
+        Returns:
+            routes (dict): routes in the same format as :meth:`.get_all_routes`,
+                limited to those with `last_activity` in their data
+                at or after `since`.
+
+        The default implementation filters the result of :meth:`.get_all_routes`.
+
+        .. versionadded:: 4.0
+        """
+        routes = await self.get_all_routes()
+        active_routes = {}
+        for routespec, route in routes.items():
+            last_activity = _route_last_activity(route)
+            if last_activity is not None and last_activity >= since:
+                active_routes[routespec] = route
+        return active_routes
+
+    async def add_routes(self, routes):
+        """Add many routes to the proxy.
+
+        Used when restoring or checking the whole routing table.
+
+        Args:
+            routes (dict): routespec: {'target': target, 'data': data},
+                with the same meaning as the arguments to :meth:`.add_route`.
+
+        Returns:
+            failed (dict): routespec: Exception for each route that could not be added.
+
+        The default implementation calls :meth:`.add_route` for each route,
+        but implementations may choose to provide a more efficient implementation.
+
+        .. versionadded:: 4.0
+        """
+        results = await asyncio.gather(
+            *(
+                self.add_route(routespec, route['target'], dict(route['data']))
+                for routespec, route in routes.items()
+            ),
+            return_exceptions=True,
+        )
+        return {
+            routespec: result
+            for routespec, result in zip(routes, results)
+            if isinstance(result, Exception)
+        }
+
     # Most basic implementers must only implement above methods
 
+    def _set_desired_route(self, routespec, target=None, data=None):
+        """Record the desired state of a route, marking it dirty
+
+        target=None means the route should not exist.
+
+        Returns the generation of the change,
+        to be passed to :meth:`._clear_dirty_route` once the proxy is updated.
+        """
+        self._route_generation += 1
+        if target is None:
+            self._desired_routes.pop(routespec, None)
+        else:
+            self._desired_routes[routespec] = {'target': target, 'data': dict(data)}
+        self._dirty_routes[routespec] = self._route_generation
+        return self._route_generation
+
+    def _clear_dirty_route(self, routespec, generation):
+        """Mark a route as in sync, unless it has changed again since generation"""
+        if self._dirty_routes.get(routespec) == generation:
+            del self._dirty_routes[routespec]
+
+    @staticmethod
+    def _route_matches(route, desired):
+        """Whether a route in the proxy matches its desired state
+
+        Either may be None, for a route that doesn't (or shouldn't) exist.
+        """
+        if route is None or desired is None:
+            return route is None and desired is None
+        if route['target'] != desired['target']:
+            return False
+        return all(
+            route['data'].get(key) == value for key, value in desired['data'].items()
+        )
+
+    async def _sync_route(self, routespec, routes=None):
+        """Bring one route in the proxy in line with its desired state
+
+        If `routes` is given, the route is only updated if it differs.
+        """
+        generation = self._dirty_routes.get(routespec)
+        desired = self._desired_routes.get(routespec)
+        route = None
+        if routes is not None:
+            route = routes.get(routespec)
+            if self._route_matches(route, desired):
+                self._clear_dirty_route(routespec, generation)
+                return
+        if desired is None:
+            self.log.warning("Deleting stale route %s", routespec)
+            await self.delete_route(routespec)
+        elif route is None:
+            self.log.warning(
+                "Adding missing route for %s (%s)", routespec, desired['target']
+            )
+            await self.add_route(routespec, desired['target'], dict(desired['data']))
+        else:
+            self.log.warning(
+                "Updating route for %s (%s → %s)",
+                routespec,
+                route['target'],
+                desired['target'],
+            )
+            await self.add_route(routespec, desired['target'], dict(desired['data']))
+        self._clear_dirty_route(routespec, generation)
+
+    async def _add_desired_routes(self, routes):
+        """Record and add many routes with :meth:`.add_routes`
+
+        Routes that fail are logged and left dirty,
+        to be retried by the next :meth:`.check_routes`.
+        """
+        if not routes:
+            return
+        generations = {
+            routespec: self._set_desired_route(
+                routespec, route['target'], route['data']
+            )
+            for routespec, route in routes.items()
+        }
+        failed = await self.add_routes(routes)
+        for routespec, generation in generations.items():
+            if routespec in failed:
+                self.log.error(
+                    "Failed to add route for %s: %s", routespec, failed[routespec]
+                )
+            else:
+                self._clear_dirty_route(routespec, generation)
+
     async def add_service(self, service, client=None):
         """Add a service's server to the proxy table."""
         if not service.server:
@@ -315,14 +671,20 @@ class Proxy(LoggingConfigurable):
             service.server.host,
         )
 
-        await self.add_route(
-            service.proxy_spec, service.server.host, {'service': service.name}
-        )
+        routespec = service.proxy_spec
+        target = service.server.host
+        data = {'service': service.name}
+        generation = self._set_desired_route(routespec, target, data)
+        await self.add_route(routespec, target, dict(data))
+        self._clear_dirty_route(routespec, generation)
 
     async def delete_service(self, service, client=None):
         """Remove a service's server from the proxy table."""
         self.log.info("Removing service %s from proxy", service.name)
-        await self.delete_route(service.proxy_spec)
+        routespec = service.proxy_spec
+        generation = self._set_desired_route(routespec)
+        await self.delete_route(routespec)
+        self._clear_dirty_route(routespec, generation)
 
     async def add_user(self, user, server_name='', client=None):
         """Add a user's server to the proxy table."""
@@ -340,11 +702,12 @@ class Proxy(LoggingConfigurable):
                 % (spawner._log_name, spawner.pending)
             )
 
-        await self.add_route(
-            spawner.proxy_spec,
-            spawner.server.host,
-            {'user': user.name, 'server_name': server_name},
-        )
+        routespec = spawner.proxy_spec
+        target = spawner.server.host
+        data = {'user': user.name, 'server_name': server_name}
+        generation = self._set_desired_route(routespec, target, data)
+        await self.add_route(routespec, target, dict(data))
+        self._clear_dirty_route(routespec, generation)
 
     async def delete_user(self, user, server_name=''):
         """Remove a user's server from the proxy table."""
@@ -354,134 +717,171 @@ class Proxy(LoggingConfigurable):
                 user.proxy_spec, url_escape_path(server_name), '/'
             )
         self.log.info("Removing user %s from proxy (%s)", user.name, routespec)
+        generation = self._set_desired_route(routespec)
         await self.delete_route(routespec)
+        self._clear_dirty_route(routespec, generation)
 
     async def add_all_services(self, service_dict):
         """Update the proxy table from the database.
 
         Used when loading up a new proxy.
         """
-        futures = []
+        routes = {}
         for service in service_dict.values():
             if service.server:
-                futures.append(self.add_service(service))
-        # wait after submitting them all
-        await asyncio.gather(*futures)
+                routes[service.proxy_spec] = {
+                    'target': service.server.host,
+                    'data': {'service': service.name},
+                }
+        await self._add_desired_routes(routes)
 
     async def add_all_users(self, user_dict):
         """Update the proxy table from the database.
 
         Used when loading up a new proxy.
         """
-        futures = []
+        routes = {}
         for user in user_dict.values():
             for name, spawner in user.spawners.items():
                 if spawner.ready:
-                    futures.append(self.add_user(user, name))
-        # wait after submitting them all
-        await asyncio.gather(*futures)
+                    routes[spawner.proxy_spec] = {
+                        'target': spawner.server.host,
+                        'data': {'user': user.name, 'server_name': name},
+                    }
+        await self._add_desired_routes(routes)
 
     @_one_at_a_time
-    async def check_routes(self, user_dict, service_dict, routes=None):
-        """Check that all users are properly routed on the proxy."""
+    async def check_routes(self, user_dict, service_dict, routes=None, *, full=None):
+        """Check that all users are properly routed on the proxy.
+
+        A full check compares the routes for every running server and service
+        with the routes in the proxy.
+        In between full checks (see :attr:`check_routes_full_interval`),
+        only routes that may be out of sync are checked.
+
+        Args:
+            user_dict (UserDict): the Hub's users
+            service_dict (dict): the Hub's services
+            routes (dict, optional): the result of :meth:`.get_all_routes`,
+                if already fetched.
+            full (bool, optional): whether to make a full check.
+                By default, a full check is made if
+                check_routes_full_interval has passed since the last one.
+        """
+        if full is None:
+            full = (
+                self._last_full_check is None
+                or self.check_routes_full_interval <= 0
+                or time.monotonic() - self._last_full_check
+                >= self.check_routes_full_interval
+            )
+        if not full:
+            if self._dirty_routes:
+                self.log.debug("Checking %i routes", len(self._dirty_routes))
+                await asyncio.gather(
+                    *(
+                        self._sync_route(routespec, routes)
+                        for routespec in list(self._dirty_routes)
+                    )
+                )
+            return
+
         start = time.perf_counter()  # timer starts here when user is created
+        self._last_full_check = time.monotonic()
         if not routes:
             self.log.debug("Fetching routes to check")
             routes = await self.get_all_routes()
 
         self.log.debug("Checking routes")
 
-        user_routes = {path for path, r in routes.items() if 'user' in r['data']}
-        futures = []
-
-        good_routes = {self.app.hub.routespec}
+        # rebuild the desired routing table from the Hub's state
+        desired = {}
+        # routes to leave alone
+        pending_routes = set()
 
         hub = self.hub
-        if self.app.hub.routespec not in routes:
-            futures.append(self.add_hub_route(hub))
-        else:
-            route = routes[self.app.hub.routespec]
-            if route['target'] != hub.host:
-                self.log.warning(
-                    "Updating Hub route %s → %s", route['target'], hub.host
-                )
-                futures.append(self.add_hub_route(hub))
+        desired[self.app.hub.routespec] = {'target': hub.host, 'data': {'hub': True}}
 
         for user in user_dict.values():
             for name, spawner in user.spawners.items():
                 if spawner.ready:
-                    spec = spawner.proxy_spec
-                    good_routes.add(spec)
-                    if spec not in user_routes:
-                        self.log.warning(
-                            "Adding missing route for %s (%s)", spec, spawner.server
-                        )
-                        futures.append(self.add_user(user, name))
-                    else:
-                        route = routes[spec]
-                        if route['target'] != spawner.server.host:
-                            self.log.warning(
-                                "Updating route for %s (%s → %s)",
-                                spec,
-                                route['target'],
-                                spawner.server,
-                            )
-                            futures.append(self.add_user(user, name))
+                    desired[spawner.proxy_spec] = {
+                        'target': spawner.server.host,
+                        'data': {'user': user.name, 'server_name': name},
+                    }
                 elif spawner.pending:
                     # don't consider routes stale if the spawner is in any pending event
                     # wait until after the pending state clears before taking any actions
                     # they could be pending deletion from the proxy!
-                    good_routes.add(spawner.proxy_spec)
+                    spec = spawner.proxy_spec
+                    pending_routes.add(spec)
+                    if spec in self._desired_routes:
+                        desired[spec] = self._desired_routes[spec]
 
         # check service routes
-        service_routes = {
-            r['data']['service']: r for r in routes.values() if 'service' in r['data']
-        }
         for service in service_dict.values():
             if service.server is None:
                 continue
-            good_routes.add(service.proxy_spec)
-            if service.name not in service_routes:
-                self.log.warning(
-                    "Adding missing route for %s (%s)", service.name, service.server
-                )
-                futures.append(self.add_service(service))
-            else:
-                route = service_routes[service.name]
-                if route['target'] != service.server.host:
-                    self.log.warning(
-                        "Updating route for %s (%s → %s)",
-                        route['routespec'],
-                        route['target'],
-                        service.server.host,
-                    )
-                    futures.append(self.add_service(service))
+            desired[service.proxy_spec] = {
+                'target': service.server.host,
+                'data': {'service': service.name},
+            }
 
         # Add extra routes we've been configured for
         for routespec, url in self.extra_routes.items():
-            good_routes.add(routespec)
-            futures.append(self.add_route(routespec, url, {'extra': True}))
+            desired[routespec] = {'target': url, 'data': {'extra': True}}
 
-        # Now delete the routes that shouldn't be there
-        for routespec in routes:
-            if routespec not in good_routes:
-                self.log.warning("Deleting stale route %s", routespec)
-                futures.append(self.delete_route(routespec))
+        self._desired_routes = desired
+        self._dirty_routes = {}
+        futures = []
+        to_add = {}
+        for routespec in desired.keys() | routes.keys():
+            if routespec in pending_routes:
+                continue
+            route = routes.get(routespec)
+            if self._route_matches(route, desired.get(routespec)):
+                continue
+            if routespec in desired:
+                if route is None:
+                    self.log.warning(
+                        "Adding missing route for %s (%s)",
+                        routespec,
+                        desired[routespec]['target'],
+                    )
+                else:
+                    self.log.warning(
+                        "Updating route for %s (%s → %s)",
+                        routespec,
+                        route['target'],
+                        desired[routespec]['target'],
+                    )
+                to_add[routespec] = desired[routespec]
+            else:
+                self._route_generation += 1
+                self._dirty_routes[routespec] = self._route_generation
+                futures.append(self._sync_route(routespec, routes))
+        futures.append(self._add_desired_routes(to_add))
 
         await asyncio.gather(*futures)
         stop = time.perf_counter()  # timer stops here when user is deleted
         CHECK_ROUTES_DURATION_SECONDS.observe(stop - start)  # histogram metric
 
-    def add_hub_route(self, hub):
+    async def add_hub_route(self, hub):
         """Add the default route for the Hub"""
         self.log.info("Adding route for Hub: %s => %s", hub.routespec, hub.host)
-        return self.add_route(hub.routespec, self.hub.host, {'hub': True})
+        generation = self._set_desired_route(
+            hub.routespec, self.hub.host, {'hub': True}
+        )
+        await self.add_route(hub.routespec, self.hub.host, {'hub': True})
+        self._clear_dirty_route(hub.routespec, generation)
 
     async def restore_routes(self):
         self.log.info("Setting up routes on new proxy")
         await self.add_hub_route(self.app.hub)
-        await self.add_all_users(self.app.users)
-        await self.add_all_services(self.app._service_map)
+        await asyncio.gather(
+            self.add_all_users(self.app.users),
+            self.add_all_services(self.app._service_map),
+        )
         self.log.info("New proxy back up and good to go")
 
 
@@ -914,12 +1314,81 @@ class ConfigurableHTTPProxy(Proxy):
         )
         return result
 
-    async def add_route(self, routespec, target, data):
+    async def add_route(self, routespec, target, data, client=None):
+        route = {
+            'routespec': self.validate_routespec(routespec),
+            'target': target,
+            'data': dict(data or {}),
+        }
         body = data or {}
         body['target'] = target
         body['jupyterhub'] = True
         path = self._routespec_to_chp_path(routespec)
-        await self.api_request(path, method='POST', body=body)
+        await self.api_request(path, method='POST', body=body, client=client)
+        if self.route_table is not None:
+            self.route_table.add(route['routespec'], route)
+
+    async def add_routes(self, routes):
+        """Add many routes to CHP.
+
+        Routes are submitted by at most `concurrency` workers at a time,
+        sharing an HTTP client so connections can be reused
+        (connections are kept alive with pycurl).
+        Connection errors adding a route are retried with exponential backoff,
+        without interrupting the other routes.
+
+        .. versionadded:: 4.0
+        """
+        if not routes:
+            return {}
+        start = time.perf_counter()
+        failed = {}
+        pending = iter(routes.items())
+        client = AsyncHTTPClient(force_instance=True, max_clients=self.concurrency)
+
+        async def add(routespec, route):
+            async def _try_add():
+                try:
+                    await self.add_route(
+                        routespec, route['target'], dict(route['data']), client=client
+                    )
+                except OSError as e:
+                    self.log.warning(
+                        "Failed to add route %s, retrying: %s", routespec, e
+                    )
+                    return False
+                return True
+
+            await exponential_backoff(
+                _try_add, f"Failed to add route {routespec}", timeout=30
+            )
+
+        async def worker():
+            for routespec, route in pending:
+                try:
+                    await add(routespec, route)
+                except Exception as e:
+                    failed[routespec] = e
+
+        try:
+            await asyncio.gather(
+                *(worker() for i in range(min(self.concurrency, len(routes))))
+            )
+        finally:
+            client.close()
+
+        duration = time.perf_counter() - start
+        added = len(routes) - len(failed)
+        PROXY_BULK_ROUTES.labels(status=ProxyBulkRouteStatus.success).inc(added)
+        PROXY_BULK_ROUTES.labels(status=ProxyBulkRouteStatus.failure).inc(len(failed))
+        PROXY_BULK_ROUTES_PER_SECOND.set(added / duration if duration else 0)
+        self.log.info(
+            "Added %i routes to the proxy in %.1fs (%i failed)",
+            added,
+            duration,
+            len(failed),
+        )
+        return failed
 
     async def delete_route(self, routespec):
         path = self._routespec_to_chp_path(routespec)
@@ -933,6 +1402,8 @@ class ConfigurableHTTPProxy(Proxy):
                 self.log.warning("Route %s already deleted", routespec)
             else:
                 raise
+        if self.route_table is not None:
+            self.route_table.remove(self.validate_routespec(routespec))
 
     def _reformat_routespec(self, routespec, chp_data):
         """Reformat CHP data format to JupyterHub's proxy API."""
@@ -941,17 +1412,44 @@ class ConfigurableHTTPProxy(Proxy):
         return {'routespec': routespec, 'target': target, 'data': chp_data}
 
     async def get_all_routes(self, client=None):
-        """Fetch the proxy's routes."""
+        """Fetch the proxy's routes.
+
+        Also refreshes the local copy of the routing table
+        in :attr:`.route_table`, used by :meth:`.get_route`.
+        """
+        routes = await self._fetch_routes(client=client)
+        if self.route_table is None:
+            self.route_table = RouteTrie(routes)
+        else:
+            self.route_table.replace(routes)
+        return routes
+
+    async def get_routes_active_since(self, since, client=None):
+        """Fetch the proxy's routes with activity since a given time.
+
+        CHP's `inactive_since` filter selects the opposite set,
+        so the full table is fetched and filtered here,
+        before the more costly conversion of each route.
+
+        .. versionadded:: 4.0
+        """
+        return await self._fetch_routes(client=client, active_since=since)
+
+    async def _fetch_routes(self, client=None, active_since=None):
         proxy_poll_start_time = time.perf_counter()
         resp = await self.api_request('', client=client)
         chp_routes = json.loads(resp.body.decode('utf8', 'replace'))
         all_routes = {}
         for chp_path, chp_data in chp_routes.items():
-            routespec = self._routespec_from_chp_path(chp_path)
             if 'jupyterhub' not in chp_data:
                 # exclude routes not associated with JupyterHub
-                self.log.debug("Omitting non-jupyterhub route %r", routespec)
+                self.log.debug("Omitting non-jupyterhub route %r", chp_path)
                 continue
+            if active_since is not None:
+                last_activity = _route_last_activity({'data': chp_data})
+                if last_activity is None or last_activity < active_since:
+                    continue
+            routespec = self._routespec_from_chp_path(chp_path)
             all_routes[routespec] = self._reformat_routespec(routespec, chp_data)
         PROXY_POLL_DURATION_SECONDS.observe(time.perf_counter() - proxy_poll_start_time)
         return all_routes
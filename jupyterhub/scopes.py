@@ -22,13 +22,17 @@ from enum import Enum
 from functools import lru_cache
 from itertools import chain
 from textwrap import indent
+from types import MappingProxyType
 
 import sqlalchemy as sa
+from sqlalchemy import event
 from tornado import web
 from tornado.log import app_log
 
 from . import orm, roles
-from ._memoize import DoNotCache, FrozenDict, lru_cache_key
+from ._group_index import groups_for_user, index_version
+from ._memoize import DoNotCache, FrozenDict, LRUCache, lru_cache_key
+from .metrics import SCOPES_CACHE_LOOKUPS, ScopesCacheResult
 
 """when modifying the scope definitions, make sure that `docs/source/rbac/generate-scope-table.py` is run
    so that changes are reflected in the documentation and REST API description."""
@@ -155,7 +159,8 @@ class Scope(Enum):
 
 def _intersection_cache_key(scopes_a, scopes_b, db=None):
     """Cache key function for scope intersections"""
-    return (frozenset(scopes_a), frozenset(scopes_b))
+    # intersections may depend on group membership
+    return (frozenset(scopes_a), frozenset(scopes_b), index_version(db))
 
 
 @lru_cache_key(_intersection_cache_key)
@@ -173,35 +178,21 @@ def _intersect_expanded_scopes(scopes_a, scopes_b, db=None):
     Otherwise, it can result in lower than intended permissions,
           (i.e. users!group=x & users!user=y will be empty, even if user y is in group x.)
     """
-    empty_set = frozenset()
     scopes_a = frozenset(scopes_a)
     scopes_b = frozenset(scopes_b)
 
-    # cached lookups for group membership of users and servers
-    @lru_cache()
-    def groups_for_user(username):
-        """Get set of group names for a given username"""
-        # if we need a group lookup, the result is not cacheable
-        nonlocal needs_db
-        needs_db = True
-        user = db.query(orm.User).filter_by(name=username).first()
-        if user is None:
-            return empty_set
-        else:
-            return {group.name for group in user.groups}
-
-    @lru_cache()
     def groups_for_server(server):
         """Get set of group names for a given server"""
         username, _, servername = server.partition("/")
-        return groups_for_user(username)
+        return groups_for_user(db, username)
 
     parsed_scopes_a = parse_scopes(scopes_a)
     parsed_scopes_b = parse_scopes(scopes_b)
 
-    # track whether we need a db lookup (for groups)
-    # because we can't cache the intersection if we do
-    # if there are no group filters, this is cacheable
+    # track whether group membership couldn't be checked
+    # because we can't cache the intersection if so.
+    # With db, group membership comes from the group index,
+    # whose version is part of the cache key.
     needs_db = False
 
     common_bases = parsed_scopes_a.keys() & parsed_scopes_b.keys()
@@ -271,7 +262,6 @@ def _intersect_expanded_scopes(scopes_a, scopes_b, db=None):
                     # resolve group/server hierarchy if db available
                     servers = servers.difference(common_servers)
                     if db is not None and servers and 'group' in b:
-                        needs_db = True
                         for server in servers:
                             server_groups = groups_for_server(server)
                             if server_groups & b['group']:
@@ -287,7 +277,7 @@ def _intersect_expanded_scopes(scopes_a, scopes_b, db=None):
                     # skip already-added users (includes overlapping users)
                     users = a['user'].difference(common_users)
                     for username in users:
-                        groups = groups_for_user(username)
+                        groups = groups_for_user(db, username)
                         if groups & b["group"]:
                             common_users.add(username)
 
@@ -301,26 +291,68 @@ def _intersect_expanded_scopes(scopes_a, scopes_b, db=None):
 
     intersection = unparse_scopes(common_filters)
     if needs_db:
-        # return intersection, but don't cache it if it needed db lookups
+        # return intersection, but don't cache it if it couldn't check groups
         return DoNotCache(intersection)
 
     return intersection
 
 
+# resolved scopes for users, services, groups and tokens,
+# keyed by the scopes generation,
+# which is bumped whenever roles, role assignments,
+# group membership or token scopes change
+_scopes_generation = 0
+_resolved_scopes_cache = LRUCache(maxsize=8192)
+
+
+def invalidate_scopes_cache():
+    """Invalidate all scopes cached by `get_scopes_for`
+
+    Called when roles, role assignments, group membership or token scopes change.
+    """
+    global _scopes_generation
+    _scopes_generation += 1
+    _resolved_scopes_cache.clear()
+
+
+def _scopes_cache_key(orm_object):
+    """Cache key for the resolved scopes of an orm object
+
+    None if the object's scopes should not be cached (e.g. not yet committed).
+    """
+    state = sa.inspect(orm_object)
+    if not state.persistent:
+        return None
+    if isinstance(orm_object, orm.APIToken):
+        # token ids may be reused, hashes are unique.
+        # Include scopes, which may be modified in place.
+        identity = (orm_object.hashed, tuple(orm_object.scopes))
+    else:
+        identity = orm_object.name
+    return (
+        _scopes_generation,
+        type(orm_object).__name__,
+        orm_object.id,
+        identity,
+    )
+
+
 def get_scopes_for(orm_object):
     """Find scopes for a given user or token from their roles and resolve permissions
 
+    Results are cached until roles, role assignments,
+    group membership or token scopes change.
+
     Arguments:
       orm_object: orm object or User wrapper
 
     Returns:
-      expanded scopes (set) for the orm object
+      expanded scopes (frozenset) for the orm object
       or
-      intersection (set) if orm_object == orm.APIToken
+      intersection (frozenset) if orm_object == orm.APIToken
     """
-    expanded_scopes = set()
     if orm_object is None:
-        return expanded_scopes
+        return frozenset()
 
     if not isinstance(orm_object, orm.Base):
         from .user import User
@@ -332,6 +364,72 @@ def get_scopes_for(orm_object):
                 f"Only allow orm objects or User wrappers, got {orm_object}"
             )
 
+    cache_key = _scopes_cache_key(orm_object)
+    if cache_key is not None:
+        expanded_scopes = _resolved_scopes_cache.get(cache_key)
+        if expanded_scopes is not None:
+            SCOPES_CACHE_LOOKUPS.labels(result=ScopesCacheResult.hit).inc()
+            return expanded_scopes
+        SCOPES_CACHE_LOOKUPS.labels(result=ScopesCacheResult.miss).inc()
+
+    expanded_scopes = frozenset(_resolve_scopes_for(orm_object))
+    if cache_key is not None:
+        _resolved_scopes_cache[cache_key] = expanded_scopes
+    return expanded_scopes
+
+
+def _is_new_principal(obj):
+    """Whether obj is a user, service or token not yet in the database
+
+    Such objects can't have cached scopes,
+    so changing them doesn't need to invalidate the cache.
+    """
+    return (
+        isinstance(obj, (orm.User, orm.Service, orm.APIToken))
+        and not sa.inspect(obj).persistent
+    )
+
+
+def _invalidate_on_collection_change(attribute):
+    """Invalidate cached scopes when items are added to or removed from a relationship
+
+    Backrefs fire the same events, e.g. `user.groups.append(group)`
+    triggers the listener on `Group.users`.
+    """
+
+    def _collection_changed(target, value, initiator):
+        if not (_is_new_principal(target) or _is_new_principal(value)):
+            invalidate_scopes_cache()
+
+    event.listen(attribute, 'append', _collection_changed)
+    event.listen(attribute, 'remove', _collection_changed)
+
+
+for _attribute in (orm.Role.users, orm.Role.services, orm.Role.groups, orm.Group.users):
+    _invalidate_on_collection_change(_attribute)
+
+
+@event.listens_for(orm.Role.scopes, 'set')
+@event.listens_for(orm.APIToken.scopes, 'set')
+def _scopes_set(target, value, oldvalue, initiator):
+    """Invalidate cached scopes when the scopes of a role or token change"""
+    if sa.inspect(target).persistent:
+        invalidate_scopes_cache()
+
+
+@event.listens_for(sa.orm.Session, "persistent_to_deleted")
+def _invalidate_deleted(session, obj):
+    """Invalidate cached scopes when a role, group, user, service or token is deleted"""
+    if isinstance(obj, (orm.Role, orm.Group, orm.User, orm.Service, orm.APIToken)):
+        invalidate_scopes_cache()
+
+
+def _resolve_scopes_for(orm_object):
+    """Resolve scopes for an orm object, without caching
+
+    Implementation of `get_scopes_for`
+    """
+    expanded_scopes = set()
     owner = None
     if isinstance(orm_object, orm.APIToken):
         owner = orm_object.user or orm_object.service
@@ -636,27 +734,89 @@ def _resolve_requested_scopes(requested_scopes, have_scopes, user, client, db):
     return (allowed_scopes, disallowed_scopes)
 
 
-def _needs_scope_expansion(filter_, filter_value, sub_scope):
-    """
-    Check if there is a requirements to expand the `group` scope to individual `user` scopes.
-    Assumptions:
-    filter_ != Scope.ALL
+class ScopeChecker:
+    """Precompiled parsed scopes, for checking access
+
+    Immutable, and built once per set of parsed scopes by `compile_scopes`.
+    Filters are stored as frozensets per scope and resource kind,
+    so `can(scope, **resource)` is a few hash lookups,
+    no matter how many scopes or filters there are.
     """
-    if not (filter_ == 'user' and 'group' in sub_scope):
+
+    __slots__ = ("_filters",)
+
+    def __init__(self, parsed_scopes):
+        filters = {}
+        for scope, sub_scope in parsed_scopes.items():
+            if sub_scope == Scope.ALL:
+                filters[scope] = Scope.ALL
+            else:
+                filters[scope] = MappingProxyType(
+                    {kind: frozenset(names) for kind, names in sub_scope.items()}
+                )
+        object.__setattr__(self, "_filters", MappingProxyType(filters))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __contains__(self, scope):
+        return scope in self._filters
+
+    def unrestricted(self, scope):
+        """Whether scope is held without filters"""
+        return self._filters.get(scope) is Scope.ALL
+
+    def can(self, scope, user_groups=None, **resource):
+        """Whether scope is held for a resource
+
+        Arguments:
+          scope (str): the scope to check, e.g. 'read:users'
+          user_groups (callable, optional): returns the group names of a user name,
+              for access to users and their servers via `!group=` filters
+          resource: filters identifying the resource, as in `needs_scope`,
+              e.g. `user='name'` or `user='name', server='name/server'`.
+              Access to any of them is sufficient.
+
+        Returns:
+          True if scope is held for the resource (or held at all, if no resource is given),
+          False otherwise.
+        """
+        sub_scope = self._filters.get(scope)
+        if sub_scope is None:
+            return False
+        if sub_scope is Scope.ALL or not resource:
+            return True
+        for kind, name in resource.items():
+            names = sub_scope.get(kind)
+            if names is not None and name in names:
+                return True
+            if (
+                kind == 'user'
+                and user_groups is not None
+                and 'group' in sub_scope
+                and not sub_scope['group'].isdisjoint(user_groups(name))
+            ):
+                return True
         return False
-    if 'user' in sub_scope:
-        return filter_value not in sub_scope['user']
-    else:
-        return True
 
 
-def _check_user_in_expanded_scope(handler, user_name, scope_group_names):
-    """Check if username is present in set of allowed groups"""
-    user = handler.find_user(user_name)
-    if user is None:
-        raise web.HTTPError(404, "No access to resources or resources not found")
-    group_names = {group.name for group in user.groups}
-    return bool(set(scope_group_names) & group_names)
+def _compile_scopes_key(parsed_scopes):
+    """Cache key for compile_scopes
+
+    parse_scopes returns FrozenDicts, which are hashable and cache their hash
+    """
+    if isinstance(parsed_scopes, FrozenDict):
+        return parsed_scopes
+    return FrozenDict(parsed_scopes)
+
+
+@lru_cache_key(_compile_scopes_key)
+def compile_scopes(parsed_scopes):
+    """Compile parsed scopes into a ScopeChecker
+
+    Cached, so each set of scopes (i.e. each identity) is compiled once.
+    """
+    return ScopeChecker(parsed_scopes)
 
 
 def _check_scope_access(api_handler, req_scope, **kwargs):
@@ -670,14 +830,13 @@ def _check_scope_access(api_handler, req_scope, **kwargs):
         api_name = type(api_handler).__name__
     if 'user' in kwargs and 'server' in kwargs:
         kwargs['server'] = "{}/{}".format(kwargs['user'], kwargs['server'])
-    if req_scope not in api_handler.parsed_scopes:
+    checker = compile_scopes(api_handler.parsed_scopes)
+    if req_scope not in checker:
         app_log.debug("No access to %s via %s", api_name, req_scope)
         return False
-    if api_handler.parsed_scopes[req_scope] == Scope.ALL:
+    if checker.unrestricted(req_scope):
         app_log.debug("Unrestricted access to %s via %s", api_name, req_scope)
         return True
-    # Apply filters
-    sub_scope = api_handler.parsed_scopes[req_scope]
     if not kwargs:
         app_log.debug(
             "Client has restricted access to %s via %s. Internal filtering may apply",
@@ -685,15 +844,17 @@ def _check_scope_access(api_handler, req_scope, **kwargs):
             req_scope,
         )
         return True
-    for filter_, filter_value in kwargs.items():
-        if filter_ in sub_scope and filter_value in sub_scope[filter_]:
-            app_log.debug("Argument-based access to %s via %s", api_name, req_scope)
-            return True
-        if _needs_scope_expansion(filter_, filter_value, sub_scope):
-            group_names = sub_scope['group']
-            if _check_user_in_expanded_scope(api_handler, filter_value, group_names):
-                app_log.debug("Restricted client access supported with group expansion")
-                return True
+
+    def user_groups(user_name):
+        """Group names of a user, for access via group filters"""
+        user = api_handler.find_user(user_name)
+        if user is None:
+            raise web.HTTPError(404, "No access to resources or resources not found")
+        return groups_for_user(api_handler.db, user.name)
+
+    if checker.can(req_scope, user_groups=user_groups, **kwargs):
+        app_log.debug("Argument-based access to %s via %s", api_name, req_scope)
+        return True
     app_log.debug(
         "Client access refused; filters do not match API endpoint %s request" % api_name
     )
@@ -843,9 +1004,10 @@ def needs_scope(*scopes):
             raise ValueError(f"Scope {scope} is not a valid scope")
 
     def scope_decorator(func):
+        sig = inspect.signature(func)
+
         @functools.wraps(func)
         def _auth_func(self, *args, **kwargs):
-            sig = inspect.signature(func)
             bound_sig = sig.bind(self, *args, **kwargs)
             bound_sig.apply_defaults()
             # Load scopes in case they haven't been loaded yet
@@ -944,7 +1106,11 @@ def _check_scope_key(sub_scope, orm_resource, kind):
         resource_key = (orm_resource.user.name, orm_resource.name)
     else:
         resource_key = orm_resource.name
-    return (sub_scope, resource_key, kind)
+    group_version = None
+    if sub_scope is not Scope.ALL and 'group' in sub_scope:
+        # result may depend on group membership
+        group_version = index_version(sa.inspect(orm_resource).session)
+    return (sub_scope, resource_key, kind, group_version)
 
 
 @lru_cache_key(_check_scope_key)
@@ -974,13 +1140,72 @@ def check_scope_filter(sub_scope, orm_resource, kind):
         kind = 'user'
 
     if kind == 'user' and 'group' in sub_scope:
-        group_names = {group.name for group in orm_resource.groups}
-        user_in_group = bool(group_names & set(sub_scope['group']))
-        # cannot cache if we needed to lookup groups in db
-        return DoNotCache(user_in_group)
+        db = sa.inspect(orm_resource).session
+        if db is None:
+            group_names = {group.name for group in orm_resource.groups}
+            # cannot cache without the group index
+            return DoNotCache(bool(group_names & set(sub_scope['group'])))
+        group_names = groups_for_user(db, orm_resource.name)
+        return not group_names.isdisjoint(sub_scope['group'])
     return False
 
 
+def scope_filter_clause(sub_scope, kind):
+    """Compile a sub_scope filter into a SQLAlchemy clause for a kind of resource
+
+    The database equivalent of `check_scope_filter`,
+    for filtering listings in the query instead of per object.
+
+    param sub_scope: parsed_scopes filter (i.e. dict or Scope.ALL)
+    param kind: 'user' or 'service' or 'group' or 'server',
+        for queries of orm.User, orm.Service, orm.Group or orm.Spawner.
+
+    Returns a clause for `query.filter()`, or None if there is no filter.
+    Filters that don't apply to the kind (e.g. `!service=` for users) match nothing.
+    """
+    if sub_scope is Scope.ALL:
+        return None
+
+    clauses = []
+    if kind == 'user':
+        if 'user' in sub_scope:
+            clauses.append(orm.User.name.in_(sub_scope['user']))
+        if 'group' in sub_scope:
+            clauses.append(orm.User.groups.any(orm.Group.name.in_(sub_scope['group'])))
+    elif kind == 'group':
+        if 'group' in sub_scope:
+            clauses.append(orm.Group.name.in_(sub_scope['group']))
+    elif kind == 'service':
+        if 'service' in sub_scope:
+            clauses.append(orm.Service.name.in_(sub_scope['service']))
+    elif kind == 'server':
+        if 'server' in sub_scope:
+            servers = {}
+            for server in sub_scope['server']:
+                user_name, _, server_name = server.partition("/")
+                servers.setdefault(user_name, set()).add(server_name)
+            for user_name, server_names in servers.items():
+                clauses.append(
+                    sa.and_(
+                        orm.Spawner.user.has(orm.User.name == user_name),
+                        orm.Spawner.name.in_(server_names),
+                    )
+                )
+        if 'user' in sub_scope or 'group' in sub_scope:
+            # access to a user's servers via user or group
+            user_clause = scope_filter_clause(sub_scope, 'user')
+            clauses.append(orm.Spawner.user.has(user_clause))
+    else:
+        raise ValueError(f"Unrecognized resource kind: {kind!r}")
+
+    if not clauses:
+        return sa.false()
+    elif len(clauses) == 1:
+        return clauses[0]
+    else:
+        return sa.or_(*clauses)
+
+
 def describe_parsed_scopes(parsed_scopes, username=None):
     """Return list of descriptions of parsed scopes
 
@@ -126,6 +126,7 @@ class _ServiceSpawner(LocalProcessSpawner):
         env = self.get_env()
         # no activity url for services
         env.pop('JUPYTERHUB_ACTIVITY_URL', None)
+        env.pop('JUPYTERHUB_READY_URL', None)
         if os.name == 'nt':
             env['SYSTEMROOT'] = os.environ['SYSTEMROOT']
         cmd = self.cmd
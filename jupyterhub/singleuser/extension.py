@@ -356,6 +356,43 @@ class JupyterHubSingleUser(ExtensionApp):
     def _server_name_default(self):
         return os.environ.get('JUPYTERHUB_SERVER_NAME', '')
 
+    hub_ready_url = Unicode(
+        config=True,
+        help="""URL for notifying JupyterHub that the server is ready
+
+        .. versionadded:: 4.0
+        """,
+    )
+
+    @default('hub_ready_url')
+    def _default_ready_url(self):
+        return os.environ.get('JUPYTERHUB_READY_URL', '')
+
+    async def notify_ready(self):
+        """Notify JupyterHub that the server is ready
+
+        Called once the server is listening,
+        so the Hub doesn't have to poll the server to find out.
+        If the notification fails, the Hub finds out by polling.
+        """
+        if not self.hub_ready_url:
+            return
+        req = HTTPRequest(
+            url=self.hub_ready_url,
+            method='POST',
+            headers={
+                "Authorization": f"token {self.hub_auth.api_token}",
+                "Content-Type": "application/json",
+            },
+            body=json.dumps({'jupyterhub_version': __version__}),
+        )
+        try:
+            await self.hub_http_client.fetch(req)
+        except Exception as e:
+            self.log.warning("Failed to notify Hub that the server is ready: %s", e)
+        else:
+            self.log.debug("Notified Hub that the server is ready")
+
     hub_activity_url = Unicode(
         config=True, help="URL for sending JupyterHub activity updates"
     )
@@ -620,6 +657,8 @@ class JupyterHubSingleUser(ExtensionApp):
             self._activity_task = asyncio.ensure_future(self.keep_activity_updated())
 
         app.io_loop.run_sync(_start_activity)
+        # runs once the server is listening
+        app.io_loop.add_callback(self.notify_ready)
 
     async def stop_extension(self):
         if self._activity_task:
@@ -0,0 +1,171 @@
+"""Admission queue for spawns beyond concurrent_spawn_limit
+
+Instead of rejecting spawn requests with 429 when too many servers are starting,
+requests wait in a queue and start in order as running spawns finish.
+Queued spawns are pending like any other,
+so users see their position in the queue on the spawn progress page.
+
+.. versionadded:: 4.0
+"""
+# Copyright (c) Jupyter Development Team.
+# Distributed under the terms of the Modified BSD License.
+import asyncio
+import heapq
+import itertools
+import time
+
+from tornado.log import app_log
+
+from .metrics import SPAWN_QUEUE_LENGTH, SPAWN_QUEUE_WAIT_SECONDS
+from .utils import maybe_future
+
+
+class _QueueEntry:
+    """A spawn waiting in the queue"""
+
+    __slots__ = ("key", "spawner", "future", "queued")
+
+    def __init__(self, key, spawner, future):
+        self.key = key
+        self.spawner = spawner
+        self.future = future
+        self.queued = True
+
+
+class SpawnQueue:
+    """Limit concurrent spawns, queueing the rest
+
+    At most `limit` spawns run at a time.
+    Others wait, and are started in order of priority,
+    then in the order they were requested.
+
+    Args:
+        limit (int): the maximum number of concurrent spawns
+        priority (callable, optional): called with a Spawner,
+            returns the priority of its spawn (higher starts first).
+            May be a coroutine.
+
+    .. versionadded:: 4.0
+    """
+
+    def __init__(self, limit, priority=None, log=app_log):
+        self.limit = limit
+        self.priority = priority
+        self.log = log
+        # number of spawns running
+        self.active = 0
+        # heap of (key, entry), key is (-priority, sequence)
+        self._heap = []
+        self._counter = itertools.count()
+        # spawner: entry
+        self._entries = {}
+        # futures resolved when the queue changes
+        self._watchers = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _changed(self):
+        SPAWN_QUEUE_LENGTH.set(len(self._entries))
+        watchers, self._watchers = self._watchers, []
+        for f in watchers:
+            if not f.done():
+                f.set_result(None)
+
+    async def acquire(self, spawner):
+        """Wait for a slot to spawn a server"""
+        if self.active < self.limit and not self._entries:
+            self.active += 1
+            SPAWN_QUEUE_WAIT_SECONDS.observe(0)
+            return
+        priority = 0
+        if self.priority is not None:
+            priority = await maybe_future(self.priority(spawner))
+        key = (-priority, next(self._counter))
+        entry = _QueueEntry(key, spawner, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, (key, entry))
+        self._entries[spawner] = entry
+        self.log.info(
+            "Queued spawn of %s at position %i",
+            spawner._log_name,
+            self.position(spawner),
+        )
+        self._changed()
+        # check for a free slot, e.g. if one freed up while getting the priority
+        self._admit()
+        start = time.perf_counter()
+        try:
+            await entry.future
+        except asyncio.CancelledError:
+            if entry.queued:
+                entry.queued = False
+                self._entries.pop(spawner, None)
+                self._changed()
+            elif not entry.future.cancelled():
+                # admitted, but no longer waiting
+                self.release()
+            raise
+        finally:
+            SPAWN_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+    def release(self):
+        """Free the slot of a finished spawn"""
+        self.active -= 1
+        self._admit()
+
+    def _admit(self):
+        """Start queued spawns while there are free slots"""
+        admitted = False
+        while self.active < self.limit and self._heap:
+            key, entry = heapq.heappop(self._heap)
+            if not entry.queued:
+                # left the queue
+                continue
+            entry.queued = False
+            self._entries.pop(entry.spawner, None)
+            self.active += 1
+            entry.future.set_result(None)
+            admitted = True
+        if admitted:
+            self._changed()
+
+    async def run(self, spawner, coro):
+        """Run a spawn coroutine, once there's a slot for it"""
+        try:
+            await self.acquire(spawner)
+        except BaseException:
+            # never started
+            coro.close()
+            raise
+        try:
+            return await coro
+        finally:
+            self.release()
+
+    def position(self, spawner):
+        """The position (starting at 1) of a spawner in the queue
+
+        None if the spawner is not queued.
+        """
+        entry = self._entries.get(spawner)
+        if entry is None:
+            return None
+        return 1 + sum(1 for other in self._entries.values() if other.key < entry.key)
+
+    async def watch(self, spawner):
+        """Yield (position, queue length) while a spawner is queued
+
+        Yields whenever either changes, until the spawner leaves the queue.
+        """
+        last = None
+        while True:
+            position = self.position(spawner)
+            if position is None:
+                return
+            current = (position, len(self._entries))
+            if current != last:
+                last = current
+                yield current
+            f = asyncio.get_running_loop().create_future()
+            self._watchers.append(f)
+            await f
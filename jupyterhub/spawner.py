@@ -4,6 +4,7 @@ Contains base Spawner class & default implementation
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
 import ast
+import asyncio
 import json
 import os
 import shlex
@@ -19,7 +20,6 @@ from urllib.parse import urlparse
 
 from async_generator import aclosing
 from sqlalchemy import inspect
-from tornado.ioloop import PeriodicCallback
 from traitlets import (
     Any,
     Bool,
@@ -38,6 +38,7 @@ from traitlets.config import LoggingConfigurable
 
 from . import orm
 from .objects import Server
+from .polling import PollScheduler
 from .roles import roles_to_scopes
 from .traitlets import ByteSpecification, Callable, Command
 from .utils import (
@@ -71,6 +72,28 @@ def _quote_safe(s):
         return repr(s)
 
 
+class _StateFlag:
+    """A private Spawner state flag, such as `_spawn_pending`
+
+    Setting a flag notifies the Spawner's `_state_counter`, if any,
+    so that counts of pending/active/ready servers can be kept up-to-date
+    without scanning every Spawner.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, spawner, owner=None):
+        if spawner is None:
+            return self
+        return spawner.__dict__.get(self.name, False)
+
+    def __set__(self, spawner, value):
+        spawner.__dict__[self.name] = value
+        if spawner._state_counter is not None:
+            spawner._state_counter.update(spawner)
+
+
 class Spawner(LoggingConfigurable):
     """Base class for spawning single-user notebook servers.
 
@@ -88,11 +111,13 @@ class Spawner(LoggingConfigurable):
     """
 
     # private attributes for tracking status
-    _spawn_pending = False
+    _spawn_pending = _StateFlag()
     _start_pending = False
-    _stop_pending = False
-    _proxy_pending = False
-    _check_pending = False
+    _stop_pending = _StateFlag()
+    _proxy_pending = _StateFlag()
+    _check_pending = _StateFlag()
+    # set by the Hub to keep counts of servers by state
+    _state_counter = None
     _waiting_for_response = False
     _jupyterhub_version = None
     _spawn_future = None
@@ -259,6 +284,8 @@ class Spawner(LoggingConfigurable):
             self.log.warning(
                 f"Setting Spawner.server for {self._log_name} with no underlying orm_spawner"
             )
+        if self._state_counter is not None:
+            self._state_counter.update(self)
 
     @property
     def name(self):
@@ -464,6 +491,23 @@ class Spawner(LoggingConfigurable):
         """,
     ).tag(config=True)
 
+    ready_poll_delay = Float(
+        1,
+        help="""
+        Time (in seconds) to wait for a started server to notify the Hub that it's ready,
+        before polling its URL to check that it's up.
+
+        jupyterhub-singleuser servers notify the Hub as soon as they are listening,
+        so the Hub doesn't need to poll them.
+        Polling is still used for servers that don't notify the Hub,
+        e.g. servers from older versions of JupyterHub.
+
+        Set to 0 to start polling right away.
+
+        .. versionadded:: 4.0
+        """,
+    ).tag(config=True)
+
     poll_interval = Integer(
         30,
         help="""
@@ -476,7 +520,15 @@ class Spawner(LoggingConfigurable):
     ).tag(config=True)
 
     _callbacks = List()
-    _poll_callback = Any()
+
+    # resolved with the server's jupyterhub version
+    # when it notifies the Hub that it's ready
+    _ready_future = Any()
+
+    def _notify_ready(self, jupyterhub_version=None):
+        """Called when a starting server notifies the Hub that it's ready"""
+        if self._ready_future is not None and not self._ready_future.done():
+            self._ready_future.set_result(jupyterhub_version)
 
     debug = Bool(False, help="Enable debug-logging of the single-user server").tag(
         config=True
@@ -985,6 +1037,16 @@ class Spawner(LoggingConfigurable):
             getattr(self.user, 'escaped_name', self.user.name),
             'activity',
         )
+        if self.name:
+            ready_path = ['servers', url_escape_path(self.name), 'ready']
+        else:
+            ready_path = ['server', 'ready']
+        env['JUPYTERHUB_READY_URL'] = url_path_join(
+            hub_api_url,
+            'users',
+            getattr(self.user, 'escaped_name', self.user.name),
+            *ready_path,
+        )
         env['JUPYTERHUB_BASE_URL'] = self.hub.base_url[:-4]
 
         if self.server:
@@ -1330,6 +1392,31 @@ class Spawner(LoggingConfigurable):
         """
         raise NotImplementedError("Override in subclass. Must be a coroutine.")
 
+    @classmethod
+    async def poll_many(cls, spawners):
+        """Check if many single-user processes are running
+
+        Used by the Hub to check all running servers of this Spawner class
+        on startup and while polling periodically.
+        Override to check many servers with one request to the backend
+        (e.g. one listing of pods or batch jobs)
+        instead of one `poll` per server.
+
+        The default calls `poll` on each Spawner concurrently.
+
+        Args:
+          spawners (list): Spawner instances of this class to check
+        Returns:
+          list: the status of each Spawner, in the same order,
+          as it would be returned by `poll`.
+          If checking a Spawner fails, the exception is returned in place of its status.
+
+        .. versionadded:: 4.0
+        """
+        return await asyncio.gather(
+            *(spawner.poll() for spawner in spawners), return_exceptions=True
+        )
+
     def delete_forever(self):
         """Called when a user or server is deleted.
 
@@ -1350,15 +1437,17 @@ class Spawner(LoggingConfigurable):
 
     def stop_polling(self):
         """Stop polling for single-user server's running state"""
-        if self._poll_callback:
-            self._poll_callback.stop()
-            self._poll_callback = None
+        PollScheduler.instance().remove(self)
 
     def start_polling(self):
         """Start polling periodically for single-user server's running state.
 
         Callbacks registered via `add_poll_callback` will fire if/when the server stops.
         Explicit termination via the stop method will not trigger the callbacks.
+
+        .. versionchanged:: 4.0
+            Polls of all spawners are scheduled by a single :class:`~.PollScheduler`,
+            instead of a timer per spawner.
         """
         if self.poll_interval <= 0:
             self.log.debug("Not polling subprocess")
@@ -1366,16 +1455,15 @@ class Spawner(LoggingConfigurable):
         else:
             self.log.debug("Polling subprocess every %is", self.poll_interval)
 
-        self.stop_polling()
-
-        self._poll_callback = PeriodicCallback(
-            self.poll_and_notify, 1e3 * self.poll_interval
-        )
-        self._poll_callback.start()
+        PollScheduler.instance().add(self)
 
     async def poll_and_notify(self):
         """Used as a callback to periodically poll the process and notify any watchers"""
         status = await self.poll()
+        return await self._notify_poll(status)
+
+    async def _notify_poll(self, status):
+        """Notify watchers if a poll found the server stopped"""
         if status is None:
             # still running, nothing to do here
             return
@@ -1556,6 +1644,11 @@ class LocalProcessSpawner(Spawner):
         """,
     )
 
+    # (pid, Future) resolved when the process exits
+    _exit_watch = Any()
+    # whether to notify poll callbacks when the process exits
+    _notify_on_exit = Bool(False)
+
     def make_preexec_fn(self, name):
         """
         Return a function that can be used to set the user id of the spawned process to user with name `name`
@@ -1729,6 +1822,139 @@ class LocalProcessSpawner(Spawner):
         else:
             return None
 
+    @classmethod
+    async def poll_many(cls, spawners):
+        """Poll many spawned processes at once
+
+        Checks all processes in one pass,
+        instead of scheduling a `poll` for each.
+
+        .. versionadded:: 4.0
+        """
+        if (
+            os.name == 'nt'
+            or cls.poll is not LocalProcessSpawner.poll
+            or cls._signal is not LocalProcessSpawner._signal
+        ):
+            # customized process checks (e.g. signals sent by another process)
+            return await super().poll_many(spawners)
+
+        statuses = []
+        for spawner in spawners:
+            if spawner.proc is not None or not spawner.pid:
+                # started by us or not running,
+                # poll doesn't need to signal the process
+                statuses.append(await spawner.poll())
+                continue
+            try:
+                os.kill(spawner.pid, 0)
+            except ProcessLookupError:
+                # process is gone
+                spawner.clear_state()
+                statuses.append(0)
+            except OSError as e:
+                statuses.append(e)
+            else:
+                statuses.append(None)
+        return statuses
+
+    def _watch_exit(self):
+        """Get a Future that resolves when the process exits
+
+        Uses a pidfd (Linux >= 5.3) to be notified when the process exits,
+        without polling.
+        Returns None if the exit can't be watched.
+        """
+        if not self.pid or not hasattr(os, 'pidfd_open'):
+            return None
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        if self._exit_watch is not None:
+            pid, future = self._exit_watch
+            if pid == self.pid and future.get_loop() is loop:
+                return future
+
+        future = loop.create_future()
+        if self.proc is not None and self.proc.poll() is not None:
+            # already exited and reaped, so the pid may be reused
+            future.set_result(None)
+        else:
+            try:
+                pidfd = os.pidfd_open(self.pid)
+            except ProcessLookupError:
+                # process is gone
+                future.set_result(None)
+            except OSError as e:
+                # e.g. not supported by the kernel
+                self.log.debug("Not watching process %i for exit: %s", self.pid, e)
+                return None
+            else:
+                loop.add_reader(pidfd, self._on_exit, self.pid, pidfd, future)
+        self._exit_watch = (self.pid, future)
+        return future
+
+    def _on_exit(self, pid, pidfd, future):
+        """Called when a watched process exits"""
+        future.get_loop().remove_reader(pidfd)
+        os.close(pidfd)
+        if not future.done():
+            future.set_result(None)
+        if pid == self.pid and self._notify_on_exit:
+            asyncio.ensure_future(self._notify_exit())
+
+    async def _notify_exit(self):
+        """Fire poll callbacks after the process exits"""
+        status = await self.poll_and_notify()
+        if status is None and self._notify_on_exit:
+            # exited, but still there (e.g. not reaped yet), poll until it's gone
+            self._notify_on_exit = False
+            super().start_polling()
+
+    def start_polling(self):
+        """Start watching for the process to exit
+
+        On Linux, the process is watched with a pidfd,
+        so poll callbacks fire as soon as it exits,
+        without polling periodically.
+        Elsewhere, the process is polled every `poll_interval` seconds.
+
+        .. versionchanged:: 4.0
+            Watch for exit with a pidfd when available.
+        """
+        if self.poll_interval <= 0:
+            super().start_polling()
+            return
+        future = self._watch_exit()
+        if future is None:
+            super().start_polling()
+            return
+        self.log.debug("Watching process %i for exit", self.pid)
+        super().stop_polling()
+        self._notify_on_exit = True
+        if future.done():
+            asyncio.ensure_future(self._notify_exit())
+
+    def stop_polling(self):
+        """Stop watching for the process to exit"""
+        self._notify_on_exit = False
+        super().stop_polling()
+
+    async def wait_for_death(self, timeout=10):
+        """Wait for the process to die, up to timeout seconds
+
+        Returns as soon as the process exits,
+        if the exit can be watched (see `start_polling`).
+        """
+        future = self._watch_exit()
+        if future is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return await super().wait_for_death(timeout)
+
     async def _signal(self, sig):
         """Send given signal to a single-user server's process.
 
@@ -10,6 +10,8 @@ Handlers and their purpose include:
 - EchoHandler: echoing URLs back
 - ArgsHandler: allowing retrieval of `sys.argv`.
 
+Like jupyterhub-singleuser, it notifies the Hub when it's ready.
+
 """
 import json
 import os
@@ -17,6 +19,7 @@ import sys
 from urllib.parse import urlparse
 
 from tornado import httpserver, ioloop, log, web
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
 from tornado.options import options
 
 from ..utils import make_ssl_context
@@ -33,6 +36,24 @@ class ArgsHandler(web.RequestHandler):
         self.write(json.dumps(sys.argv))
 
 
+async def notify_ready(ssl_context=None):
+    """Notify the Hub that we're ready"""
+    url = os.environ.get("JUPYTERHUB_READY_URL")
+    if not url:
+        return
+    req = HTTPRequest(
+        url,
+        method="POST",
+        headers={"Authorization": f"token {os.environ['JUPYTERHUB_API_TOKEN']}"},
+        body="{}",
+        ssl_options=ssl_context,
+    )
+    try:
+        await AsyncHTTPClient().fetch(req)
+    except Exception as e:
+        log.app_log.warning(f"Failed to notify Hub that we're ready: {e}")
+
+
 def main():
     url = urlparse(os.environ["JUPYTERHUB_SERVICE_URL"])
     options.logging = 'debug'
@@ -42,6 +63,7 @@ def main():
     )
 
     ssl_context = None
+    client_ssl_context = None
     key = os.environ.get('JUPYTERHUB_SSL_KEYFILE') or ''
     cert = os.environ.get('JUPYTERHUB_SSL_CERTFILE') or ''
     ca = os.environ.get('JUPYTERHUB_SSL_CLIENT_CA') or ''
@@ -52,11 +74,13 @@ def main():
         ssl_context = make_ssl_context(
             key, cert, cafile=ca, purpose=ssl.Purpose.CLIENT_AUTH
         )
+        client_ssl_context = make_ssl_context(key, cert, cafile=ca)
         assert url.scheme == "https"
 
     server = httpserver.HTTPServer(app, ssl_options=ssl_context)
     log.app_log.info(f"Starting mock singleuser server at {url.hostname}:{url.port}")
     server.listen(url.port, url.hostname)
+    ioloop.IOLoop.current().add_callback(notify_ready, client_ssl_context)
     try:
         ioloop.IOLoop.instance().start()
     except KeyboardInterrupt:
@@ -0,0 +1,73 @@
+"""Tests for the activity buffer"""
+from datetime import datetime, timedelta
+from unittest import mock
+
+from sqlalchemy import select
+
+from .. import orm
+from ..activity import ActivityBuffer
+from ..user import User
+
+
+def _stored_activity(db, obj):
+    """Read last_activity from the database, not the session"""
+    table = obj.__table__
+    return db.execute(
+        select(table.c.last_activity).where(table.c.id == obj.id)
+    ).scalar()
+
+
+def test_activity_buffer(db):
+    orm_user = orm.User(name='rose')
+    db.add(orm_user)
+    db.commit()
+    user = User(orm_user, db=db)
+    orm_spawner = user.spawners[''].orm_spawner
+    token = user.new_api_token()
+    orm_token = orm.APIToken.find(db, token)
+    db.commit()
+
+    buffer = ActivityBuffer(lambda: db)
+    now = datetime.utcnow()
+    earlier = now - timedelta(minutes=5)
+    later = now + timedelta(minutes=1)
+
+    buffer.record(user, now)
+    buffer.record(orm_user, earlier)
+    buffer.record(orm_spawner, later)
+    buffer.record(orm_spawner, now)
+    buffer.record(orm_token, now)
+    assert len(buffer) == 3
+    # visible in memory, but not written yet
+    assert orm_user.last_activity == now
+    assert orm_spawner.last_activity == later
+    assert not db.dirty
+    assert _stored_activity(db, orm_user) is None
+
+    assert buffer.flush() == 3
+    assert len(buffer) == 0
+    assert _stored_activity(db, orm_user) == now
+    assert _stored_activity(db, orm_spawner) == later
+    assert _stored_activity(db, orm_token) == now
+    assert buffer.flush() == 0
+
+    # flush never moves last_activity backward
+    buffer._pending[(orm_user.__table__, orm_user.id)] = earlier
+    buffer.flush()
+    assert _stored_activity(db, orm_user) == now
+
+
+def test_activity_buffer_flush_error(db):
+    orm_user = orm.User(name='amy')
+    db.add(orm_user)
+    db.commit()
+
+    buffer = ActivityBuffer(lambda: db)
+    now = datetime.utcnow()
+    buffer.record(orm_user, now)
+    with mock.patch.object(db, 'execute', side_effect=RuntimeError("oops")):
+        assert buffer.flush() == 0
+    # kept for the next flush
+    assert len(buffer) == 1
+    assert buffer.flush() == 1
+    assert _stored_activity(db, orm_user) == now
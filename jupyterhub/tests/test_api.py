@@ -3,6 +3,7 @@ import asyncio
 import json
 import re
 import sys
+import time
 import uuid
 from datetime import datetime, timedelta
 from unittest import mock
@@ -16,6 +17,7 @@ import jupyterhub
 from .. import orm
 from ..apihandlers.base import PAGINATION_MEDIA_TYPE
 from ..objects import Server
+from ..spawn_queue import SpawnQueue
 from ..utils import url_path_join as ujoin
 from ..utils import utcnow
 from .conftest import new_username
@@ -324,6 +326,49 @@ async def test_get_users_pagination(
     assert got_usernames == expected_usernames
 
 
+@mark.user
+@mark.parametrize("total", ["exact", "estimate", "none"])
+async def test_get_users_cursor_pagination(app, total):
+    db = app.db
+    for i in range(5):
+        add_user(db, app, name=new_username())
+    usernames = [u.name for u in db.query(orm.User).order_by(orm.User.id.asc())]
+
+    headers = auth_header(db, 'admin')
+    headers['Accept'] = PAGINATION_MEDIA_TYPE
+    params = {'limit': 2, 'total': total}
+    got_usernames = []
+    offsets = []
+    while True:
+        r = await api_request(app, url_concat('users', params), headers=headers)
+        assert r.status_code == 200
+        reply = r.json()
+        pagination = reply['_pagination']
+        if total == 'none':
+            assert pagination['total'] is None
+        else:
+            assert pagination['total'] == len(usernames)
+        offsets.append(pagination['offset'])
+        got_usernames.extend(u['name'] for u in reply['items'])
+        next_page = pagination['next']
+        if next_page is None:
+            break
+        assert 'cursor=' in next_page['url']
+        assert 'offset=' not in next_page['url']
+        assert next_page['offset'] == pagination['offset'] + 2
+        params['cursor'] = next_page['cursor']
+
+    assert got_usernames == usernames
+    assert offsets == list(range(0, len(usernames), 2))
+
+    r = await api_request(
+        app, url_concat('users', {'cursor': 'notacursor'}), headers=headers
+    )
+    assert r.status_code == 400
+    r = await api_request(app, url_concat('users', {'total': 'some'}), headers=headers)
+    assert r.status_code == 400
+
+
 @mark.user
 @mark.parametrize(
     "state",
@@ -842,6 +887,54 @@ async def test_spawn(app):
     assert app.users.count_active_users()['pending'] == 0
 
 
+async def test_spawn_ready_notification(app, username):
+    user = add_user(app.db, app=app, name=username)
+    spawner = app.users[username].spawner
+    # don't poll, so only the server's notification can finish the spawn
+    spawner.ready_poll_delay = 60
+    tic = time.perf_counter()
+    r = await api_request(app, 'users', username, 'server', method='post')
+    assert r.status_code == 201
+    assert time.perf_counter() - tic < 10
+    assert spawner.ready
+    assert spawner._ready_future is None
+    r = await api_request(app, 'users', username, 'server', method='delete')
+    assert r.status_code in {202, 204}
+    while spawner.active:
+        await asyncio.sleep(0.1)
+
+
+async def test_server_ready_api(app, user, admin_user):
+    token = user.new_api_token()
+    headers = {"Authorization": f"token {token}"}
+    # no effect if the server isn't starting
+    r = await api_request(
+        app,
+        f"users/{user.name}/server/ready",
+        headers=headers,
+        data="{}",
+        method="post",
+    )
+    assert r.status_code == 204
+    r = await api_request(
+        app,
+        f"users/{user.name}/servers/nosuchserver/ready",
+        headers=headers,
+        data="{}",
+        method="post",
+    )
+    assert r.status_code == 404
+    # can't notify for someone else's server
+    r = await api_request(
+        app,
+        f"users/{admin_user.name}/server/ready",
+        headers=headers,
+        data="{}",
+        method="post",
+    )
+    assert r.status_code == 404
+
+
 async def test_user_options(app, username):
     db = app.db
     name = username
@@ -1239,6 +1332,59 @@ async def test_spawn_limit(app, no_patience, slow_spawn, request):
         await asyncio.sleep(0.1)
 
 
+async def test_spawn_queue(app, no_patience, slow_spawn, request):
+    db = app.db
+    spawn_queue = SpawnQueue(1)
+    p = mock.patch.dict(
+        app.tornado_settings, {'concurrent_spawn_limit': 1, 'spawn_queue': spawn_queue}
+    )
+    p.start()
+    request.addfinalizer(p.stop)
+
+    names = [new_username("queued") for i in range(2)]
+    users = [add_user(db, app=app, name=name) for name in names]
+    for user in users:
+        user.spawner._start_future = asyncio.Future()
+    for name in names:
+        r = await api_request(app, 'users', name, 'server', method='post')
+        # queued, not rejected
+        assert r.status_code == 202
+    assert spawn_queue.active == 1
+    assert len(spawn_queue) == 1
+    assert users[1].spawner.pending == 'spawn'
+    assert spawn_queue.position(users[1].spawner) == 1
+
+    # the queued spawn reports its position
+    r = await api_request(app, 'users', names[1], 'server/progress', stream=True)
+    r.raise_for_status()
+    request.addfinalizer(r.close)
+    ex = async_requests.executor
+    line_iter = iter(r.iter_lines(decode_unicode=True))
+    evt = await ex.submit(next_event, line_iter)
+    assert evt == {
+        'progress': 0,
+        'queue_position': 1,
+        'message': 'Waiting to start, position 1 of 1 in the queue',
+    }
+
+    # the queued spawn starts when the first finishes
+    users[0].spawner._start_future.set_result(None)
+    while not users[0].running:
+        await asyncio.sleep(0.1)
+    assert len(spawn_queue) == 0
+    users[1].spawner._start_future.set_result(None)
+    while not users[1].running:
+        await asyncio.sleep(0.1)
+    assert spawn_queue.active == 0
+
+    for u in users:
+        u.spawner.delay = 0
+        r = await api_request(app, 'users', u.name, 'server', method='delete')
+        r.raise_for_status()
+    while any(u.spawner.active for u in users):
+        await asyncio.sleep(0.1)
+
+
 @mark.slow
 async def test_active_server_limit(app, request):
     db = app.db
@@ -1602,6 +1748,35 @@ async def test_token_list(app, as_user, for_user, status):
         assert normalize_token(reply) == normalize_token(token)
 
 
+async def test_token_list_pagination(app):
+    u = add_user(app.db, app, name=new_username())
+    for i in range(3):
+        u.new_api_token()
+    expired = u.new_api_token(expires_in=60)
+    orm.APIToken.find(app.db, expired).expires_at = utcnow() - timedelta(seconds=1)
+    app.db.commit()
+    headers = auth_header(app.db, 'admin')
+    headers['Accept'] = PAGINATION_MEDIA_TYPE
+
+    token_ids = []
+    params = {'limit': 2}
+    while True:
+        r = await api_request(
+            app,
+            url_concat(f'users/{u.name}/tokens', params),
+            headers=headers,
+        )
+        r.raise_for_status()
+        reply = r.json()
+        assert reply['_pagination']['total'] == 3
+        token_ids.extend(token['id'] for token in reply['items'])
+        if reply['_pagination']['next'] is None:
+            break
+        params['cursor'] = reply['_pagination']['next']['cursor']
+    assert len(token_ids) == 3
+    assert token_ids == sorted(token_ids, key=lambda id: int(id[1:]))
+
+
 # ---------------
 # Group API tests
 # ---------------
@@ -1936,6 +2111,13 @@ async def test_get_services(app, mockservice_url):
     r = await api_request(app, 'services', headers=auth_header(db, 'user'))
     assert r.status_code == 403
 
+    r = await api_request(app, 'services', headers={'Accept': PAGINATION_MEDIA_TYPE})
+    r.raise_for_status()
+    reply = r.json()
+    assert reply['items'] == services
+    assert reply['_pagination']['total'] == len(services)
+    assert reply['_pagination']['next'] is None
+
 
 @mark.services
 async def test_get_service(app, mockservice_url):
@@ -2092,6 +2274,64 @@ async def test_update_server_activity(app, user, server_name, fresh):
     assert user.spawners[server_name].orm_spawner.last_activity == expected
 
 
+async def test_update_activity_bulk(app, user, admin_user):
+    # a user's own token can only update its own activity
+    token = user.new_api_token()
+    now = utcnow()
+    activity = now + timedelta(minutes=1)
+    user.spawners["exists"].orm_spawner
+    app.db.commit()
+
+    r = await api_request(
+        app,
+        "activity",
+        headers={"Authorization": f"token {token}"},
+        data=json.dumps(
+            {
+                user.name: {
+                    "last_activity": activity.isoformat(),
+                    "servers": {"exists": {"last_activity": activity.isoformat()}},
+                },
+                admin_user.name: {"last_activity": activity.isoformat()},
+                "nosuchuser": {"last_activity": activity.isoformat()},
+            }
+        ),
+        method="post",
+    )
+    r.raise_for_status()
+    reply = r.json()
+    assert reply[user.name] == {"status": 200}
+    assert reply[admin_user.name]["status"] == 404
+    assert reply["nosuchuser"]["status"] == 404
+
+    expected = activity.replace(tzinfo=None)
+    assert user.last_activity == expected
+    assert user.spawners["exists"].orm_spawner.last_activity == expected
+    assert admin_user.last_activity != expected
+
+    # invalid entries don't prevent other updates
+    admin_token = admin_user.new_api_token(roles=['admin'])
+    later = activity + timedelta(minutes=1)
+    r = await api_request(
+        app,
+        "activity",
+        headers={"Authorization": f"token {admin_token}"},
+        data=json.dumps(
+            {
+                user.name: {"servers": {"nope": {"last_activity": later.isoformat()}}},
+                admin_user.name: {"last_activity": later.isoformat()},
+            }
+        ),
+        method="post",
+    )
+    r.raise_for_status()
+    reply = r.json()
+    assert reply[user.name]["status"] == 400
+    assert "No such server" in reply[user.name]["message"]
+    assert reply[admin_user.name] == {"status": 200}
+    assert admin_user.last_activity == later.replace(tzinfo=None)
+
+
 # -----------------
 # General API tests
 # -----------------
@@ -7,16 +7,19 @@ import os
 import re
 import sys
 import time
+from datetime import datetime, timedelta
 from subprocess import PIPE, Popen, check_output
 from tempfile import NamedTemporaryFile, TemporaryDirectory
-from unittest.mock import patch
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 import traitlets
+from sqlalchemy import event
 from traitlets.config import Config
 
 from .. import orm
 from ..app import COOKIE_SECRET_BYTES, JupyterHub
+from ..spawner import Spawner
 from .mocking import MockHub
 from .test_api import add_user
 
@@ -271,6 +274,167 @@ async def test_load_groups(tmpdir, request):
     )
 
 
+async def test_update_last_activity():
+    hub = MockHub()
+    hub.init_db()
+    db = hub.db
+    users = []
+    for name in ('ahsoka', 'rex'):
+        orm_user = orm.User(name=name)
+        db.add(orm_user)
+        db.add(orm.Spawner(user=orm_user, name=''))
+        users.append(orm_user)
+    db.commit()
+    ahsoka, rex = users
+    before = datetime.utcnow() - timedelta(hours=1)
+    ahsoka.last_activity = before
+    ahsoka.orm_spawners[''].last_activity = before
+    db.commit()
+
+    now = datetime.utcnow()
+    routes = {}
+    for name, last_activity in (
+        ('ahsoka', now),
+        ('rex', before - timedelta(hours=1)),
+        ('nosuchuser', now),
+    ):
+        routes[f'/user/{name}/'] = {
+            'data': {
+                'user': name,
+                'server_name': '',
+                'last_activity': last_activity.isoformat() + 'Z',
+            }
+        }
+
+    hub.proxy = Mock(
+        get_all_routes=AsyncMock(return_value=routes), check_routes=AsyncMock()
+    )
+    hub.tornado_settings = {'users': {}}
+    queries = []
+    record_query = queries.append
+    event.listen(db, 'do_orm_execute', record_query)
+    try:
+        await hub.update_last_activity()
+    finally:
+        event.remove(db, 'do_orm_execute', record_query)
+    # one query each for users and spawners, one update each for users and spawners
+    assert len(queries) == 4
+    hub.proxy.check_routes.assert_called_once()
+
+    db.expire_all()
+    assert ahsoka.last_activity == now
+    assert ahsoka.orm_spawners[''].last_activity == now
+    # never moved backward, but set if unset
+    assert rex.last_activity == before - timedelta(hours=1)
+
+
+async def test_update_last_activity_incremental():
+    hub = MockHub(last_activity_full_interval=3600)
+    hub.init_db()
+    db = hub.db
+    orm_user = orm.User(name='cody')
+    db.add(orm_user)
+    db.add(orm.Spawner(user=orm_user, name=''))
+    db.commit()
+
+    now = datetime.utcnow()
+    routes = {
+        '/user/cody/': {
+            'data': {
+                'user': 'cody',
+                'server_name': '',
+                'last_activity': now.isoformat() + 'Z',
+            }
+        }
+    }
+    hub.proxy = Mock(
+        get_all_routes=AsyncMock(return_value=routes),
+        get_routes_active_since=AsyncMock(return_value={}),
+        check_routes=AsyncMock(),
+    )
+    hub.tornado_settings = {'users': {}}
+
+    # the first update is always full
+    await hub.update_last_activity()
+    hub.proxy.get_all_routes.assert_called_once()
+    hub.proxy.check_routes.assert_called_once()
+    first_poll = hub._last_activity_poll
+
+    # later updates only fetch recent activity, without checking routes
+    await hub.update_last_activity()
+    hub.proxy.get_routes_active_since.assert_called_once_with(first_poll)
+    hub.proxy.get_all_routes.assert_called_once()
+    hub.proxy.check_routes.assert_called_once()
+
+    # until the full interval has passed
+    hub._last_activity_full_check -= 3600
+    await hub.update_last_activity()
+    assert hub.proxy.get_all_routes.call_count == 2
+    assert hub.proxy.check_routes.call_count == 2
+
+
+
+class _CheckSpawner(Spawner):
+    """Spawner recording the order and concurrency of polls"""
+
+    polled = []
+    running = 0
+    max_running = 0
+    unblock = None
+
+    async def start(self):
+        raise NotImplementedError()
+
+    async def stop(self):
+        pass
+
+    async def poll(self):
+        cls = type(self)
+        cls.polled.append(self.user.name)
+        cls.running += 1
+        cls.max_running = max(cls.max_running, cls.running)
+        if self.user.name in {"nell-0", "nell-1"}:
+            await cls.unblock.wait()
+        await asyncio.sleep(0.01)
+        cls.running -= 1
+        return 0
+
+
+async def test_init_spawners_concurrency():
+    hub = MockHub(spawner_class=_CheckSpawner, init_spawners_concurrency=2)
+    await hub.initialize([])
+    db = hub.db
+    now = datetime.utcnow()
+    for i in range(6):
+        orm_user = orm.User(name=f"nell-{i}")
+        orm_spawner = orm.Spawner(user=orm_user, name='', server=orm.Server())
+        orm_spawner.last_activity = now - timedelta(minutes=i)
+        db.add(orm_user)
+    # last to be checked
+    orm_user.orm_spawners[''].last_activity = None
+    db.commit()
+    _CheckSpawner.unblock = asyncio.Event()
+
+    init_spawners = asyncio.ensure_future(hub.init_spawners())
+    await asyncio.sleep(0.2)
+    # most recently active first, at most 2 at a time
+    assert _CheckSpawner.polled == ["nell-0", "nell-1"]
+    # a request from a user whose servers haven't been checked checks them now
+    last_user = hub.users["nell-5"]
+    assert last_user.spawner.pending == "check"
+    hub._queued_spawner_checks[last_user.id]()
+    await asyncio.sleep(0.1)
+    assert _CheckSpawner.polled[-1] == "nell-5"
+    assert last_user.spawner.pending is None
+
+    _CheckSpawner.unblock.set()
+    assert await init_spawners == 6
+    assert _CheckSpawner.polled == [f"nell-{i}" for i in [0, 1, 5, 2, 3, 4]]
+    assert _CheckSpawner.max_running <= 3
+    assert db.query(orm.Server).count() == 0
+    assert not hub._queued_spawner_checks
+
+
 async def test_resume_spawners(tmpdir, request):
     if not os.getenv('JUPYTERHUB_TEST_DB_URL'):
         p = patch.dict(
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from binascii import b2a_base64, b2a_hex
 from unittest.mock import patch
@@ -6,6 +7,7 @@ import pytest
 
 from .. import crypto
 from ..crypto import decrypt, encrypt
+from ..utils import hash_token
 
 keys = [('%i' % i).encode('ascii') * 32 for i in range(3)]
 hex_keys = [b2a_hex(key).decode('ascii') for key in keys]
@@ -82,3 +84,25 @@ async def test_missing_keys(crypt_keeper):
 
     with pytest.raises(crypto.NoEncryptionKeys):
         await decrypt(b'whatever')
+
+
+async def test_token_verifier():
+    verifier = crypto.TokenVerifier(2, max_pending=2)
+    try:
+        hashed = hash_token("token", rounds=1)
+        assert await verifier.compare(hashed, "token")
+        assert not await verifier.compare(hashed, "wrong")
+        assert verifier.pending == 0
+
+        # fill the queue
+        checks = [
+            asyncio.ensure_future(verifier.compare(hashed, "token")) for i in range(2)
+        ]
+        await asyncio.sleep(0)
+        assert verifier.pending == 2
+        with pytest.raises(crypto.TokenVerifierBusy):
+            await verifier.compare(hashed, "token")
+        assert await asyncio.gather(*checks) == [True, True]
+        assert verifier.pending == 0
+    finally:
+        verifier.shutdown()
@@ -0,0 +1,68 @@
+"""Tests for the group membership index"""
+from .. import orm
+from .._group_index import groups_for_user, index_version
+from ..scopes import _intersect_expanded_scopes
+
+
+def test_group_index(db):
+    user = orm.User(name='ezra')
+    group = orm.Group(name='ghost', users=[user])
+    other = orm.Group(name='phantom')
+    db.add_all([group, other])
+    db.commit()
+
+    assert groups_for_user(db, 'ezra') == {'ghost'}
+    assert groups_for_user(db, 'nobody') == frozenset()
+    version = index_version(db)
+    assert index_version(db) == version
+
+    other.users.append(user)
+    assert groups_for_user(db, 'ezra') == {'ghost', 'phantom'}
+    assert index_version(db) != version
+    user.groups.remove(group)
+    db.commit()
+    assert groups_for_user(db, 'ezra') == {'phantom'}
+
+    # new users with groups
+    new_user = orm.User(name='sabine', groups=[group])
+    db.add(new_user)
+    db.commit()
+    assert groups_for_user(db, 'sabine') == {'ghost'}
+
+    # renames
+    other.name = 'spectre'
+    db.commit()
+    assert groups_for_user(db, 'ezra') == {'spectre'}
+
+    # uncommitted changes are discarded on rollback
+    other.users.remove(user)
+    assert groups_for_user(db, 'ezra') == frozenset()
+    db.rollback()
+    assert groups_for_user(db, 'ezra') == {'spectre'}
+
+    # deletion
+    db.delete(other)
+    db.commit()
+    assert groups_for_user(db, 'ezra') == frozenset()
+    db.delete(new_user)
+    db.commit()
+    assert groups_for_user(db, 'sabine') == frozenset()
+
+
+def test_group_index_intersection(db):
+    user = orm.User(name='hera')
+    group = orm.Group(name='spectres')
+    db.add_all([user, group])
+    db.commit()
+
+    group_scopes = {'read:users!group=spectres'}
+    user_scopes = {'read:users!user=hera'}
+    assert _intersect_expanded_scopes(group_scopes, user_scopes, db=db) == set()
+
+    # cached results follow group membership
+    group.users.append(user)
+    db.commit()
+    assert _intersect_expanded_scopes(group_scopes, user_scopes, db=db) == user_scopes
+    group.users.remove(user)
+    db.commit()
+    assert _intersect_expanded_scopes(group_scopes, user_scopes, db=db) == set()
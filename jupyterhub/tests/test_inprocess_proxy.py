@@ -0,0 +1,161 @@
+"""Tests for the in-process proxy"""
+import asyncio
+from unittest import mock
+
+import pytest
+from tornado import web
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
+from tornado.websocket import WebSocketHandler, websocket_connect
+
+from ..inprocess_proxy import InProcessProxy
+from ..utils import random_port
+from .mocking import MockHub
+from .utils import api_request, get_page
+
+
+class EchoHandler(web.RequestHandler):
+    def get(self, path):
+        self.set_header("X-Echo-Path", self.request.path)
+        self.set_header("X-Echo-For", self.request.headers.get("X-Forwarded-For"))
+        self.write(self.request.path)
+
+    def post(self, path):
+        self.set_status(201)
+        self.write(self.request.body)
+
+
+class StreamHandler(web.RequestHandler):
+    async def get(self):
+        for i in range(3):
+            self.write(f"chunk {i}\n")
+            await self.flush()
+
+
+class EchoWebSocket(WebSocketHandler):
+    def select_subprotocol(self, subprotocols):
+        return subprotocols[0] if subprotocols else None
+
+    def on_message(self, message):
+        self.write_message(message, binary=isinstance(message, bytes))
+
+
+@pytest.fixture
+async def upstream():
+    """An upstream server to proxy to"""
+    port = random_port()
+    app = web.Application(
+        [
+            (r"/ws", EchoWebSocket),
+            (r"/user/stream", StreamHandler),
+            (r"(.*)", EchoHandler),
+        ]
+    )
+    server = HTTPServer(app)
+    server.listen(port, address="127.0.0.1")
+    yield f"http://127.0.0.1:{port}"
+    server.stop()
+
+
+@pytest.fixture
+async def proxy():
+    port = random_port()
+    hub = mock.Mock(url="http://127.0.0.1:1/hub/")
+    proxy = InProcessProxy(
+        public_url=f"http://127.0.0.1:{port}",
+        app=mock.Mock(internal_ssl=False),
+        hub=hub,
+    )
+    await proxy.start()
+    yield proxy
+    proxy.stop()
+
+
+async def test_inprocess_proxy_routes(proxy, upstream):
+    await proxy.add_route("/", "http://127.0.0.1:1", {"hub": True})
+    await proxy.add_route("/user/ab%20c", upstream, {"user": "ab c"})
+    route = await proxy.get_route("/user/ab%20c/")
+    assert route["target"] == upstream
+    assert route["data"]["user"] == "ab c"
+    assert "last_activity" in route["data"]
+    routes = await proxy.get_all_routes()
+    assert sorted(routes) == ["/", "/user/ab%20c/"]
+
+    await proxy.delete_route("/user/ab%20c/")
+    assert await proxy.get_route("/user/ab%20c/") is None
+    assert sorted(await proxy.get_all_routes()) == ["/"]
+
+
+async def test_inprocess_proxy_http(proxy, upstream):
+    await proxy.add_route("/user/a/", upstream, {"user": "a"})
+    client = AsyncHTTPClient()
+    r = await client.fetch(proxy.public_url + "/user/a/tree?x=1")
+    assert r.body == b"/user/a/tree"
+    assert r.headers["X-Echo-For"] == "127.0.0.1"
+
+    r = await client.fetch(
+        proxy.public_url + "/user/a/api", method="POST", body=b"hello"
+    )
+    assert r.code == 201
+    assert r.body == b"hello"
+
+    r = await client.fetch(proxy.public_url + "/user/b/", raise_error=False)
+    assert r.code == 404
+
+
+async def test_inprocess_proxy_stream(proxy, upstream):
+    await proxy.add_route("/user/", upstream, {})
+    chunks = []
+    client = AsyncHTTPClient()
+    await client.fetch(
+        proxy.public_url + "/user/stream", streaming_callback=chunks.append
+    )
+    assert b"".join(chunks) == b"chunk 0\nchunk 1\nchunk 2\n"
+
+
+async def test_inprocess_proxy_websocket(proxy, upstream):
+    await proxy.add_route("/ws/", upstream, {})
+    url = proxy.public_url.replace("http", "ws", 1) + "/ws"
+    ws = await websocket_connect(url, subprotocols=["v1.kernel.websocket"])
+    assert ws.selected_subprotocol == "v1.kernel.websocket"
+    await ws.write_message("hi")
+    assert await ws.read_message() == "hi"
+    await ws.write_message(b"\x00\x01", binary=True)
+    assert await ws.read_message() == b"\x00\x01"
+    ws.close()
+
+
+async def test_inprocess_proxy_unavailable(proxy):
+    await proxy.add_route("/user/gone/", f"http://127.0.0.1:{random_port()}", {})
+    client = AsyncHTTPClient()
+    r = await client.fetch(proxy.public_url + "/user/gone/", raise_error=False)
+    assert r.code == 503
+
+
+async def test_inprocess_proxy_hub(request, io_loop):
+    """Run a Hub with the in-process proxy, without configurable-http-proxy"""
+    app = MockHub(proxy_class=InProcessProxy)
+
+    def fin():
+        app.log.handlers = []
+        app.stop()
+
+    request.addfinalizer(fin)
+    await app.initialize([])
+    await app.start()
+
+    name = "kyle"
+    r = await api_request(app, "users", name, method="post")
+    r.raise_for_status()
+    r = await api_request(app, "users", name, "server", method="post")
+    r.raise_for_status()
+    user = app.users[name]
+    while user.spawner.pending:
+        await asyncio.sleep(0.1)
+    routes = await app.proxy.get_all_routes()
+    assert user.proxy_spec in routes
+
+    # requests for the server are proxied to it (mocksu echoes the path)
+    r = await get_page(f"user/{name}/echo", app, hub=False)
+    r.raise_for_status()
+    assert r.text == f"{app.base_url}user/{name}/echo"
@@ -1,6 +1,12 @@
 import pytest
 
-from jupyterhub._memoize import DoNotCache, FrozenDict, LRUCache, lru_cache_key
+from jupyterhub._memoize import (
+    DoNotCache,
+    FrozenDict,
+    LRUCache,
+    TTLCache,
+    lru_cache_key,
+)
 
 
 def test_lru_cache():
@@ -24,6 +30,26 @@ def test_lru_cache():
     assert "b" not in cache
 
 
+def test_ttl_cache():
+    now = 0
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now)
+    cache["a"] = 1
+    assert cache["a"] == 1
+    now = 5
+    cache["b"] = 2
+    assert "a" in cache
+    # a expires before b
+    now = 11
+    assert "a" not in cache
+    assert cache["b"] == 2
+    assert len(cache) == 1
+    now = 16
+    assert cache.get("b", "missing") == "missing"
+    cache["c"] = 3
+    assert cache.pop("c") == 3
+    assert "c" not in cache
+
+
 def test_lru_cache_key():
     call_count = 0
 
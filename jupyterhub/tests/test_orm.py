@@ -11,6 +11,7 @@ import pytest
 from .. import crypto, objects, orm, roles
 from ..emptyclass import EmptyClass
 from ..user import User
+from ..utils import compare_token, hash_token, new_token
 from .mocking import MockSpawner
 
 
@@ -117,6 +118,64 @@ def test_tokens(db):
     assert len(user.api_tokens) == 3
 
 
+def test_token_rehash(db):
+    user = orm.User(name='jayne')
+    db.add(user)
+    db.commit()
+    # a user-provided token and a generated token stored with the legacy scheme
+    secret = 'vera-is-a-very-good-token'
+    generated = new_token()
+    for token, rounds in ((secret, 16384), (generated, 1)):
+        orm_token = orm.APIToken(
+            user=user,
+            client_id='jupyterhub',
+            prefix=token[: orm.APIToken.prefix_length],
+            hashed=hash_token(token, rounds=rounds, algorithm='sha512'),
+        )
+        db.add(orm_token)
+    db.commit()
+
+    for token, expected_rounds in (
+        (secret, orm.APIToken.rounds),
+        (generated, orm.APIToken.generated_rounds),
+    ):
+        orm_token = orm.APIToken.find(db, token)
+        assert orm_token is not None
+        assert not orm_token.needs_rehash
+        algo, rounds, salt, _ = orm_token.hashed.split(':')
+        assert algo == orm.APIToken.algorithm
+        assert rounds == str(expected_rounds)
+        # the upgraded hash is persisted and still matches
+        db.expire(orm_token)
+        assert orm.APIToken.find(db, token).id == orm_token.id
+        assert orm_token.match(token)
+
+
+async def test_token_find_async(db):
+    user = orm.User(name='book')
+    db.add(user)
+    db.commit()
+    token = user.new_api_token()
+    compared = []
+
+    async def compare(hashed, token):
+        compared.append(hashed)
+        return compare_token(hashed, token)
+
+    found = await orm.APIToken.find_async(db, token, compare=compare)
+    assert found is not None
+    assert found.match(token)
+    assert compared == [found.hashed]
+    # verified once, then cached
+    assert await orm.APIToken.find_async(db, token, compare=compare) is found
+    assert len(compared) == 1
+    assert (
+        await orm.APIToken.find_async(db, token, kind='service', compare=compare)
+        is None
+    )
+    assert await orm.APIToken.find_async(db, 'not-a-token', compare=compare) is None
+
+
 def test_token_expiry(db):
     user = orm.User(name='parker')
     db.add(user)
@@ -212,6 +271,50 @@ def test_token_find(db):
     assert found is None
 
 
+def test_token_cache(db):
+    cache = orm.APIToken.verified_cache
+    user = orm.User(name='wash')
+    db.add(user)
+    db.commit()
+    token = user.new_api_token()
+    found = orm.APIToken.find(db, token)
+    assert found is not None
+    key = cache.cache_key(token)
+    assert cache.get(key) == (found.id, found.hashed)
+    # the raw token is never a key
+    assert token.encode() not in key
+
+    # a hit doesn't need to check hashes
+    with mock.patch.object(orm.APIToken, 'match') as match:
+        assert orm.APIToken.find(db, token) is found
+        assert orm.APIToken.find(db, token, kind='user') is found
+        assert orm.APIToken.find(db, token, kind='service') is None
+    match.assert_not_called()
+
+    # expired tokens are dropped from the cache
+    found.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert orm.APIToken.find(db, token) is None
+    assert cache.get(key) is None
+    found.expires_at = None
+    db.commit()
+    assert orm.APIToken.find(db, token) is found
+
+    # deleting a token invalidates it
+    db.delete(found)
+    db.commit()
+    assert cache.get(key) is None
+    assert orm.APIToken.find(db, token) is None
+
+    # entries whose hash no longer matches are not trusted
+    token = user.new_api_token()
+    found = orm.APIToken.find(db, token)
+    key = cache.cache_key(token)
+    cache._cache.set(key, (found.id, 'sha512:1:x:y'))
+    assert orm.APIToken.find(db, token) is found
+    assert cache.get(key) == (found.id, found.hashed)
+
+
 async def test_spawn_fails(db):
     orm_user = orm.User(name='aeofel')
     db.add(orm_user)
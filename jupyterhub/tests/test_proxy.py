@@ -3,12 +3,15 @@ import json
 import os
 from contextlib import contextmanager
 from subprocess import Popen
+from unittest import mock
 from urllib.parse import quote, urlparse
 
 import pytest
+from tornado.httpclient import HTTPError
 from traitlets import TraitError
 from traitlets.config import Config
 
+from ..proxy import ConfigurableHTTPProxy, Proxy, RouteTrie
 from ..utils import url_path_join as ujoin
 from ..utils import wait_for_http_server
 from .mocking import MockHub
@@ -194,6 +197,155 @@ async def test_check_routes(app, username, disable_check_routes):
     assert before == after
 
 
+def test_route_trie():
+    table = RouteTrie()
+    for routespec in ("/", "/user/a/", "/user/a/lab/", "/user/a%20b/"):
+        table.add(routespec, {"target": routespec})
+    assert len(table) == 4
+    assert table.match("/user/a")[0] == "/user/a/"
+    assert table.match("/user/a/lab/tree")[0] == "/user/a/lab/"
+    assert table.match("/user/ab/")[0] == "/"
+    assert table.match("/user/a b/tree")[0] == "/user/a%20b/"
+
+    version = table.version
+    snapshot = table.snapshot()
+    assert sorted(snapshot) == sorted(table)
+    assert table.snapshot() is snapshot
+    assert table.remove("/user/a/") == {"target": "/user/a/"}
+    assert table.remove("/user/a/") is None
+    assert table.version == version + 1
+    assert table.snapshot() is not snapshot
+    assert table.match("/user/a/tree")[0] == "/"
+    assert table.match("/user/a/lab")[0] == "/user/a/lab/"
+
+    # replacing with the same routes is not a change
+    version = table.version
+    table.replace(dict(table.items()))
+    assert table.version == version
+    table.replace({"/": {"target": "/"}})
+    assert list(table) == ["/"]
+    assert table._root.children == {}
+
+
+def test_route_trie_host():
+    table = RouteTrie(
+        {
+            "/": {"target": "hub"},
+            "a.example.com/user/a/": {"target": "a"},
+            "b.example.com/user/b/": {"target": "b"},
+        }
+    )
+    assert table.match("/user/a/tree", host="a.example.com")[0] == (
+        "a.example.com/user/a/"
+    )
+    assert table.match("/user/a/tree", host="b.example.com")[0] == "/"
+    assert table.match("/hub/", host="a.example.com")[0] == "/"
+
+
+class DictProxy(Proxy):
+    """Proxy storing routes in a dict, counting updates"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.routes = {}
+        self.updates = 0
+
+    async def add_route(self, routespec, target, data):
+        self.updates += 1
+        self.routes[routespec] = {
+            'routespec': routespec,
+            'target': target,
+            'data': data,
+        }
+
+    async def delete_route(self, routespec):
+        self.updates += 1
+        self.routes.pop(routespec, None)
+
+    async def get_all_routes(self):
+        return {routespec: dict(route) for routespec, route in self.routes.items()}
+
+
+async def test_check_routes_incremental():
+    hub = mock.Mock(routespec='/hub/', host='http://127.0.0.1:8081')
+    proxy = DictProxy(app=mock.Mock(hub=hub), hub=hub, check_routes_full_interval=60)
+    spawner = mock.Mock(
+        ready=True,
+        pending=None,
+        proxy_spec='/user/nell/',
+        server=mock.Mock(host='http://127.0.0.1:9000'),
+    )
+    user = mock.Mock(spawners={'': spawner}, proxy_spec='/user/nell/')
+    user.name = 'nell'
+    user_dict = {1: user}
+
+    # the first check is full
+    await proxy.check_routes(user_dict, {})
+    assert sorted(proxy.routes) == ['/hub/', '/user/nell/']
+    # get_route uses the local route table, if there is one
+    proxy.route_table = RouteTrie(await proxy.get_all_routes())
+    with mock.patch.object(proxy, 'get_all_routes') as get_all_routes:
+        route = await proxy.get_route('/user/nell/')
+    get_all_routes.assert_not_called()
+    assert route['target'] == 'http://127.0.0.1:9000'
+    proxy.route_table = None
+    assert not proxy._dirty_routes
+
+    # changes outside the Hub are left until the next full check
+    proxy.routes.pop('/user/nell/')
+    proxy.get_all_routes = mock.AsyncMock(wraps=proxy.get_all_routes)
+    await proxy.check_routes(user_dict, {})
+    proxy.get_all_routes.assert_not_called()
+    assert '/user/nell/' not in proxy.routes
+
+    # failed updates are retried on the next check
+    updates = proxy.updates
+    with mock.patch.object(proxy, 'delete_route', side_effect=RuntimeError("oops")):
+        with pytest.raises(RuntimeError):
+            await proxy.delete_user(user)
+    assert proxy._dirty_routes.keys() == {'/user/nell/'}
+    await proxy.check_routes(user_dict, {})
+    assert not proxy._dirty_routes
+    assert proxy.updates == updates + 1
+    proxy.get_all_routes.assert_not_called()
+
+    await proxy.add_user(user)
+    assert not proxy._dirty_routes
+    await proxy.check_routes(user_dict, {})
+    assert proxy.updates == updates + 2
+
+    # a full check catches everything
+    proxy.routes['/stale/'] = {'routespec': '/stale/', 'target': 'x', 'data': {}}
+    spawner.server.host = 'http://127.0.0.1:9001'
+    await proxy.check_routes(user_dict, {}, full=True)
+    assert sorted(proxy.routes) == ['/hub/', '/user/nell/']
+    assert proxy.routes['/user/nell/']['target'] == 'http://127.0.0.1:9001'
+
+
+async def test_chp_add_routes():
+    proxy = ConfigurableHTTPProxy(auth_token='secret', should_start=False)
+    attempts = {}
+
+    async def api_request(path, method='GET', body=None, client=None):
+        assert client is not None
+        attempts[path] = attempts.get(path, 0) + 1
+        if path == '/flaky' and attempts[path] == 1:
+            raise ConnectionResetError("connection reset")
+        if path == '/bad':
+            raise HTTPError(400)
+
+    proxy.api_request = api_request
+    routes = {
+        f'/{name}/': {'target': 'http://127.0.0.1:9000', 'data': {}}
+        for name in ('ok', 'flaky', 'bad')
+    }
+    failed = await proxy.add_routes(routes)
+    assert list(failed) == ['/bad/']
+    assert attempts == {'/ok': 1, '/flaky': 2, '/bad': 1}
+    # route data isn't modified
+    assert routes['/ok/']['data'] == {}
+
+
 @pytest.mark.parametrize(
     "routespec",
     [
@@ -1,4 +1,5 @@
 """Test scopes for API handlers"""
+import time
 from operator import itemgetter
 from unittest import mock
 
@@ -1292,3 +1293,186 @@ def test_resolve_requested_scopes(
     )
     assert allowed == expected_allowed
     assert disallowed == expected_disallowed
+
+
+async def test_scopes_cache(app, create_temp_role, create_user_with_scopes):
+    db = app.db
+    group_scope = 'read:users:activity!group=cached-group'
+    user = create_user_with_scopes('read:users:name')
+    user_scope = f'read:users:activity!user={user.name}'
+    role = create_temp_role([group_scope])
+    user.sync_groups(['cached-group'])
+    group = orm.Group.find(db, 'cached-group')
+    roles.grant_role(db, group, role)
+    token = user.new_api_token(scopes=[group_scope])
+    orm_token = orm.APIToken.find(db, token)
+
+    user_scopes = get_scopes_for(user)
+    assert get_scopes_for(user) is user_scopes
+    assert group_scope in user_scopes
+    token_scopes = get_scopes_for(orm_token)
+    assert get_scopes_for(orm_token) is token_scopes
+    assert group_scope in token_scopes
+
+    # group membership
+    user.sync_groups([])
+    assert group_scope not in get_scopes_for(user)
+    assert group_scope not in get_scopes_for(orm_token)
+    group.users.append(user.orm_user)
+    db.commit()
+    assert group_scope in get_scopes_for(user)
+    assert group_scope in get_scopes_for(orm_token)
+
+    # role scopes
+    role.scopes = [user_scope]
+    db.commit()
+    user_scopes = get_scopes_for(user)
+    assert user_scope in user_scopes
+    assert group_scope not in user_scopes
+
+    # role assignment
+    roles.strip_role(db, group, role)
+    assert user_scope not in get_scopes_for(user)
+    roles.grant_role(db, group, role)
+    assert user_scope in get_scopes_for(user)
+
+    # deleted group
+    db.delete(group)
+    db.commit()
+    assert user_scope not in get_scopes_for(user)
+
+    # token scopes
+    orm_token.update_scopes(['read:users:name!user'])
+    db.commit()
+    assert f'read:users:name!user={user.name}' in get_scopes_for(orm_token)
+
+
+@mark.parametrize(
+    "scope_list",
+    [
+        ['read:users'],
+        ['read:users!user=sql-a'],
+        ['read:users!group=sql-group'],
+        ['read:users!user=sql-a', 'read:users!group=sql-group'],
+        ['read:users!server=sql-b/'],
+        ['read:users!server=sql-b/x', 'read:users!server=sql-c/'],
+        ['read:users!server=sql-b/x', 'read:users!user=sql-a'],
+        ['read:users!group=sql-group', 'read:users!service=sql-service'],
+        ['read:users!service=sql-service'],
+    ],
+)
+def test_scope_filter_clause(db, scope_list):
+    group = orm.Group.find(db, 'sql-group')
+    if group is None:
+        group = orm.Group(name='sql-group')
+        db.add(group)
+        for name in ('sql-a', 'sql-b', 'sql-c'):
+            user = orm.User(name=name)
+            db.add(user)
+            for server_name in ('', 'x'):
+                db.add(orm.Spawner(user=user, name=server_name))
+        group.users.append(orm.User.find(db, 'sql-c'))
+        db.add(orm.Service(name='sql-service'))
+        db.add(orm.Group(name='sql-other-group'))
+        db.commit()
+
+    sub_scope = parse_scopes(scope_list)['read:users']
+    for kind, model, query in [
+        ('user', orm.User, db.query(orm.User).filter(orm.User.name.like('sql-%'))),
+        ('group', orm.Group, db.query(orm.Group).filter(orm.Group.name.like('sql-%'))),
+        (
+            'service',
+            orm.Service,
+            db.query(orm.Service).filter(orm.Service.name.like('sql-%')),
+        ),
+        (
+            'server',
+            orm.Spawner,
+            db.query(orm.Spawner).filter(
+                orm.Spawner.user.has(orm.User.name.like('sql-%'))
+            ),
+        ),
+    ]:
+        expected = {
+            obj.id for obj in query if scopes.check_scope_filter(sub_scope, obj, kind)
+        }
+        clause = scopes.scope_filter_clause(sub_scope, kind)
+        if clause is not None:
+            query = query.filter(clause)
+        assert {obj.id for obj in query} == expected, kind
+
+
+def test_scope_checker():
+    parsed = parse_scopes(
+        [
+            'read:users',
+            'read:servers!user=lindsay',
+            'read:servers!server=tobias/blue',
+            'admin:users!group=bluth',
+        ]
+    )
+    checker = scopes.compile_scopes(parsed)
+    assert scopes.compile_scopes(parsed) is checker
+    with pytest.raises(AttributeError):
+        checker._filters = {}
+
+    assert 'read:users' in checker
+    assert 'admin:servers' not in checker
+    assert checker.unrestricted('read:users')
+    assert not checker.unrestricted('read:servers')
+
+    assert checker.can('read:users', user='anyone')
+    assert not checker.can('admin:servers', user='lindsay')
+    assert checker.can('read:servers')
+    assert checker.can('read:servers', user='lindsay', server='lindsay/x')
+    assert checker.can('read:servers', user='tobias', server='tobias/blue')
+    assert not checker.can('read:servers', user='tobias', server='tobias/red')
+
+    groups = {'maeby': {'bluth'}, 'ann': {'veal'}}
+    assert not checker.can('admin:users', user='maeby')
+    assert checker.can('admin:users', user_groups=groups.get, user='maeby')
+    assert not checker.can('admin:users', user_groups=groups.get, user='ann')
+
+
+def test_scope_checker_benchmark():
+    """Checks per second for a token with hundreds of filtered scopes"""
+    n = 500
+    scope_list = set()
+    for i in range(n):
+        scope_list.add(f'read:users!user=user-{i}')
+        scope_list.add(f'read:servers!server=user-{i}/server-{i}')
+        scope_list.add(f'admin:users!group=group-{i}')
+    parsed = parse_scopes(scope_list)
+    handler = get_handler_with_scopes(scope_list)
+    checks = [('read:users', {'user': f'user-{i}'}) for i in range(0, 2 * n, 2)] + [
+        ('read:servers', {'user': f'user-{i}', 'server': f'server-{i}'})
+        for i in range(n)
+    ]
+
+    tic = time.perf_counter()
+    scopes.compile_scopes(parsed)
+    compile_time = time.perf_counter() - tic
+
+    def run_checks():
+        count = 0
+        for scope, kwargs in checks:
+            try:
+                _check_scope_access(handler, scope, **kwargs)
+            except web.HTTPError:
+                pass
+            count += 1
+        return count
+
+    # warm up
+    run_checks()
+    count = 0
+    tic = time.perf_counter()
+    while time.perf_counter() - tic < 0.5:
+        count += run_checks()
+    rate = count / (time.perf_counter() - tic)
+    print(
+        f"{len(scope_list)} scopes: compiled in {1e3 * compile_time:.1f}ms,"
+        f" {rate:,.0f} checks/second"
+    )
+    # very loose bound, checks are constant time in the number of scopes
+    assert rate > 1000
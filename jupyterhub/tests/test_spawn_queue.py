@@ -0,0 +1,86 @@
+"""Tests for the spawn queue"""
+import asyncio
+from unittest import mock
+
+from ..spawn_queue import SpawnQueue
+
+
+def _spawner(name, priority=0):
+    return mock.Mock(_log_name=name, priority=priority)
+
+
+async def test_spawn_queue_order():
+    queue = SpawnQueue(1, priority=lambda spawner: spawner.priority)
+    started = []
+    blocked = {}
+
+    async def spawn(spawner):
+        started.append(spawner._log_name)
+        blocked[spawner._log_name] = f = asyncio.Future()
+        await f
+
+    first = _spawner("first")
+    spawners = [
+        _spawner("a"),
+        _spawner("b"),
+        _spawner("urgent", priority=1),
+        _spawner("c"),
+    ]
+    futures = [asyncio.ensure_future(queue.run(first, spawn(first)))]
+    await asyncio.sleep(0)
+    assert started == ["first"]
+    for spawner in spawners:
+        futures.append(asyncio.ensure_future(queue.run(spawner, spawn(spawner))))
+        await asyncio.sleep(0)
+    assert len(queue) == 4
+    assert [queue.position(s) for s in spawners] == [2, 3, 1, 4]
+    assert queue.position(first) is None
+
+    # leaving the queue moves others up
+    futures[2].cancel()
+    await asyncio.sleep(0)
+    assert len(queue) == 3
+    assert [queue.position(s) for s in spawners] == [2, None, 1, 3]
+
+    # queued spawns start one at a time as slots free up
+    for name in ["first", "urgent", "a"]:
+        blocked[name].set_result(None)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+    assert started == ["first", "urgent", "a", "c"]
+    assert len(queue) == 0
+    assert queue.active == 1
+    blocked["c"].set_result(None)
+    await asyncio.gather(*futures, return_exceptions=True)
+    assert queue.active == 0
+
+
+async def test_spawn_queue_watch():
+    queue = SpawnQueue(1)
+    spawners = [_spawner(name) for name in ("a", "b", "c")]
+    releases = {spawner: asyncio.Future() for spawner in spawners}
+
+    futures = [
+        asyncio.ensure_future(queue.run(spawner, releases[spawner]))
+        for spawner in spawners
+    ]
+    await asyncio.sleep(0)
+    positions = []
+
+    async def watch():
+        async for position in queue.watch(spawners[2]):
+            positions.append(position)
+
+    watcher = asyncio.ensure_future(watch())
+    await asyncio.sleep(0)
+    assert positions == [(2, 2)]
+    releases[spawners[0]].set_result(None)
+    for i in range(3):
+        await asyncio.sleep(0)
+    assert positions == [(2, 2), (1, 1)]
+    releases[spawners[1]].set_result(None)
+    await asyncio.wait_for(watcher, timeout=5)
+    releases[spawners[2]].set_result(None)
+    await asyncio.gather(*futures)
+    assert len(queue) == 0
+    assert queue.active == 0
@@ -17,6 +17,7 @@ import pytest
 from .. import orm
 from .. import spawner as spawnermod
 from ..objects import Hub, Server
+from ..polling import PollScheduler
 from ..scopes import access_scopes
 from ..spawner import LocalProcessSpawner, Spawner
 from ..user import User
@@ -193,6 +194,146 @@ async def test_spawner_poll(db):
     assert status is not None
 
 
+
+@pytest.mark.skipif(not hasattr(os, "pidfd_open"), reason="needs pidfd_open")
+async def test_spawner_watch_exit(db):
+    # poll_interval and death_interval too long for the test to pass by polling
+    spawner = new_spawner(db, poll_interval=30, death_interval=10)
+    await spawner.start()
+    proc = spawner.proc
+    stopped = asyncio.Event()
+    spawner.add_poll_callback(stopped.set)
+    spawner.start_polling()
+    assert spawner._notify_on_exit
+    assert len(PollScheduler.instance()) == 0
+
+    proc.terminate()
+    await asyncio.wait_for(stopped.wait(), 5)
+    assert spawner.pid == 0
+    assert not spawner._notify_on_exit
+
+    # stop returns as soon as the process exits
+    spawner = new_spawner(db, death_interval=10, interrupt_timeout=10)
+    await spawner.start()
+    tic = time.perf_counter()
+    await spawner.stop()
+    assert time.perf_counter() - tic < 3
+    assert spawner.proc is None or spawner.proc.poll() is not None
+
+
+class _PollCounter:
+    """Stand-in for a spawner, counting concurrent polls"""
+
+    log = logging.getLogger("test")
+    poll_interval = 0.1
+    running = 0
+    max_running = 0
+
+    def __init__(self, name):
+        self._log_name = name
+        self.polls = 0
+
+    async def poll_and_notify(self):
+        cls = type(self)
+        cls.running += 1
+        cls.max_running = max(cls.max_running, cls.running)
+        self.polls += 1
+        await asyncio.sleep(0.05)
+        cls.running -= 1
+        if self._log_name == "broken":
+            raise RuntimeError("poll failed")
+        return None
+
+
+async def test_poll_scheduler():
+    scheduler = PollScheduler(concurrency=2)
+    spawners = [_PollCounter(str(i)) for i in range(5)]
+    spawners.append(_PollCounter("broken"))
+    for spawner in spawners:
+        scheduler.add(spawner)
+    assert len(scheduler) == 6
+    await asyncio.sleep(1)
+    # all polled, repeatedly, with no more than 2 polls at a time
+    assert all(spawner.polls >= 2 for spawner in spawners)
+    assert _PollCounter.max_running == 2
+
+    # removed spawners aren't polled anymore
+    removed = spawners[0]
+    scheduler.remove(removed)
+    assert len(scheduler) == 5
+    await asyncio.sleep(0.1)
+    polls = removed.polls
+    await asyncio.sleep(0.5)
+    assert removed.polls == polls
+    assert spawners[1].polls > polls
+
+    for spawner in spawners:
+        scheduler.remove(spawner)
+    assert len(scheduler) == 0
+    await asyncio.sleep(0.2)
+    assert scheduler._task is None
+
+
+async def test_spawner_poll_many(db):
+    started = new_spawner(db)
+    await started.start()
+    proc = started.proc
+    # loaded from state, without a Popen handle
+    resumed = new_spawner(db, user=started.user)
+    resumed.load_state(started.get_state())
+    assert resumed.proc is None
+    stopped = new_spawner(db, user=started.user)
+
+    statuses = await LocalProcessSpawner.poll_many([started, resumed, stopped])
+    assert statuses == [None, None, 0]
+
+    proc.terminate()
+    proc.wait()
+    statuses = await LocalProcessSpawner.poll_many([resumed, started])
+    assert statuses[0] == 0
+    assert statuses[1] is not None
+    assert resumed.pid == 0
+
+
+class _BatchPollCounter(_PollCounter):
+    """Stand-in for a spawner class that checks many servers at once"""
+
+    batches = []
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.notified = []
+
+    @classmethod
+    async def poll_many(cls, spawners):
+        cls.batches.append(len(spawners))
+        for spawner in spawners:
+            spawner.polls += 1
+        return [0 if spawner._log_name == "stopped" else None for spawner in spawners]
+
+    async def _notify_poll(self, status):
+        self.notified.append(status)
+
+
+async def test_poll_scheduler_batch():
+    scheduler = PollScheduler(jitter=0, batch_window=0.1)
+    spawners = [_BatchPollCounter(str(i)) for i in range(10)]
+    spawners.append(_BatchPollCounter("stopped"))
+    for spawner in spawners:
+        scheduler.add(spawner)
+    await asyncio.sleep(0.5)
+    assert all(spawner.polls >= 2 for spawner in spawners)
+    # polls that are due together are checked together
+    assert max(_BatchPollCounter.batches) == len(spawners)
+    assert sum(_BatchPollCounter.batches) == sum(s.polls for s in spawners)
+    assert set(spawners[-1].notified) == {0}
+    assert set(spawners[0].notified) == {None}
+    for spawner in spawners:
+        scheduler.remove(spawner)
+    await asyncio.sleep(0.2)
+    assert scheduler._task is None
+
+
 def test_setcwd():
     cwd = os.getcwd()
     with tempfile.TemporaryDirectory() as td:
@@ -1,7 +1,11 @@
+from unittest import mock
+
 import pytest
 
 from .. import orm
+from ..objects import Server
 from ..user import UserDict
+from ..utils import new_token
 from .utils import add_user
 
 
@@ -23,6 +27,113 @@ async def test_userdict_get(db, attr):
     assert key in userdict
 
 
+def test_userdict_indexes(db):
+    u = add_user(db, name="finn", app=False)
+    userdict = UserDict(db_factory=lambda: db, settings={})
+    assert userdict.get_by_cookie_id(u.cookie_id).id == u.id
+    assert "finn" in userdict
+
+    # cached lookups don't hit the database
+    with mock.patch.object(userdict, "db_factory") as db_factory:
+        assert userdict["finn"].id == u.id
+        assert userdict.get_by_cookie_id(u.cookie_id).id == u.id
+    db_factory.assert_not_called()
+
+    # rename
+    userdict["finn"].name = "fn-2187"
+    db.commit()
+    assert "finn" not in userdict
+    assert "fn-2187" in userdict
+    assert userdict.get("finn") is None
+
+    # cookie rotation
+    old_cookie_id = u.cookie_id
+    u.cookie_id = new_token()
+    db.commit()
+    assert userdict.get_by_cookie_id(old_cookie_id) is None
+    assert userdict.get_by_cookie_id(u.cookie_id).id == u.id
+
+    # removal from the cache
+    del userdict[u.id]
+    assert "fn-2187" not in userdict
+    assert userdict.get_by_cookie_id(u.cookie_id).id == u.id
+    userdict.delete(u.id)
+    assert "fn-2187" not in userdict
+    assert userdict.get_by_cookie_id(u.cookie_id) is None
+
+
+def test_userdict_evict(db):
+    users = [add_user(db, name=f"evict-{i}", app=False) for i in range(4)]
+    userdict = UserDict(db_factory=lambda: db, settings={}, max_resident=2)
+    # a user with a running server is never evicted
+    busy = userdict[users[0].id]
+    busy.spawner.orm_spawner.server = orm.Server()
+    db.commit()
+
+    userdict[users[1].id]
+    userdict[users[2].id]
+    assert len(userdict) == 2
+    assert busy.id in userdict
+    assert users[1].id not in userdict
+    assert "evict-1" not in userdict
+    assert users[1] not in db
+
+    # recently used users are kept
+    userdict[busy.id]
+    userdict[users[3].id]
+    assert set(userdict) == {busy.id, users[3].id}
+
+    # evicted users are reloaded on demand,
+    # even via orm objects that are no longer in the session
+    user = userdict[users[1]]
+    assert user.name == "evict-1"
+    assert user.orm_user in db
+
+    busy.spawner.orm_spawner.server = None
+    db.commit()
+
+
+def test_userdict_server_counts(db):
+    u = add_user(db, name="poe", app=False)
+    userdict = UserDict(db_factory=lambda: db, settings={})
+    user = userdict[u.id]
+    spawner = user.spawners[""]
+    assert userdict.count_active_users()["active"] == 0
+
+    spawner._spawn_pending = True
+    counts = userdict.count_active_users()
+    assert counts["pending"] == counts["spawn_pending"] == counts["active"] == 1
+    orm_server = orm.Server()
+    db.add(orm_server)
+    db.commit()
+    spawner.server = Server(orm_server=orm_server)
+    spawner._proxy_pending = True
+    spawner._proxy_pending = False
+    spawner._spawn_pending = False
+    counts = userdict.count_active_users()
+    assert counts["pending"] == counts["spawn_pending"] == 0
+    assert counts["active"] == counts["ready"] == 1
+
+    spawner._stop_pending = True
+    assert userdict.count_active_users()["stop_pending"] == 1
+    spawner.server = None
+    spawner._stop_pending = False
+    counts = userdict.count_active_users()
+    assert counts["pending"] == counts["active"] == counts["ready"] == 0
+
+    # changes behind the spawner's back are caught by a recount
+    spawner.orm_spawner.server = orm.Server()
+    db.commit()
+    assert userdict.count_active_users()["active"] == 0
+    assert userdict.recount_active_users()["active"] == 1
+    # removed spawners are no longer counted
+    user.spawners.pop("")
+    assert userdict.count_active_users()["active"] == 0
+    assert userdict.recount_active_users()["active"] == 0
+    spawner.orm_spawner.server = None
+    db.commit()
+
+
 @pytest.mark.parametrize(
     "group_names",
     [
@@ -122,3 +122,41 @@ def test_browser_protocol(x_scheme, x_forwarded_proto, forwarded, expected):
 
     proto = utils.get_browser_protocol(request)
     assert proto == expected
+
+
+@pytest.mark.parametrize(
+    "algorithm, rounds",
+    [
+        ("sha512", 1),
+        ("sha512", 16384),
+        ("pbkdf2-sha256", 1),
+        ("pbkdf2-sha256", 4096),
+    ],
+)
+def test_hash_token(algorithm, rounds):
+    hashed = utils.hash_token("token", rounds=rounds, algorithm=algorithm)
+    algo, hashed_rounds, salt, digest = hashed.split(":")
+    assert algo == algorithm
+    assert hashed_rounds == str(rounds)
+    assert len(salt) == 16
+    assert utils.compare_token(hashed, "token")
+    assert not utils.compare_token(hashed, "other")
+
+
+def test_hash_token_benchmark():
+    """Verifying the current token hash scheme should beat the legacy one"""
+    from timeit import repeat
+
+    token = "super-secret-preload-token"
+    legacy = utils.hash_token(token, rounds=16384, algorithm="sha512")
+    current = utils.hash_token(token, rounds=4096, algorithm="pbkdf2-sha256")
+
+    def per_check(hashed):
+        return min(repeat(lambda: utils.compare_token(hashed, token), number=5)) / 5
+
+    legacy_t = per_check(legacy)
+    current_t = per_check(current)
+    print(
+        f"token checks/s: legacy={1 / legacy_t:.0f} pbkdf2-sha256={1 / current_t:.0f}"
+    )
+    assert current_t < legacy_t
@@ -1,14 +1,16 @@
 # Copyright (c) Jupyter Development Team.
 # Distributed under the terms of the Modified BSD License.
+import asyncio
 import json
 import string
 import warnings
-from collections import defaultdict
+import weakref
+from collections import OrderedDict, defaultdict
 from datetime import datetime, timedelta
 from functools import lru_cache
 from urllib.parse import quote, urlparse
 
-from sqlalchemy import inspect
+from sqlalchemy import event, inspect
 from tornado import gen, web
 from tornado.httputil import urlencode
 from tornado.log import app_log
@@ -16,7 +18,7 @@ from tornado.log import app_log
 from . import orm
 from ._version import __version__, _check_version
 from .crypto import CryptKeeper, EncryptionUnavailable, InvalidToken, decrypt, encrypt
-from .metrics import RUNNING_SERVERS, TOTAL_USERS
+from .metrics import RESIDENT_SPAWNERS, RESIDENT_USERS, RUNNING_SERVERS, TOTAL_USERS
 from .objects import Server
 from .spawner import LocalProcessSpawner
 from .utils import (
@@ -92,6 +94,65 @@ def _dns_quote(name):
     return label
 
 
+class _ServerCounts:
+    """Counts of servers by state, updated incrementally
+
+    Spawners notify their counter when their state changes,
+    so counts are available without scanning all users.
+
+    Keys are the same as :meth:`UserDict.count_active_users`:
+    'pending', '{pending}_pending', 'active', and 'ready'.
+    """
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        # the states each spawner is currently counted in
+        self._counted = {}
+
+    @staticmethod
+    def states(spawner):
+        """The states a spawner should be counted in"""
+        states = []
+        pending = spawner.pending
+        if pending:
+            states.append('pending')
+            states.append(pending + '_pending')
+        if spawner.active:
+            states.append('active')
+        if spawner.ready:
+            states.append('ready')
+        return tuple(states)
+
+    def update(self, spawner):
+        """Update counts for a spawner's current state"""
+        new_states = self.states(spawner)
+        old_states = self._counted.get(spawner, ())
+        if new_states == old_states:
+            return
+        for state in old_states:
+            self.counts[state] -= 1
+        for state in new_states:
+            self.counts[state] += 1
+        self._counted[spawner] = new_states
+
+    def remove(self, spawner):
+        """Stop counting a spawner"""
+        for state in self._counted.pop(spawner, ()):
+            self.counts[state] -= 1
+
+    def recount(self, spawners):
+        """Recount from scratch
+
+        Returns the previous counts, for comparison.
+        """
+        before = self.counts
+        self.counts = defaultdict(int)
+        self._counted = {}
+        for spawner in spawners:
+            self.update(spawner)
+        return before
+
+
 class UserDict(dict):
     """Like defaultdict, but for users
 
@@ -112,12 +173,29 @@ class UserDict(dict):
 
     .. versionchanged:: 1.2
         ``'username' in userdict`` pattern is now supported
+
+    .. versionchanged:: 4.0
+        Cached users are indexed by name and cookie_id,
+        so lookups by name or cookie don't need to scan or query the database.
+
+    .. versionchanged:: 4.0
+        If `max_resident` is set, the least-recently used idle users
+        (those with no active or pending servers) are evicted from the cache
+        when it grows past `max_resident` users.
     """
 
-    def __init__(self, db_factory, settings):
+    def __init__(self, db_factory, settings, max_resident=0):
         self.db_factory = db_factory
         self.settings = settings
+        self.max_resident = max_resident
+        # secondary indexes of cached users: name -> id, cookie_id -> id
+        self._name_index = {}
+        self._cookie_id_index = {}
+        # user ids, least-recently used first
+        self._recent = OrderedDict()
+        self._server_counts = _ServerCounts()
         super().__init__()
+        _user_dicts[id(self)] = self
 
     @property
     def db(self):
@@ -132,6 +210,93 @@ class UserDict(dict):
             self[orm_user.id] = self.from_orm(orm_user)
         return self[orm_user.id]
 
+    def _index(self, index, value, user_id):
+        """Point `index[value]` at `user_id`"""
+        if value is not None:
+            index[value] = user_id
+
+    def _unindex(self, index, value, user_id):
+        """Remove `index[value]`, if it still points at `user_id`"""
+        if value is not None and index.get(value) == user_id:
+            del index[value]
+
+    def _cached_by(self, index, attr, value):
+        """Lookup a cached User by an indexed attribute
+
+        Returns None if no cached user has `attr == value`.
+        """
+        user_id = index.get(value)
+        if user_id is None:
+            return None
+        user = super().get(user_id)
+        if user is None or getattr(user.orm_user, attr) != value:
+            # stale entry
+            index.pop(value, None)
+            return None
+        return user
+
+    def _attribute_set(self, orm_user, attr, value, oldvalue):
+        """Keep indexes up-to-date when a cached user is renamed or gets a new cookie_id"""
+        if orm_user.id is None or not super().__contains__(orm_user.id):
+            return
+        index = self._name_index if attr == 'name' else self._cookie_id_index
+        if isinstance(oldvalue, str):
+            self._unindex(index, oldvalue, orm_user.id)
+        self._index(index, value, orm_user.id)
+
+    def _touch(self, user_id):
+        """Mark a user as recently used"""
+        if user_id in self._recent:
+            self._recent.move_to_end(user_id)
+
+    def _is_idle(self, user):
+        """Whether a user can be evicted from the cache
+
+        Users with active or pending servers are never evicted.
+        """
+        for spawner in user.spawners.values():
+            if spawner.active or spawner.pending:
+                return False
+        for orm_spawner in user.orm_user._orm_spawners:
+            if orm_spawner.server is not None:
+                return False
+        return True
+
+    def _evict(self, keep):
+        """Evict least-recently used idle users until there are at most max_resident
+
+        `keep` is the id of a user that should not be evicted
+        """
+        for user_id in list(self._recent):
+            if len(self) <= self.max_resident:
+                break
+            if user_id == keep:
+                continue
+            user = super().get(user_id)
+            if user is None:
+                self._recent.pop(user_id, None)
+            elif self._is_idle(user):
+                self.log.debug("Evicting idle user %s from the cache", user.name)
+                del self[user_id]
+            else:
+                # busy users count as recently used
+                self._recent.move_to_end(user_id)
+
+    @property
+    def log(self):
+        return self.settings.get('log', app_log)
+
+    def __setitem__(self, key, user):
+        super().__setitem__(key, user)
+        user.spawners.set_state_counter(self._server_counts)
+        self._index(self._name_index, user.orm_user.name, key)
+        self._index(self._cookie_id_index, user.orm_user.cookie_id, key)
+        self._recent[key] = None
+        self._recent.move_to_end(key)
+        if self.max_resident and len(self) > self.max_resident:
+            self._evict(keep=key)
+        RESIDENT_USERS.set(len(self))
+
     def __contains__(self, key):
         """key in userdict checks presence in the cache
 
@@ -140,11 +305,7 @@ class UserDict(dict):
         if isinstance(key, (User, orm.User)):
             key = key.id
         elif isinstance(key, str):
-            # username lookup, O(N)
-            for user in self.values():
-                if user.name == key:
-                    key = user.id
-                    break
+            return self._cached_by(self._name_index, 'name', key) is not None
         return super().__contains__(key)
 
     def __getitem__(self, key):
@@ -158,6 +319,10 @@ class UserDict(dict):
         if isinstance(key, User):
             key = key.id
         elif isinstance(key, str):
+            user = self._cached_by(self._name_index, 'name', key)
+            if user is not None:
+                self._touch(user.id)
+                return user
             orm_user = self.db.query(orm.User).filter(orm.User.name == key).first()
             if orm_user is None:
                 raise KeyError("No such user: %s" % key)
@@ -166,11 +331,17 @@ class UserDict(dict):
         if isinstance(key, orm.User):
             # users[orm_user] returns User(orm_user)
             orm_user = key
+            if orm_user.id not in self and inspect(orm_user).detached:
+                # evicted, but still referenced by another object, e.g. a token
+                orm_user = self.db.get(orm.User, orm_user.id)
+                if orm_user is None:
+                    raise KeyError("No such user: %s" % key.id)
             if orm_user.id not in self:
                 user = self[orm_user.id] = User(orm_user, self.settings)
                 return user
             user = super().__getitem__(orm_user.id)
             user.db = self.db
+            self._touch(orm_user.id)
             return user
         elif isinstance(key, int):
             id = key
@@ -181,6 +352,7 @@ class UserDict(dict):
                 user = self.add(orm_user)
             else:
                 user = super().__getitem__(id)
+                self._touch(id)
             return user
         else:
             raise KeyError(repr(key))
@@ -199,6 +371,24 @@ class UserDict(dict):
         except KeyError:
             return default
 
+    def get_by_cookie_id(self, cookie_id):
+        """Retrieve the User with a given cookie_id, or None
+
+        Checks the cache before the database.
+
+        .. versionadded:: 4.0
+        """
+        user = self._cached_by(self._cookie_id_index, 'cookie_id', cookie_id)
+        if user is not None:
+            self._touch(user.id)
+            return user
+        orm_user = (
+            self.db.query(orm.User).filter(orm.User.cookie_id == cookie_id).first()
+        )
+        if orm_user is None:
+            return None
+        return self[orm_user]
+
     def __delitem__(self, key):
         user = self[key]
         for orm_spawner in user.orm_user._orm_spawners:
@@ -206,7 +396,13 @@ class UserDict(dict):
                 self.db.expunge(orm_spawner)
         if user.orm_user in self.db:
             self.db.expunge(user.orm_user)
+        self._unindex(self._name_index, user.orm_user.name, user.id)
+        self._unindex(self._cookie_id_index, user.orm_user.cookie_id, user.id)
+        self._recent.pop(user.id, None)
+        user.spawners.set_state_counter(None)
         super().__delitem__(user.id)
+        RESIDENT_USERS.set(len(self))
+        RESIDENT_SPAWNERS.dec(len(user.spawners))
 
     def delete(self, key):
         """Delete a user from the cache and the database"""
@@ -222,22 +418,53 @@ class UserDict(dict):
         """Count the number of user servers that are active/pending/ready
 
         Returns dict with counts of active/pending/ready servers
+
+        .. versionchanged:: 4.0
+            Counts are kept up-to-date as spawners change state,
+            instead of counting all spawners on every call.
+            Use :meth:`recount_active_users` to check them.
         """
-        counts = defaultdict(lambda: 0)
-        for user in self.values():
-            for spawner in user.spawners.values():
-                pending = spawner.pending
-                if pending:
-                    counts['pending'] += 1
-                    counts[pending + '_pending'] += 1
-                if spawner.active:
-                    counts['active'] += 1
-                if spawner.ready:
-                    counts['ready'] += 1
+        return defaultdict(int, self._server_counts.counts)
+
+    def recount_active_users(self):
+        """Recount active/pending/ready servers by checking every spawner
 
+        Corrects (and logs) any drift in the counts from :meth:`count_active_users`,
+        e.g. due to server state changed directly in the database.
+
+        .. versionadded:: 4.0
+        """
+        before = self._server_counts.recount(
+            spawner for user in self.values() for spawner in user.spawners.values()
+        )
+        counts = self.count_active_users()
+        drift = {
+            key: (before.get(key, 0), counts.get(key, 0))
+            for key in set(before) | set(counts)
+            if before.get(key, 0) != counts.get(key, 0)
+        }
+        if drift:
+            self.log.warning("Corrected server counts (before, after): %s", drift)
         return counts
 
 
+# all UserDicts, for keeping their indexes up-to-date
+_user_dicts = weakref.WeakValueDictionary()
+
+
+def _index_user_attribute(attr):
+    """Register a listener updating UserDict indexes when orm.User.attr is set"""
+
+    @event.listens_for(getattr(orm.User, attr), 'set')
+    def _attribute_set(orm_user, value, oldvalue, initiator):
+        for user_dict in list(_user_dicts.values()):
+            user_dict._attribute_set(orm_user, attr, value, oldvalue)
+
+
+for _attr in ('name', 'cookie_id'):
+    _index_user_attribute(_attr)
+
+
 class _SpawnerDict(dict):
     def __init__(self, spawner_factory):
         self.spawner_factory = spawner_factory
@@ -247,6 +474,44 @@ class _SpawnerDict(dict):
             self[key] = self.spawner_factory(key)
         return super().__getitem__(key)
 
+    _state_counter = None
+
+    def set_state_counter(self, state_counter):
+        """Set the _ServerCounts tracking the state of these spawners"""
+        for spawner in self.values():
+            if self._state_counter is not None:
+                self._state_counter.remove(spawner)
+            spawner._state_counter = state_counter
+            if state_counter is not None:
+                state_counter.update(spawner)
+        self._state_counter = state_counter
+
+    def _untrack(self, spawner):
+        if self._state_counter is not None:
+            self._state_counter.remove(spawner)
+            spawner._state_counter = None
+
+    def __setitem__(self, key, spawner):
+        if key not in self:
+            RESIDENT_SPAWNERS.inc()
+        else:
+            self._untrack(super().__getitem__(key))
+        super().__setitem__(key, spawner)
+        if self._state_counter is not None:
+            spawner._state_counter = self._state_counter
+            self._state_counter.update(spawner)
+
+    def __delitem__(self, key):
+        self._untrack(super().__getitem__(key))
+        super().__delitem__(key)
+        RESIDENT_SPAWNERS.dec()
+
+    def pop(self, key, *default):
+        if key in self:
+            RESIDENT_SPAWNERS.dec()
+            self._untrack(super().__getitem__(key))
+        return super().pop(key, *default)
+
 
 class User:
     """High-level wrapper around an orm.User object"""
@@ -719,6 +984,7 @@ class User:
         authenticator = self.authenticator
         try:
             spawner._start_pending = True
+            spawner._ready_future = asyncio.get_running_loop().create_future()
 
             if authenticator:
                 # pre_spawn_start can throw errors that can lead to a redirect loop
@@ -862,6 +1128,41 @@ class User:
         spawner._waiting_for_response = True
         await self._wait_up(spawner)
 
+    async def _wait_ready(self, spawner, ssl_context):
+        """Wait for a server to be ready
+
+        Waits for the server to notify the Hub that it's ready,
+        and polls its URL if it hasn't after `spawner.ready_poll_delay` seconds.
+
+        Returns the server's jupyterhub version.
+        """
+        server = spawner.server
+        ready = spawner._ready_future
+        timeout = spawner.http_timeout
+        if ready is not None:
+            delay = min(spawner.ready_poll_delay, timeout)
+            try:
+                return await asyncio.wait_for(asyncio.shield(ready), delay)
+            except asyncio.TimeoutError:
+                timeout -= delay
+            self.log.debug(
+                "%s hasn't notified the Hub that it's ready, polling %s",
+                spawner._log_name,
+                server.url,
+            )
+
+        poll = asyncio.ensure_future(
+            server.wait_up(http=True, timeout=timeout, ssl_context=ssl_context)
+        )
+        if ready is not None:
+            # keep waiting for the notification while polling
+            await asyncio.wait([poll, ready], return_when=asyncio.FIRST_COMPLETED)
+            if ready.done():
+                poll.cancel()
+                return ready.result()
+        resp = await poll
+        return resp.headers.get('X-JupyterHub-Version')
+
     async def _wait_up(self, spawner):
         """Wait for a server to finish starting.
 
@@ -874,9 +1175,7 @@ class User:
         ca = self.settings.get('internal_ssl_ca')
         ssl_context = make_ssl_context(key, cert, cafile=ca)
         try:
-            resp = await server.wait_up(
-                http=True, timeout=spawner.http_timeout, ssl_context=ssl_context
-            )
+            server_version = await self._wait_ready(spawner, ssl_context)
         except Exception as e:
             if isinstance(e, AnyTimeoutError):
                 self.log.warning(
@@ -906,12 +1205,12 @@ class User:
             # raise original TimeoutError
             raise e
         else:
-            server_version = resp.headers.get('X-JupyterHub-Version')
             _check_version(__version__, server_version, self.log)
             # record the Spawner version for better error messages
             # if it doesn't work
             spawner._jupyterhub_version = server_version
         finally:
+            spawner._ready_future = None
             spawner._waiting_for_response = False
             spawner._start_pending = False
         return spawner
@@ -386,12 +386,25 @@ def new_token(*args, **kwargs):
     return uuid.uuid4().hex
 
 
+# prefix of token hash algorithms using hashlib.pbkdf2_hmac
+PBKDF2_PREFIX = "pbkdf2-"
+
+
 def hash_token(token, salt=8, rounds=16384, algorithm='sha512'):
-    """Hash a token, and return it as `algorithm:salt:hash`.
+    """Hash a token, and return it as `algorithm:rounds:salt:hash`.
 
     If `salt` is an integer, a random salt of that many bytes will be used.
+
+    `algorithm` selects the hashing scheme:
+
+    - `pbkdf2-{hash}` (e.g. `pbkdf2-sha256`) uses PBKDF2-HMAC
+      with `rounds` iterations.
+    - any other hashlib algorithm name (e.g. `sha512`)
+      is the legacy scheme, hashing the salt followed by `rounds` copies of the token.
+
+    .. versionchanged:: 4.0
+        Added `pbkdf2-` algorithms.
     """
-    h = hashlib.new(algorithm)
     if isinstance(salt, int):
         salt = b2a_hex(secrets.token_bytes(salt))
     if isinstance(salt, bytes):
@@ -400,10 +413,16 @@ def hash_token(token, salt=8, rounds=16384, algorithm='sha512'):
     else:
         bsalt = salt.encode('utf8')
     btoken = token.encode('utf8', 'replace')
-    h.update(bsalt)
-    for i in range(rounds):
-        h.update(btoken)
-    digest = h.hexdigest()
+    if algorithm.startswith(PBKDF2_PREFIX):
+        digest = hashlib.pbkdf2_hmac(
+            algorithm[len(PBKDF2_PREFIX) :], btoken, bsalt, rounds
+        ).hex()
+    else:
+        h = hashlib.new(algorithm)
+        h.update(bsalt)
+        for i in range(rounds):
+            h.update(btoken)
+        digest = h.hexdigest()
 
     return f"{algorithm}:{rounds}:{salt}:{digest}"
 
@@ -102,6 +102,7 @@ setup_args = dict(
         'jupyterhub.proxies': [
             'default = jupyterhub.proxy:ConfigurableHTTPProxy',
             'configurable-http-proxy = jupyterhub.proxy:ConfigurableHTTPProxy',
+            'inprocess = jupyterhub.inprocess_proxy:InProcessProxy',
         ],
         'jupyterhub.spawners': [
             'default = jupyterhub.spawner:LocalProcessSpawner',